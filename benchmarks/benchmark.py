@@ -0,0 +1,279 @@
+"""
+Benchmark do pipeline do mapa coroplético com dados sintéticos (não precisa de rede).
+
+Gera coberturas de polígonos (municípios) de 100 a 100 000 feições, com número de
+vértices controlável, e as tabelas correspondentes em CSV, XLSX e TXT. Mede, para
+cada etapa (load_shapefile, load_data_file, merge, create_choropleth_map,
+add_legend e m.save), o tempo, o pico de memória e os bytes produzidos, e grava os
+resultados em JSON para comparar versões.
+
+Uso:
+    python benchmarks/benchmark.py
+    python benchmarks/benchmark.py --feicoes 100 1000 --vertices 64 --repeticoes 3
+    python benchmarks/benchmark.py --comparar benchmarks/resultados/anterior.json
+
+Com --comparar, os parâmetros não indicados (exceto --tracemalloc) são os da execução anterior.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import warnings
+import zipfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "resultados")
+# Extensão aproximada de Angola (lon/lat), onde as coberturas sintéticas são geradas
+EXTENT = (11.7, -18.0, 24.1, -4.4)
+CATEGORIES = ["Muito baixo", "Baixo", "Médio", "Alto", "Muito alto"]
+COLORS = ["#1a9850", "#91cf60", "#fee08b", "#fc8d59", "#d73027"]
+TABLE_FORMATS = ["csv", "xlsx", "txt"]
+
+if __name__ == "__main__":
+    # Deve ser definido antes de importar utils1a
+    if "--tracemalloc" in sys.argv:
+        os.environ["DATAONMAP_TRACEMALLOC"] = "1"
+
+sys.path.insert(0, REPO_DIR)
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import folium
+import streamlit.logger
+import utils1a
+from utils1a import load_shapefile, load_data_file, join_layers, create_choropleth_map, add_legend, track_memory
+
+
+def synthetic_coverage(n_features, vertices=32, seed=0):
+    """
+    Gera uma cobertura sintética de polígonos sem lacunas nem sobreposições.
+
+    As células de uma grelha regular têm os lados perturbados; cada lado é
+    partilhado pelas duas células vizinhas, pelo que a cobertura é válida.
+
+    Args:
+        n_features: Número de polígonos.
+        vertices: Vértices aproximados por polígono (múltiplo de 4).
+        seed: Semente do gerador aleatório.
+
+    Returns:
+        gpd.GeoDataFrame: Camada em EPSG:4326 com "codigo", "nome" e "prov".
+    """
+    rng = np.random.default_rng(seed)
+    west, south, east, north = EXTENT
+    nx = max(1, math.ceil(math.sqrt(n_features * (east - west) / (north - south))))
+    ny = math.ceil(n_features / nx)
+    width, height = (east - west) / nx, (north - south) / ny
+    k = max(1, vertices // 4)
+    t = np.linspace(0, 1, k + 1)
+    bump = np.sin(np.pi * t)
+
+    # Lados horizontais (ny + 1 linhas x nx células) e verticais (ny células x nx + 1 colunas)
+    hx = west + (np.arange(nx)[None, :, None] + t) * width + np.zeros((ny + 1, 1, 1))
+    hy = south + np.arange(ny + 1)[:, None, None] * height + 0.2 * height * bump * rng.uniform(-1, 1, (ny + 1, nx, k + 1))
+    vx = west + np.arange(nx + 1)[None, :, None] * width + 0.2 * width * bump * rng.uniform(-1, 1, (ny, nx + 1, k + 1))
+    vy = south + (np.arange(ny)[:, None, None] + t) * height + np.zeros((1, nx + 1, 1))
+
+    def ring(x_bottom, x_right, x_top, x_left):
+        return np.concatenate([x_bottom, x_right[..., 1:], x_top[..., ::-1][..., 1:], x_left[..., ::-1][..., 1:]], axis=-1)
+
+    xs = ring(hx[:-1], vx[:, 1:], hx[1:], vx[:, :-1])
+    ys = ring(hy[:-1], vy[:, 1:], hy[1:], vy[:, :-1])
+    coords = np.stack([xs, ys], axis=-1).reshape(ny * nx, 4 * k + 1, 2)[:n_features]
+    rows, cols = np.divmod(np.arange(n_features), nx)
+    return gpd.GeoDataFrame(
+        {
+            "codigo": [f"M{i:06d}" for i in range(n_features)],
+            "nome": [f"Município {i}" for i in range(n_features)],
+            "prov": [f"P{p:02d}" for p in (rows * 3 // ny) * 6 + cols * 6 // nx],
+        },
+        geometry=shapely.polygons(coords),
+        crs="EPSG:4326",
+    )
+
+
+def synthetic_table(layer, seed=0):
+    """Tabela de dados com uma linha por município: "codigo", "categoria" e "valor"."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "codigo": layer["codigo"],
+        "categoria": rng.choice(CATEGORIES, len(layer)),
+        "valor": rng.uniform(0, 100, len(layer)).round(2),
+    })
+
+
+def write_inputs(layer, table, directory):
+    """
+    Grava o shapefile (ZIP) e as tabelas CSV, XLSX e TXT, como seriam carregados na aplicação.
+
+    Returns:
+        dict: Nome do arquivo -> caminho ("municipios.zip", "dados.csv", ...).
+    """
+    shapefile_dir = os.path.join(directory, "shp")
+    os.makedirs(shapefile_dir, exist_ok=True)
+    layer.to_file(os.path.join(shapefile_dir, "municipios.shp"), encoding="utf-8")
+    paths = {"municipios.zip": os.path.join(directory, "municipios.zip")}
+    with zipfile.ZipFile(paths["municipios.zip"], "w", zipfile.ZIP_DEFLATED) as archive:
+        for name in os.listdir(shapefile_dir):
+            archive.write(os.path.join(shapefile_dir, name), name)
+    for fmt in TABLE_FORMATS:
+        paths[f"dados.{fmt}"] = os.path.join(directory, f"dados.{fmt}")
+    table.to_csv(paths["dados.csv"], index=False)
+    table.to_excel(paths["dados.xlsx"], index=False)
+    table.to_csv(paths["dados.txt"], index=False, sep="\t")
+    return paths
+
+
+def run_pipeline(n_features, vertices, directory, formats=TABLE_FORMATS):
+    """
+    Executa o pipeline uma vez e mede cada etapa com track_memory.
+
+    Os carregadores são chamados sem a cache de uploads (__wrapped__), para medir a leitura.
+
+    Returns:
+        list: Um dicionário por etapa, com "etapa", "segundos", medidas de memória e "bytes".
+    """
+    layer = synthetic_coverage(n_features, vertices)
+    table = synthetic_table(layer)
+    paths = write_inputs(layer, table, directory)
+    provinces = layer.dissolve("prov", method="coverage", as_index=False)
+    color_mapping = dict(zip(CATEGORIES, COLORS))
+    records = []
+
+    def measured(stage, func, output_bytes=None):
+        with track_memory(stage) as record:
+            result = func()
+        record = {"etapa": stage, **record}
+        if output_bytes is not None:
+            record["bytes"] = output_bytes(result)
+        records.append(record)
+        return result
+
+    with open(paths["municipios.zip"], "rb") as f:
+        gdf = measured("load_shapefile", lambda: load_shapefile.__wrapped__(f), lambda _: os.path.getsize(paths["municipios.zip"]))
+    data = None
+    for fmt in formats:
+        with open(paths[f"dados.{fmt}"], "rb") as f:
+            loaded = measured(f"load_data_file[{fmt}]", lambda: load_data_file.__wrapped__(f), lambda _: os.path.getsize(paths[f"dados.{fmt}"]))
+        if loaded is None:
+            raise RuntimeError(f"load_data_file falhou com dados.{fmt}")
+        data = data if data is not None else loaded
+    merged = measured("merge", lambda: join_layers(gdf, data, "codigo", "codigo"), utils1a.estimate_memory_usage)
+    m = measured("create_choropleth_map", lambda: create_choropleth_map(merged, provinces, "categoria", color_mapping, "codigo"))
+    if m is None:
+        raise RuntimeError("create_choropleth_map falhou")
+    measured("add_legend", lambda: add_legend(m, color_mapping, "categoria"))
+    output = os.path.join(directory, "mapa.html")
+    measured("m.save", lambda: m.save(output), lambda _: os.path.getsize(output))
+    return records
+
+
+def summarize(runs):
+    """Combina as repetições de uma etapa: mediana e mínimo do tempo, máximo da memória."""
+    seconds = [run["segundos"] for run in runs]
+    summary = {key: value for key, value in runs[0].items() if key not in ("segundos",)}
+    summary.update({"segundos": round(statistics.median(seconds), 3), "segundos_min": min(seconds), "repeticoes": len(runs)})
+    for key in ("rss_pico_delta_mb", "tracemalloc_pico_delta_mb"):
+        if key in runs[0]:
+            summary[key] = max(run[key] for run in runs)
+    return summary
+
+
+def environment():
+    """Descrição do ambiente, gravada com os resultados."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "bibliotecas": {module.__name__: module.__version__ for module in (pd, gpd, shapely, folium, np)},
+    }
+
+
+def compare(current, previous):
+    """
+    Compara dois arquivos de resultados etapa a etapa.
+
+    Returns:
+        pd.DataFrame: Tempos e memória anteriores e atuais, com a razão atual/anterior.
+    """
+    keys = ["feicoes", "vertices", "etapa"]
+    columns = keys + ["segundos", "rss_pico_delta_mb", "bytes"]
+    table = pd.DataFrame(previous["resultados"]).reindex(columns=columns).merge(
+        pd.DataFrame(current["resultados"]).reindex(columns=columns), on=keys, suffixes=("_anterior", "_atual")
+    )
+    table["razao_tempo"] = (table["segundos_atual"] / table["segundos_anterior"]).round(2)
+    return table
+
+
+# Parâmetros de medição por omissão (guardados em "parametros" nos resultados)
+DEFAULT_PARAMETERS = {
+    "feicoes": [100, 1000, 10000, 100000],
+    "vertices": [32],
+    "formatos": TABLE_FORMATS,
+    "repeticoes": 1,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do mapa com dados sintéticos.")
+    parser.add_argument("--feicoes", type=int, nargs="+", default=None, help="Tamanhos das coberturas (por omissão, 100 a 100 000).")
+    parser.add_argument("--vertices", type=int, nargs="+", default=None, help="Vértices por polígono (por omissão, 32).")
+    parser.add_argument("--formatos", nargs="+", default=None, choices=TABLE_FORMATS, help="Formatos da tabela (por omissão, todos).")
+    parser.add_argument("--repeticoes", type=int, default=None, help="Repetições de cada configuração (por omissão, 1).")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultados (por omissão, em benchmarks/resultados/).")
+    parser.add_argument("--comparar", default=None, help="Arquivo JSON de uma execução anterior, para comparar; os parâmetros não indicados são os dessa execução.")
+    parser.add_argument("--tracemalloc", action="store_true", help="Mede também o pico do tracemalloc (mais lento).")
+    args = parser.parse_args(argv)
+
+    # Os parâmetros omitidos vêm da execução a comparar, para medir as mesmas configurações
+    previous = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            previous = json.load(f)
+    for name, default in DEFAULT_PARAMETERS.items():
+        if getattr(args, name) is None:
+            setattr(args, name, (previous or {}).get("parametros", {}).get(name, default))
+
+    # Fora de uma sessão Streamlit, as mensagens da interface só geram avisos
+    # (o nível do logger é reposto pela configuração do Streamlit, por isso é desativado)
+    streamlit.logger.get_logger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    warnings.filterwarnings("ignore", category=UserWarning, module="folium")
+
+    results = []
+    for vertices in args.vertices:
+        for n_features in args.feicoes:
+            runs = []
+            for _ in range(args.repeticoes):
+                with tempfile.TemporaryDirectory() as directory:
+                    runs.append(run_pipeline(n_features, vertices, directory, args.formatos))
+            for stage_runs in zip(*runs):
+                results.append({"feicoes": n_features, "vertices": vertices, **summarize(stage_runs)})
+                row = results[-1]
+                print(f"{n_features:>7} feições  {vertices:>4} vértices  {row['etapa']:<24} {row['segundos']:>9.3f} s  {row.get('rss_pico_delta_mb', float('nan')):>8.1f} MB  {row.get('bytes', '')}", flush=True)
+
+    report = {"ambiente": environment(), "parametros": vars(args), "resultados": results}
+    output = args.saida or os.path.join(RESULTS_DIR, f"benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {output}")
+
+    if previous is not None:
+        print(compare(report, previous).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
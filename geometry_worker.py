@@ -0,0 +1,136 @@
+"""
+Tarefas do motor de geometria (utils1a.geometry) executadas nos processos do pool.
+
+Fica fora do pacote utils1a para que cada processo importe apenas o NumPy, o shapely
+e o pyproj (cerca de 50 MB), e não o Streamlit, o folium e o resto da aplicação.
+"""
+import functools
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from multiprocessing import shared_memory
+
+import numpy as np
+import pyproj
+import shapely
+
+
+@functools.lru_cache(maxsize=16)
+def _transformer(source, target):
+    return pyproj.Transformer.from_crs(source, target, always_xy=True)
+
+
+def apply_geometry_operations(geometries, operations):
+    """
+    Aplica em bloco uma sequência de operações a um array de geometrias.
+
+    Args:
+        geometries: Array numpy de geometrias shapely (None = geometria ausente).
+        operations: Lista de (nome, parâmetros), com nome "to_crs" (source, target),
+            "repair", "simplify" (tolerance), "centroid" ou "representative_point".
+
+    Returns:
+        np.ndarray: Novo array de geometrias, na mesma ordem.
+    """
+    for name, params in operations:
+        if name == "to_crs":
+            transformer = _transformer(params["source"], params["target"])
+            geometries = shapely.transform(geometries, transformer.transform, include_z=None, interleaved=False)
+        elif name == "repair":
+            invalid = ~shapely.is_valid(geometries) & ~shapely.is_missing(geometries)
+            if invalid.any():
+                geometries = geometries.copy()
+                geometries[invalid] = shapely.buffer(geometries[invalid], 0)
+        elif name == "simplify":
+            geometries = shapely.simplify(geometries, params["tolerance"], preserve_topology=True)
+        elif name == "centroid":
+            geometries = shapely.centroid(geometries)
+        elif name == "representative_point":
+            geometries = shapely.point_on_surface(geometries)
+        else:
+            raise ValueError(f"Operação de geometria desconhecida: {name}")
+    return geometries
+
+
+def read_shared_chunk(geom_type, arrays, start, stop):
+    """Reconstrói as geometrias [start, stop) a partir dos arrays ragged partilhados."""
+    offsets = [arrays[name] for name in sorted(name for name in arrays if name.startswith("offsets_"))]
+    lo, hi = start, stop
+    sliced = []
+    for offset in reversed(offsets):
+        part = offset[lo:hi + 1]
+        sliced.append(part - part[0])
+        lo, hi = int(part[0]), int(part[-1])
+    geometries = shapely.from_ragged_array(geom_type, arrays["coords"][lo:hi], tuple(reversed(sliced)))
+    if "single" in arrays:
+        single = arrays["single"][start:stop]
+        geometries[single] = shapely.get_geometry(geometries[single], 0)
+    if "missing" in arrays:
+        geometries[arrays["missing"][start:stop]] = None
+    return geometries
+
+
+def process_geometry_chunk(source, start, stop, operations):
+    """
+    Tarefa executada em cada processo do pool: lê um bloco, aplica as operações e devolve WKB.
+
+    Args:
+        source: ("wkb", array WKB do bloco) ou ("shared", tipo ragged, descritores).
+        start: Primeira feição do bloco.
+        stop: Feição seguinte à última do bloco.
+        operations: Operações de apply_geometry_operations.
+
+    Returns:
+        np.ndarray: Geometrias resultantes em WKB.
+    """
+    if source[0] == "wkb":
+        geometries = shapely.from_wkb(source[1])
+    else:
+        segments = [shared_memory.SharedMemory(name=name) for name, _, _ in source[2].values()]
+        try:
+            arrays = {
+                name: np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+                for segment, (name, (_, shape, dtype)) in zip(segments, source[2].items())
+            }
+            geometries = read_shared_chunk(source[1], arrays, start, stop)
+            # As vistas sobre a memória partilhada têm de ser libertadas antes de a fechar
+            del arrays
+        finally:
+            for segment in segments:
+                segment.close()
+    return shapely.to_wkb(apply_geometry_operations(geometries, operations))
+
+
+class WorkerProcess(multiprocessing.context.SpawnProcess):
+    """
+    Processo do pool que arranca sem reexecutar o script principal.
+
+    Com "spawn", cada processo novo importa o __main__ do pai; no Streamlit é o próprio
+    script da aplicação (maping1a.py), que correria inteiro em cada processo. O __main__
+    é trocado por um módulo vazio só enquanto o processo é lançado. A classe fica neste
+    módulo porque o processo novo a importa para se reconstruir.
+    """
+
+    _lock = threading.Lock()
+    _main = types.ModuleType("__main__")
+
+    def start(self):
+        worker_dir = os.path.dirname(os.path.abspath(__file__))
+        with self._lock:
+            main, path = sys.modules["__main__"], list(sys.path)
+            sys.modules["__main__"] = self._main
+            if worker_dir not in sys.path:
+                sys.path.append(worker_dir)
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = main
+                sys.path[:] = path
+
+
+class WorkerContext(multiprocessing.context.SpawnContext):
+    """Contexto "spawn" cujos processos são WorkerProcess."""
+
+    Process = WorkerProcess
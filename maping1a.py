@@ -2,13 +2,23 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 from utils1a import load_shapefile, load_data_file, create_choropleth_map, add_legend
+from utils1a import track_memory, enforce_memory_budget, check_upload_budget, MEMORY_BUDGET_MB, get_data_cache, run_concurrently
+from utils1a import list_reference_layers, load_reference_layer, derive_parent_layer
+from utils1a import aggregate_points_to_polygons, drawings_to_geometries, query_layer_by_shapes
+from utils1a import CLASSIFICATION_METHODS, SEQUENTIAL_PALETTES, classify_values, palette_from_colormap, continuous_colormap
+from utils1a import PALETTE_SCHEMES, generate_palette, join_layers, build_category_index
+from utils1a import default_color_mapping, pivot_periods, sort_periods, create_comparison_map, MAX_COMPARISON_PANES, MAX_ZOOM
+from utils1a import render_static_map, STATIC_FORMATS, store_map_export, export_reader
+from utils1a import render_cache_key, load_cached_export, get_render_cache
+from utils1a import BASEMAPS, DEFAULT_BASEMAPS, MAP_CONTROLS, DEFAULT_MAP_CONTROLS, map_controls_cost, add_basemaps, add_map_controls
+from utils1a import map_view_state, build_view_layer
+from utils1a import match_layer_keys, FUZZY_MATCH_THRESHOLD, quality_report, quality_report_excel
 import io
 import pandas as pd
-import time
 import streamlit.components.v1 as components
 
 import branca
-from folium.plugins import Fullscreen, MeasureControl, MousePosition, Draw, LocateControl, MiniMap
+from folium.plugins import Draw
 import folium.plugins
 from branca.element import Template, MacroElement
 import html
@@ -95,6 +105,8 @@ with st.expander("Faça clique aqui para ver as instruções 👇"):
     - Um com o shapefile das províncias.  
     - Outro com o shapefile dos municípios.  
     
+    Em alternativa, as províncias podem ser derivadas do shapefile dos municípios (opção **Derivar dos municípios**), escolhendo a coluna que identifica a província de cada município.  
+    
     **Também é necessário:**  
     Uma tabela de dados nos formatos **.xlsx, .xls, .txt ou .csv**, com os dados a mapear.  
     A coluna dos dados a mapear deve ser formatada de forma categórica, para criar intervalos/categorias.  
@@ -142,9 +154,20 @@ def choropleth_tab():
 
     # Carregamento de arquivos na barra lateral
     with st.sidebar.expander("⚙ Leitura de dados "):
-        shapefile_zip2 = st.file_uploader("Shapefile das Províncias (.zip)", type=["zip"])
-        shapefile_zip = st.file_uploader("Shapefile dos Municípios (.zip)", type=["zip"])
+        # Camadas do catálogo de referência como alternativa ao upload
+        reference_layers = list_reference_layers()
+        upload_option = "Carregar arquivo (.zip)"
+        derive_option = "Derivar dos municípios"
+        prov_source = mun_source = upload_option
+        prov_source = st.selectbox("Limites das Províncias:", [upload_option, derive_option] + reference_layers, key="prov_source")
+        shapefile_zip2 = st.file_uploader("Shapefile das Províncias (.zip)", type=["zip"]) if prov_source == upload_option else None
+        if reference_layers:
+            mun_source = st.selectbox("Limites dos Municípios:", [upload_option] + reference_layers, key="mun_source")
+        shapefile_zip = st.file_uploader("Shapefile dos Municípios (.zip)", type=["zip"]) if mun_source == upload_option else None
         excel_file = st.file_uploader("Tabela de Dados", type=["xlsx", "xls", "txt", "csv"])
+        # Níveis administrativos adicionais (ex.: país, comunas), mostrados conforme o zoom
+        level_files = st.file_uploader("Níveis administrativos adicionais (.zip)", type=["zip"], accept_multiple_files=True, key="level_files") or []
+        level_layers = st.multiselect("Níveis adicionais do catálogo:", reference_layers, key="level_layers") if reference_layers else []
 
         # Seleção de planilha para arquivos Excel
         sheet_name = None
@@ -162,11 +185,48 @@ def choropleth_tab():
                 return
 
     # Verificar se todos os arquivos foram carregados
-    if shapefile_zip2 and shapefile_zip and excel_file:
+    prov_ready = bool(shapefile_zip2) or prov_source != upload_option
+    mun_ready = bool(shapefile_zip) or mun_source != upload_option
+    if prov_ready and mun_ready and excel_file:
+        # Arquivos que nem depois de lidos caberiam no orçamento são recusados antes da leitura
+        fits_budget, upload_estimate = check_upload_budget(
+            [shapefile_zip, shapefile_zip2, excel_file, *level_files],
+            budget_mb=st.session_state.get("memory_budget_mb", MEMORY_BUDGET_MB)
+        )
+        if not fits_budget:
+            message_placeholder.error(f"Os arquivos ocupariam cerca de {upload_estimate / 2**20:.1f} MB depois de lidos, acima do orçamento de memória da sessão. Reduza o tamanho dos arquivos.")
+            return
         message_placeholder.info("Carregando arquivos...")
-        gdf2 = load_shapefile(shapefile_zip2)
-        gdf = load_shapefile(shapefile_zip)
-        data = load_data_file(excel_file, sheet_name=sheet_name)
+        # Os três carregamentos correm em paralelo; o tempo total é o do mais lento
+        load_tasks = {
+            "load_shapefile (municípios)": (load_shapefile, (shapefile_zip,)) if shapefile_zip else (load_reference_layer, (mun_source,)),
+            "load_data_file": (load_data_file, (excel_file,), {"sheet_name": sheet_name}),
+        }
+        if prov_source != derive_option:
+            load_tasks["load_shapefile (províncias)"] = (load_shapefile, (shapefile_zip2,)) if shapefile_zip2 else (load_reference_layer, (prov_source,))
+        level_tasks = {}
+        for level_file in level_files:
+            level_tasks[level_file.name.rsplit(".", 1)[0]] = f"load_shapefile ({level_file.name})"
+            load_tasks[f"load_shapefile ({level_file.name})"] = (load_shapefile, (level_file,))
+        for level_layer in level_layers:
+            level_tasks[level_layer] = f"load_reference_layer ({level_layer})"
+            load_tasks[f"load_reference_layer ({level_layer})"] = (load_reference_layer, (level_layer,))
+        loaded = run_concurrently(load_tasks)
+        gdf = loaded["load_shapefile (municípios)"]
+        data = loaded["load_data_file"]
+        gdf2 = loaded.get("load_shapefile (províncias)")
+
+        # Províncias obtidas pela dissolução dos municípios (um upload, fronteiras coincidentes)
+        parent_column = None
+        if prov_source == derive_option and gdf is not None:
+            with st.sidebar.expander("🧩 Províncias a partir dos municípios", expanded=True):
+                parent_column = st.selectbox("Coluna da província (Shapefile dos Municípios):", [None] + list(gdf.columns), key="parent_column")
+            if not parent_column:
+                message_placeholder.info("Selecione a coluna que identifica a província de cada município.")
+                return
+            with track_memory("derive_parent_layer"):
+                gdf2 = derive_parent_layer(gdf, parent_column)
+
         if isinstance(data, tuple):
             message_placeholder.error("Erro interno: A função de carregamento de dados retornou uma tupla em vez de um DataFrame. Verifique a função 'load_data_file'.")
             return
@@ -177,11 +237,146 @@ def choropleth_tab():
             message_placeholder.error("Erro ao carregar os arquivos. Verifique se os shapefiles contêm arquivos .shp, .shx, .dbf e se a tabela de dados está no formato correto (xlsx, xls, csv ou txt).")
             return
 
+        # O orçamento de memória aplica-se logo após o carregamento, antes da pré-visualização,
+        # da união aproximada, da agregação de pontos e do relatório de qualidade
+        gdf, data, budget_actions = enforce_memory_budget(gdf, data, budget_mb=st.session_state.get("memory_budget_mb", MEMORY_BUDGET_MB))
+        if gdf is None:
+            message_placeholder.error("Os arquivos excedem o orçamento de memória da sessão, mesmo após simplificar as geometrias. Reduza o tamanho dos arquivos.")
+            return
+        if budget_actions:
+            st.sidebar.warning("Orçamento de memória: " + "; ".join(budget_actions) + ".")
+
+        # Intervalo de zoom de cada nível: só o nível adequado ao zoom atual é desenhado
+        with st.sidebar.expander("🗺️ Níveis e zoom"):
+            zoom_ranges = {}
+            for name in ["Províncias", "Municípios"] + list(level_tasks):
+                zoom_ranges[name] = st.slider(f"Zoom — {name}:", 0, MAX_ZOOM, (0, MAX_ZOOM), key=f"zoom_{name}")
+        # Intervalo completo = nível mostrado sempre
+        zoom_ranges = {name: (None if zoom == (0, MAX_ZOOM) else zoom) for name, zoom in zoom_ranges.items()}
+        levels = []
+        for name, task in level_tasks.items():
+            layer = loaded[task]
+            if layer is None:
+                message_placeholder.error(f"Erro ao carregar o nível '{name}'.")
+                return
+            min_zoom, max_zoom = zoom_ranges[name] or (None, None)
+            levels.append({"gdf": layer, "name": name, "min_zoom": min_zoom, "max_zoom": max_zoom})
+
         # Seleção de colunas para união e categorias
         with st.sidebar.expander(" 🔗 Selecione as colunas de União e dados"):
+            data_mode = st.radio("Tipo de tabela:", ["Dados por município", "Pontos (latitude/longitude)"], key="data_mode")
             join_column_shapefile = st.selectbox("Coluna de união (Shapefile):", [None] + list(gdf.columns))
-            join_column_data = st.selectbox("Coluna de união (Tabela):", [None] + list(data.columns))
-            categorical_column = st.selectbox("Coluna de categorias:", [None] + list(data.columns))
+            extra_indicators = []
+            period_column = None
+            comparison = False
+            comparison_panes = []
+            fuzzy_join = False
+            if data_mode == "Dados por município":
+                join_column_data = st.selectbox("Coluna de união (Tabela):", [None] + list(data.columns))
+                # União aproximada: nomes que diferem em acentos, maiúsculas, espaços ou abreviaturas
+                fuzzy_join = st.checkbox("União aproximada por nomes", key="fuzzy_join")
+                if fuzzy_join:
+                    block_column_shapefile = st.selectbox("Coluna de bloco (Shapefile), ex.: província:", [None] + list(gdf.columns), key="block_column_shapefile")
+                    block_column_data = st.selectbox("Coluna de bloco (Tabela):", [None] + list(data.columns), key="block_column_data")
+                    fuzzy_threshold = st.slider("Pontuação mínima:", min_value=0.5, max_value=1.0, value=FUZZY_MATCH_THRESHOLD, step=0.01, key="fuzzy_threshold")
+                categorical_column = st.selectbox("Coluna de categorias:", [None] + list(data.columns))
+                # Série temporal: um mapa com barra de períodos, sem duplicar a geometria
+                period_column = st.selectbox(
+                    "Coluna de período (série temporal):",
+                    [None] + [c for c in data.columns if c not in (join_column_data, categorical_column)],
+                    key="period_column"
+                )
+                # Indicadores adicionais partilham a geometria no mesmo arquivo HTML
+                if not period_column:
+                    extra_indicators = st.multiselect(
+                        "Indicadores adicionais (mesmo mapa):",
+                        [c for c in data.columns if c not in (join_column_data, categorical_column)],
+                        key="extra_indicators"
+                    )
+                # Painéis lado a lado sincronizados, um por indicador ou período
+                comparison = st.checkbox("🪟 Comparação lado a lado (painéis sincronizados)", key="comparison")
+                if comparison:
+                    # Cada painel é um mapa no navegador, por isso o número de painéis é limitado
+                    if period_column:
+                        pane_options = [f"{period_column}={period}" for period in sort_periods(data[period_column].dropna().unique())]
+                    else:
+                        pane_options = [column for column in [categorical_column, *extra_indicators] if column]
+                    comparison_panes = st.multiselect(
+                        f"Painéis a comparar (até {MAX_COMPARISON_PANES}):",
+                        pane_options,
+                        default=pane_options[:MAX_COMPARISON_PANES],
+                        max_selections=MAX_COMPARISON_PANES,
+                        key="comparison_panes"
+                    )
+            else:
+                # Pontos agregados por município: a tabela passa a ter uma linha por município
+                lat_column = st.selectbox("Coluna de latitude:", [None] + list(data.columns), key="lat_column")
+                lon_column = st.selectbox("Coluna de longitude:", [None] + list(data.columns), key="lon_column")
+                aggregations = {"Contagem": "count", "Soma": "sum", "Média": "mean"}
+                how = aggregations[st.selectbox("Agregação:", list(aggregations), key="points_how")]
+                value_column = None
+                if how != "count":
+                    value_column = st.selectbox("Coluna de valores:", [None] + list(data.columns), key="points_value")
+                join_column_data = categorical_column = None
+                if join_column_shapefile and lat_column and lon_column and (how == "count" or value_column):
+                    with track_memory("aggregate_points_to_polygons"):
+                        data = aggregate_points_to_polygons(data, lat_column, lon_column, gdf, join_column_shapefile, how=how, value_column=value_column)
+                    join_column_data = join_column_shapefile
+                    categorical_column = data.columns[-1]
+                    if data.attrs.get("pontos_fora"):
+                        st.caption(f"{data.attrs['pontos_fora']} pontos sem coordenadas válidas ou fora dos municípios.")
+
+        # Revisão da união aproximada: só as correspondências aceites entram na união
+        join_matches = None
+        if fuzzy_join and join_column_shapefile and join_column_data:
+            matches = match_layer_keys(gdf, data, join_column_shapefile, join_column_data, block_column_shapefile, block_column_data, fuzzy_threshold)
+            with st.expander(f"🔍 Correspondências da união aproximada ({int(matches['aceitar'].sum())} de {len(matches)} chaves aceites)"):
+                st.caption("Reveja as correspondências aproximadas e desmarque as incorretas na coluna \"aceitar\".")
+                join_matches = st.data_editor(
+                    matches,
+                    disabled=[column for column in matches.columns if column != "aceitar"],
+                    hide_index=True,
+                    key=f"join_matches_{join_column_shapefile}_{join_column_data}_{block_column_shapefile}_{block_column_data}_{fuzzy_threshold}"
+                )
+                st.download_button(
+                label="📥Baixar tabela de correspondências (CSV)",
+                data=join_matches.to_csv(index=False).encode("utf-8"),
+                file_name="correspondencias.csv",
+                mime="text/csv",
+                key="download_matches")
+
+        # Relatório de qualidade: todas as verificações de uma vez, para download
+        with st.expander("🩺 Qualidade dos dados"):
+            # O relatório guardado só é mostrado enquanto os arquivos e as colunas forem os mesmos
+            report_origin = (gdf.attrs.get("fonte"), gdf2.attrs.get("fonte"), data.attrs.get("fonte"), join_column_shapefile, join_column_data)
+            if st.button("Verificar dados", key="quality_check"):
+                with track_memory("quality_report"):
+                    summary, issues = quality_report(gdf, gdf2, data, join_column_shapefile, join_column_data, matches=join_matches)
+                st.session_state["quality_report"] = {"origem": report_origin, "resumo": summary, "xlsx": quality_report_excel(summary, issues), "problemas": len(issues)}
+            report = st.session_state.get("quality_report")
+            if report and report["origem"] == report_origin:
+                st.caption(f"{report['problemas']} problemas encontrados.")
+                st.dataframe(report["resumo"][report["resumo"]["ocorrências"] > 0], hide_index=True)
+                st.download_button(
+                label="📥Baixar relatório de qualidade (XLSX)",
+                data=report["xlsx"],
+                file_name="relatorio_qualidade.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="download_quality")
+
+        # Orçamento de memória da sessão
+        with st.sidebar.expander("📊 Memória"):
+            memory_budget_mb = st.number_input(
+                "Orçamento de memória (MB):",
+                min_value=min(64.0, MEMORY_BUDGET_MB), max_value=MEMORY_BUDGET_MB, value=MEMORY_BUDGET_MB, step=64.0,
+                key="memory_budget_mb"
+            )
+            if st.session_state.get("memory_stats"):
+                st.dataframe(pd.DataFrame(st.session_state["memory_stats"]).T)
+            st.caption("Cache de arquivos (partilhada entre sessões)")
+            st.json(get_data_cache().stats(), expanded=False)
+            st.caption("Cache de mapas gerados (em disco)")
+            st.json(get_render_cache().stats(), expanded=False)
 
         # Configuração dos limites
         with st.sidebar.expander("Configurar limites"):
@@ -269,20 +464,113 @@ def choropleth_tab():
 
         # Seleção de cores para categorias
         color_mapping = {}
-        map_buffer = None  # Inicializar map_buffer localmente
+        color_mode = "categorical"
+        map_export = None  # Inicializar map_export localmente
         with st.sidebar.expander("🎨 Selecione as cores"):
             if categorical_column and categorical_column in data.columns:
-                unique_categories = data[categorical_column].dropna().unique()
-                if len(unique_categories) > 0:
-                    cols = st.columns(min(len(unique_categories), 3))
-                    for i, category in enumerate(unique_categories):
-                        with cols[i % len(cols)]:
-                            color_mapping[category] = st.color_picker(f"Cor para {category}", "#FF0000", key=f"color_{category}")
+                # Colunas numéricas podem ser classificadas automaticamente em k classes
+                numeric_values = pd.to_numeric(data[categorical_column], errors="coerce")
+                is_numeric = numeric_values.nunique() > 1 and numeric_values.notna().sum() >= 0.9 * data[categorical_column].notna().sum()
+                classification = "manual"
+                if is_numeric:
+                    methods = {"manual": "Categorias (manual)", **CLASSIFICATION_METHODS, "continuous": "Escala contínua"}
+                    default_method = "quantiles" if numeric_values.nunique() > 12 else "manual"
+                    classification = st.selectbox(
+                        "Classificação:", list(methods), format_func=methods.get,
+                        index=list(methods).index(default_method), key="classification"
+                    )
+                if classification == "continuous":
+                    palette_name = st.selectbox("Paleta:", SEQUENTIAL_PALETTES, key="continuous_palette")
+                    color_mode = "continuous"
+                    color_mapping = continuous_colormap(palette_name, numeric_values, caption=categorical_column)
+                    st.markdown(color_mapping._repr_html_(), unsafe_allow_html=True)
+                elif classification != "manual":
+                    n_classes = st.slider("Número de classes:", min_value=2, max_value=9, value=5, step=1, key="n_classes")
+                    palette_name = st.selectbox("Paleta:", SEQUENTIAL_PALETTES, key="class_palette")
+                    edges, labels, classes = classify_values(numeric_values, n_classes, classification)
+                    class_column = f"{categorical_column} (classes)"
+                    data = data.copy(deep=False)
+                    data[class_column] = classes.astype(object)
+                    if "fonte" in data.attrs:
+                        data.attrs["fonte"] = f"{data.attrs['fonte']}:{classification}:{n_classes}"
+                    categorical_column = class_column
+                    color_mapping = dict(zip(labels, palette_from_colormap(palette_name, len(labels))))
+                    st.markdown(
+                        "".join(
+                            f'<div><span style="display:inline-block;width:14px;height:14px;background:{color};margin-right:8px;"></span>{label}</div>'
+                            for label, color in color_mapping.items()
+                        ),
+                        unsafe_allow_html=True
+                    )
                 else:
-                    message_placeholder.warning("A coluna de categorias selecionada não contém valores válidos. Selecione uma coluna com dados.")
+                    unique_categories = sorted(data[categorical_column].dropna().unique(), key=str)
+                    if len(unique_categories) > 0:
+                        # Paleta automática; só as categorias escolhidas recebem um seletor de cor
+                        col1, col2 = st.columns([0.5, 0.5])
+                        with col1:
+                            scheme = st.selectbox(
+                                "Esquema:", list(PALETTE_SCHEMES), format_func=lambda k: PALETTE_SCHEMES[k][0], key="palette_scheme"
+                            )
+                        with col2:
+                            palette_name = st.selectbox("Paleta:", PALETTE_SCHEMES[scheme][1], key=f"palette_{scheme}")
+                        color_mapping = generate_palette(unique_categories, scheme, palette_name)
+                        overrides = st.multiselect("Personalizar cores de:", unique_categories, key="color_overrides")
+                        if overrides:
+                            cols = st.columns(min(len(overrides), 3))
+                            for i, category in enumerate(overrides):
+                                with cols[i % len(cols)]:
+                                    color_mapping[category] = st.color_picker(f"Cor para {category}", color_mapping[category], key=f"color_{category}")
+                        st.markdown(
+                            "".join(
+                                f'<div style="display:inline-block;margin:0 10px 4px 0;"><span style="display:inline-block;width:12px;height:12px;background:{color};margin-right:4px;"></span>{html.escape(str(category))}</div>'
+                                for category, color in color_mapping.items()
+                            ),
+                            unsafe_allow_html=True
+                        )
+                    else:
+                        message_placeholder.warning("A coluna de categorias selecionada não contém valores válidos. Selecione uma coluna com dados.")
             else:
                 message_placeholder.info("Selecione uma coluna de categorias para configurar as cores.")
 
+        # Filtro de categorias (o índice por categoria é calculado uma vez por união)
+        visible_categories = None
+        hidden_mode = "hide"
+        if color_mode == "categorical" and color_mapping and (not period_column or comparison):
+            with st.sidebar.expander("🔎 Filtrar categorias"):
+                selected_categories = st.multiselect("Categorias a mostrar:", list(color_mapping), default=list(color_mapping), key="visible_categories")
+                hidden_modes = {"hide": "Ocultar", "background": "Mostrar em cinza (camada de fundo)"}
+                hidden_mode = st.radio("Restantes municípios:", list(hidden_modes), format_func=hidden_modes.get, key="hidden_mode")
+                if len(selected_categories) < len(color_mapping):
+                    visible_categories = selected_categories
+
+        # Exportação estática (relatórios), além do HTML interativo
+        with st.sidebar.expander("🖼️ Exportação estática"):
+            static_format = st.selectbox("Formato da imagem:", [None] + list(STATIC_FORMATS), format_func=lambda f: "Nenhuma" if f is None else f.upper(), key="static_format")
+            static_dpi = st.number_input("Resolução (DPI, PNG):", min_value=72, max_value=600, value=200, step=50, key="static_dpi")
+            static_title = st.text_input("Título da imagem:", "", key="static_title")
+
+        # Camadas de fundo e controlos: o mapa exportado só inclui o que for escolhido
+        with st.sidebar.expander("🧩 Controlos e camadas de fundo"):
+            basemaps = st.multiselect("Camadas de fundo (a primeira fica ativa):", list(BASEMAPS), default=DEFAULT_BASEMAPS, key="basemaps")
+            controls = st.multiselect(
+                "Controlos do mapa:",
+                list(MAP_CONTROLS),
+                default=DEFAULT_MAP_CONTROLS,
+                format_func=lambda key: f"{MAP_CONTROLS[key]['nome']} (~{MAP_CONTROLS[key]['custo_kb']} KB)",
+                key="map_controls"
+            )
+            st.caption(f"Bibliotecas dos controlos: ~{map_controls_cost(controls)} KB")
+
+        # Compressão do download (o HTML de mapas grandes comprime bem)
+        with st.sidebar.expander("📦 Download"):
+            compressions = {None: "Nenhuma (.html)", "gzip": "gzip (.html.gz)", "zip": "zip (.zip)"}
+            download_compression = st.selectbox("Compressão do arquivo:", list(compressions), format_func=compressions.get, key="download_compression")
+            offline_export = st.checkbox("Mapa offline (bibliotecas incluídas no HTML)", key="offline_export")
+        download_label = "📥Baixar Mapa como HTML" + (f" ({download_compression})" if download_compression else "")
+
+        # Pré-visualização no aplicativo: a cada deslocamento ou zoom, só a área visível é enviada
+        live_view = st.sidebar.checkbox("👁️ Pré-visualizar no aplicativo (só a área visível)", key="live_view")
+
         # Botão para gerar o mapa
         col1, col2=st.columns(2)
         with col1:
@@ -290,7 +578,7 @@ def choropleth_tab():
                 st.progress(2, text="Validação das configurações obrigatórias...")
                 #message_placeholder.success("Validação as configurações obrigatórias ✔")
                 # Validar configurações obrigatórias
-                if not (shapefile_zip2 and shapefile_zip and excel_file):
+                if not (prov_ready and mun_ready and excel_file):
                     message_placeholder.error("Faça o upload de todos os arquivos necessários (shapefiles e tabela de dados).")
                     return
                 if not (join_column_shapefile and join_column_data):
@@ -311,9 +599,70 @@ def choropleth_tab():
                 #message_placeholder.info("União dados...")
                 st.progress(10, text="União de dados.")
                 #message_placeholder.success("União de dados ✔")
+                needed_columns = {join_column_shapefile, join_column_data, categorical_column, period_column, *extra_indicators}
+                if mun_label_config.get("column"):
+                    needed_columns.add(mun_label_config["column"])
+                if parent_column:
+                    needed_columns.add(parent_column)
+                gdf, data, budget_actions = enforce_memory_budget(gdf, data, columns=needed_columns, budget_mb=memory_budget_mb)
+                if gdf is None:
+                    message_placeholder.error("O trabalho excede o orçamento de memória da sessão, mesmo após simplificar as geometrias. Reduza o tamanho dos arquivos.")
+                    return
+                if budget_actions:
+                    message_placeholder.warning("Orçamento de memória: " + "; ".join(budget_actions) + ".")
+
+                # Mapas já gerados com os mesmos arquivos e a mesma configuração saem da cache em disco
+                render_config = {
+                    "join": (join_column_shapefile, join_column_data),
+                    "matches": None if join_matches is None else join_matches.loc[join_matches["aceitar"].astype(bool), ["chave (tabela)", "chave (shapefile)"]].astype(str).values,
+                    "column": categorical_column,
+                    "period_column": period_column,
+                    "extra_indicators": extra_indicators,
+                    "comparison": comparison and list(comparison_panes),
+                    "color_mode": color_mode,
+                    "color_mapping": color_mapping,
+                    "visible_categories": visible_categories,
+                    "hidden_mode": hidden_mode,
+                    "prov_label_config": prov_label_config,
+                    "mun_label_config": mun_label_config,
+                    "borders": (prov_border_width, prov_border_color, mun_border_width, mun_border_color),
+                    "levels": [(level["name"], level["min_zoom"], level["max_zoom"]) for level in levels],
+                    "zoom": (zoom_ranges["Províncias"], zoom_ranges["Municípios"]),
+                    "offline": offline_export,
+                    "basemaps": basemaps,
+                    "controls": controls,
+                }
+                render_sources = [gdf, gdf2, data] + [level["gdf"] for level in levels]
+                render_key = render_cache_key(render_sources, render_config)
+                static_key = None
+                if static_format and not comparison:
+                    static_key = render_cache_key(render_sources, {**render_config, "static": (static_format, static_dpi, static_title)})
+                cached_export = load_cached_export(render_key, download_compression) if render_key else None
+                cached_static = get_render_cache().open(static_key, f"mapa.{static_format}") if cached_export and static_key else None
+                if cached_export and (cached_static or not static_key):
+                    st.progress(100, text="Mapa finalizado. Pise no botão **Baixar** abaixo para fazer download do mapa")
+                    message_placeholder.success("Mapa recuperado da cache (mesmos arquivos e configuração).")
+                    st.download_button(
+                    label=download_label,
+                    data=export_reader(cached_export),
+                    file_name=cached_export["file_name"],
+                    mime=cached_export["mime"],
+                    key="download_mapq")
+                    if cached_static:
+                        with cached_static:
+                            st.download_button(
+                            label=f"🖼️Baixar Mapa como {static_format.upper()}",
+                            data=cached_static.read(),
+                            file_name=f"mapa.{static_format}",
+                            mime=STATIC_FORMATS[static_format],
+                            key="download_map_static")
+                    return
                 try:
-                    gdf = gdf.merge(data, left_on=join_column_shapefile, right_on=join_column_data, how="left")
-                    time.sleep(5)
+                    # A preparação das geometrias e a união ficam em cache: mudar o filtro não as repete
+                    with track_memory("merge"):
+                        if period_column:
+                            data = pivot_periods(data, join_column_data, period_column, categorical_column)
+                        gdf = join_layers(gdf, data, join_column_shapefile, join_column_data, matches=join_matches)
                     message_placeholder.success("Dados unidos com sucesso!")
                 except ValueError as e:
                     message_placeholder.error(f"Erro ao unir os dados: {e}. Verifique se as colunas selecionadas contêm valores compatíveis (ex.: mesmo tipo de dado).")
@@ -323,38 +672,96 @@ def choropleth_tab():
                     return
     
                 # Verificar se a coluna categórica existe no gdf após a união
-                if categorical_column not in gdf.columns:
+                if not period_column and categorical_column not in gdf.columns:
                     message_placeholder.error(f"A coluna de categorias '{categorical_column}' não foi encontrada no shapefile após a união.")
                     return
+                category_index = build_category_index(gdf, categorical_column) if visible_categories is not None and not period_column else None
     
                 # Criar o mapa
                 #message_placeholder.info("Gerando mapa...")
                 st.progress(50, text="Construção do mapa...")
                 #message_placeholder.success("Dados unidos com sucesso!")
                 
-                m = create_choropleth_map(
-                    gdf,
-                    gdf2,
-                    categorical_column,
-                    color_mapping,
-                    join_column_data,
-                    prov_label_config=prov_label_config,
-                    mun_label_config=mun_label_config,
-                    prov_border_width=prov_border_width,
-                    prov_border_color=prov_border_color,
-                    mun_border_width=mun_border_width,
-                    mun_border_color=mun_border_color
-                )
+                # Com indicadores adicionais, cada um recebe cores automáticas;
+                # numa série temporal, todos os períodos usam as mesmas cores
+                if period_column:
+                    indicator_mappings = {column: color_mapping for column in data.columns if column != join_column_data}
+                else:
+                    indicator_mappings = {categorical_column: color_mapping}
+                    for column in extra_indicators:
+                        indicator_mappings[column] = default_color_mapping(gdf[column], title=column)
+                multiple_indicators = len(indicator_mappings) > 1 or bool(period_column)
+                if comparison:
+                    indicator_mappings = {column: mapping for column, mapping in indicator_mappings.items() if column in comparison_panes}
+                    if len(indicator_mappings) < 2:
+                        message_placeholder.error("A comparação lado a lado requer pelo menos dois painéis: selecione indicadores adicionais ou períodos.")
+                        return
+
+                with track_memory("create_choropleth_map"):
+                    if comparison:
+                        m = create_comparison_map(
+                            gdf,
+                            gdf2,
+                            [
+                                # O filtro de categorias vale para os painéis com as cores da coluna de categorias
+                                {"column": column, "color_mapping": mapping, "visible_categories": visible_categories if mapping is color_mapping else None}
+                                for column, mapping in indicator_mappings.items()
+                            ],
+                            join_column_data,
+                            prov_label_config=prov_label_config,
+                            mun_label_config=mun_label_config,
+                            prov_border_width=prov_border_width,
+                            prov_border_color=prov_border_color,
+                            mun_border_width=mun_border_width,
+                            mun_border_color=mun_border_color,
+                            hidden_mode=hidden_mode,
+                            levels=levels,
+                            prov_zoom=zoom_ranges["Províncias"],
+                            mun_zoom=zoom_ranges["Municípios"],
+                            parent_column=parent_column
+                        )
+                    else:
+                        m = create_choropleth_map(
+                            gdf,
+                            gdf2,
+                            list(indicator_mappings) if multiple_indicators else categorical_column,
+                            indicator_mappings if multiple_indicators else color_mapping,
+                            join_column_data,
+                            prov_label_config=prov_label_config,
+                            mun_label_config=mun_label_config,
+                            prov_border_width=prov_border_width,
+                            prov_border_color=prov_border_color,
+                            mun_border_width=mun_border_width,
+                            mun_border_color=mun_border_color,
+                            color_mode=color_mode,
+                            colormap=color_mapping if color_mode == "continuous" else None,
+                            visible_categories=visible_categories,
+                            hidden_mode=hidden_mode,
+                            category_index=category_index,
+                            indicator_control="slider" if period_column else "select",
+                            levels=levels,
+                            prov_zoom=zoom_ranges["Províncias"],
+                            mun_zoom=zoom_ranges["Municípios"],
+                            basemaps=basemaps,
+                            controls=controls,
+                            parent_column=parent_column
+                        )
                 message_placeholder.empty()
     
                 if m:
                     message_placeholder.success("Mapa gerado com sucesso!")
                     st.progress(60, text="Adição da legenda...")
-                    add_legend(m, color_mapping, categorical_column)
-                    # Gerar o buffer para download
-                    map_buffer = io.BytesIO()
-                    m.save(map_buffer, close_file=False)
-                    map_buffer = map_buffer.getvalue()
+                    # Na comparação, cada painel já inclui a sua legenda
+                    if extra_indicators and not comparison:
+                        for i, (column, mapping) in enumerate(indicator_mappings.items()):
+                            add_legend(m, mapping, column, indicator=column, visible=(i == 0))
+                    elif not comparison:
+                        add_legend(m, color_mapping, categorical_column)
+                    # Gerar o arquivo para download: HTML escrito por partes num arquivo temporário,
+                    # do qual a sessão guarda apenas o descritor
+                    with track_memory("export_map"):
+                        map_export = store_map_export(m, compression=download_compression, cache_key=render_key, offline=offline_export)
+                    del m
                     message_placeholder.success("Legenda gerada com sucesso")
                     # Renderizar o mapa
                     #message_placeholder.info("Preparando o mapa para download...")
@@ -365,18 +772,51 @@ def choropleth_tab():
                         
                         #map_html = m._repr_html_()
                         #st.components.v1.html(map_html, height=600, scrolling=True)
-                        if map_buffer:
+                        if map_export:
                             st.download_button(
-                            label="📥Baixar Mapa como HTML",
-                            data=map_buffer,
-                            file_name="mapa.html",
-                            mime="text/html",
+                            label=download_label,
+                            data=export_reader(map_export),
+                            file_name=map_export["file_name"],
+                            mime=map_export["mime"],
                             key="download_mapq")
+                            if map_export["missing_assets"]:
+                                st.caption(f"{len(map_export['missing_assets'])} bibliotecas sem cópia local continuam a ser carregadas da internet (ver vendor/ no README).")
+                        # A imagem estática mostra o primeiro indicador (ou período)
+                        if static_format and not comparison:
+                            static_column, static_mapping = next(iter(indicator_mappings.items()))
+                            try:
+                                with track_memory("render_static_map"):
+                                    static_buffer = render_static_map(
+                                        gdf,
+                                        gdf2,
+                                        static_column,
+                                        static_mapping,
+                                        title=static_title or None,
+                                        legend_title=categorical_column,
+                                        prov_label_config=prov_label_config,
+                                        mun_label_config=mun_label_config,
+                                        prov_border_width=prov_border_width,
+                                        prov_border_color=prov_border_color,
+                                        mun_border_width=mun_border_width,
+                                        mun_border_color=mun_border_color,
+                                        visible_categories=visible_categories,
+                                        hidden_mode=hidden_mode,
+                                        format=static_format,
+                                        dpi=static_dpi
+                                    )
+                                if static_key:
+                                    get_render_cache().put_bytes(static_key, f"mapa.{static_format}", static_buffer)
+                                st.download_button(
+                                label=f"🖼️Baixar Mapa como {static_format.upper()}",
+                                data=static_buffer,
+                                file_name=f"mapa.{static_format}",
+                                mime=STATIC_FORMATS[static_format],
+                                key="download_map_static")
+                            except Exception as e:
+                                message_placeholder.warning(f"Não foi possível gerar a imagem estática: {e}")
     
                         message_placeholder.success("Todos elementos foram adicionados ao mapa com sucesso!")
 
-                        time.sleep(5)
-                        message_placeholder.empty()
                         # Exportação do mapa com nome personalizado
                         #if map_buffer and st.checkbox("Salvar mapa"):
                             #nome = st.text_input("Nome do mapa:", "meu_mapa")
@@ -409,9 +849,54 @@ def choropleth_tab():
                     #key="download_map"
                 #)
     
-            elif shapefile_zip2 and shapefile_zip and excel_file:
+            elif prov_ready and mun_ready and excel_file:
                 #message_placeholder.info("Pise no botão **Fazer Mapa** para construir o mapa.") 
                 message_placeholder.info("Faça o upload de todos os arquivos necessários (shapefiles e tabela de dados).")
+                # O último mapa gerado continua disponível depois de outras interações
+                map_export = st.session_state.get("map_export")
+                if map_export:
+                    st.download_button(
+                    label=f"📥Baixar o último mapa gerado ({map_export['file_name']})",
+                    data=export_reader(map_export),
+                    file_name=map_export["file_name"],
+                    mime=map_export["mime"],
+                    key="download_map_last")
+                # O mapa base é fixo; o st_folium devolve a área e o zoom atuais e só a
+                # camada das feições visíveis (simplificadas para o zoom) é substituída
+                if live_view:
+                    if not (join_column_shapefile and join_column_data and categorical_column and color_mapping):
+                        st.info("Selecione as colunas de união e de categorias para pré-visualizar o mapa.")
+                    elif period_column:
+                        st.info("A pré-visualização não inclui séries temporais; gere o mapa para as ver.")
+                    else:
+                        try:
+                            view_gdf = join_layers(gdf, data, join_column_shapefile, join_column_data, matches=join_matches)
+                            west, south, east, north = view_gdf.total_bounds
+                            bounds, zoom = map_view_state(st.session_state.get("live_view_map"), (west, south, east, north), 6)
+                            view_layer, n_visible = build_view_layer(
+                                view_gdf,
+                                categorical_column,
+                                color_mapping,
+                                join_column_data,
+                                bounds,
+                                zoom,
+                                border_color=mun_border_color,
+                                border_width=mun_border_width
+                            )
+                            view_map = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=6, tiles=None)
+                            add_basemaps(view_map, basemaps[:1])
+                            view_map.fit_bounds([[south, west], [north, east]])
+                            st_folium(
+                                view_map,
+                                key="live_view_map",
+                                height=600,
+                                use_container_width=True,
+                                returned_objects=["bounds", "zoom"],
+                                feature_group_to_add=view_layer
+                            )
+                            st.caption(f"{n_visible} de {len(view_gdf)} municípios enviados para a área visível (zoom {zoom}).")
+                        except Exception as e:
+                            message_placeholder.error(f"Erro na pré-visualização do mapa: {e}")
             
             
             else:
@@ -557,62 +1042,9 @@ with tab1:
         #shapefile_zip = st.file_uploader("Shapefile dos Municípios (.zip)", type=["zip"])
 
 
-    # Camadas de fundo
-    folium.TileLayer("OpenStreetMap", name="Ruas", attr="pav@ngola.com", show=False).add_to(m)
-    folium.TileLayer("CartoDB positron", name="Cartografia", attr="Tiles © CartoDB").add_to(m)
-    folium.TileLayer(tiles = 'https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}',
-        attr = 'Google',
-        name = 'Google Maps',
-        overlay = False,
-        control = True
-    ).add_to(m)
-    folium.TileLayer(tiles = 'https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
-        attr = 'Google',
-        name = 'Google Satellite',
-        overlay = True,
-        control = True
-    ).add_to(m)
-    ########################
-
-    folium.TileLayer(tiles = 'https://mt1.google.com/vt/lyrs=p&x={x}&y={y}&z={z}',
-            attr = 'Google',
-            name = 'Google Terrain',
-            overlay = True,
-            control = True
-        ).add_to(m)
-    folium.TileLayer(tiles = 'https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}',
-            attr = 'Google',
-            name = 'Google Satellite',
-            overlay = True,
-            control = True
-        ).add_to(m)
-    folium.TileLayer(tiles = 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-            attr = 'Esri',
-            name = 'Esri Satellite',
-            overlay = True,
-            control = True
-        ).add_to(m)
-    LocateControl(position="topright", strings={"title": "See you current location", "popup": "Your position"} ).add_to(m)
-    minimap = MiniMap(toggle_display=True, position="bottomright")
-    minimap.add_to(m)
-    folium.LayerControl(position="topleft", collapsed=True).add_to(m)
-
-    # Controles
-    #folium.LayerControl(position="topleft", collapsed=True).add_to(m)
-    Fullscreen(position="topleft").add_to(m)
-    MousePosition(position="topright", separator=" | ").add_to(m)
-    m.add_child(MeasureControl(position="topleft", secondary_length_unit='kilometers'))
-    #folium.plugins.Geocoder(position="topleft").add_to(m)
-    folium.plugins.Geocoder(
-        position="topleft",
-        collapsed=True,        # toggle (caixa recolhida)
-        add_marker=False,       # adiciona marcador no resultado
-        placeholder="Digite um local...",
-        popup_on_found=True,
-        zoom=12
-    ).add_to(m)
-
-    
+    # Camadas de fundo e controlos (registo comum com o mapa coroplético)
+    add_basemaps(m, ["Fundo Cartográfico", "Ruas", "Google Maps", "Google Satellite", "Google Híbrido", "Google Terrain", "Esri Satellite"])
+    add_map_controls(m, ["locate", "minimap", "layers", "fullscreen", "mouse_position", "measure", "geocoder"])
 
     # Adiciona a ferramenta de desenho
     draw = Draw(
@@ -639,6 +1071,19 @@ with tab1:
         height=800,
         returned_objects=["all_drawings"]  # ou "last_active_drawing"
     )
+
+    # Consulta espacial da camada carregada com os desenhos (polígonos, retângulos e círculos)
+    if shapefile_prov and gdf_prov is not None and map_data and map_data.get("all_drawings"):
+        shapes = drawings_to_geometries(map_data["all_drawings"])
+        if len(shapes):
+            features, summary = query_layer_by_shapes(gdf_prov, shapes)
+            st.markdown(f"**{features.index.nunique()} feições intersectam os desenhos**")
+            st.dataframe(summary, hide_index=True)
+            attributes = features.drop(columns=features.geometry.name)
+            numeric = attributes.drop(columns="desenho").apply(pd.to_numeric, errors="coerce").dropna(axis=1, how="all")
+            if not numeric.empty:
+                st.dataframe(numeric.describe().T)
+            st.dataframe(attributes, hide_index=True)
     
 
 
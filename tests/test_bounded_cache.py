@@ -0,0 +1,77 @@
+import pytest
+
+import utils1a
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils1a.cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lru_evicts_least_recent():
+    cache = utils1a.BoundedCache(30, policy="lru")
+    cache.put("a", "A", 10)
+    cache.put("b", "B", 10)
+    cache.put("c", "C", 10)
+    cache.get("a")
+
+    cache.put("d", "D", 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.stats()["despejos"] == 1
+
+
+def test_lfu_keeps_frequent_entries():
+    cache = utils1a.BoundedCache(30, policy="lfu")
+    for key in "abc":
+        cache.put(key, key.upper(), 10)
+    for _ in range(3):
+        cache.get("a")
+        cache.get("c")
+
+    cache.put("d", "D", 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_entry_larger_than_budget_is_not_stored():
+    cache = utils1a.BoundedCache(10)
+    cache.put("a", "A", 11)
+
+    assert cache.get("a") is None
+    assert cache.current_bytes == 0
+
+
+def test_ttl_slides_on_access(clock):
+    cache = utils1a.BoundedCache(100, ttl=60)
+    cache.put("hot", "H", 10)
+    cache.put("cold", "C", 10)
+    for _ in range(3):
+        clock[0] += 40
+        assert cache.get("hot") == "H"
+
+    assert cache.get("cold") is None
+    assert cache.stats()["expirações"] == 1
+    clock[0] += 61
+    assert cache.get("hot") is None
+
+
+def test_lfu_counts_decay():
+    cache = utils1a.BoundedCache(20, policy="lfu", decay_every=8)
+    cache.put("old", "O", 10)
+    for _ in range(7):
+        cache.get("old")
+    cache.put("new", "N", 10)
+    # Oitavo acesso: as contagens passam a metade (old 8 -> 4, new 2 -> 1)
+    cache.get("new")
+    for _ in range(4):
+        cache.get("new")
+
+    cache.put("next", "X", 10)
+
+    assert cache.get("old") is None
+    assert cache.get("new") == "N"
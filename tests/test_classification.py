@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils1a
+
+
+def test_natural_breaks_separates_clusters():
+    values = np.array([22, 1, 11, 3, 20, 2, 12, 10, 21], dtype=float)
+
+    assert utils1a.styles._natural_breaks(values, 3) == [3, 12]
+
+
+def test_natural_breaks_weights_repeated_values():
+    # Muitos zeros puxam a quebra para baixo face aos valores únicos
+    values = np.concatenate([np.zeros(50), np.linspace(1, 100, 10)])
+
+    assert utils1a.styles._natural_breaks(values, 2)[0] < utils1a.styles._natural_breaks(np.unique(values), 2)[0]
+
+
+@pytest.mark.parametrize("method", ["equal_interval", "quantiles", "natural_breaks"])
+def test_classify_values_covers_the_range(method):
+    rng = np.random.default_rng(1)
+    values = pd.Series(np.concatenate([rng.exponential(10, 5000), [np.nan]]))
+
+    edges, labels, classes = utils1a.classify_values(values, 5, method, sample_size=500)
+
+    assert edges[0] == np.nanmin(values) and edges[-1] == np.nanmax(values)
+    assert len(labels) == len(edges) - 1 <= 5
+    assert classes.isna().sum() == 1
+    assert set(classes.dropna()) <= set(labels)
+
+
+def test_classify_values_rejects_text():
+    with pytest.raises(ValueError):
+        utils1a.classify_values(pd.Series(["a", "b"]))
+
+
+@pytest.mark.parametrize("method", ["equal_interval", "quantiles", "natural_breaks"])
+def test_labels_stay_distinct_for_close_values(method):
+    values = [1 + i * 1e-5 for i in range(1, 10)]
+
+    edges, labels, classes = utils1a.classify_values(values, 5, method)
+
+    assert len(set(labels)) == len(labels) == len(edges) - 1
+    assert classes.notna().all()
+
+
+def test_labels_avoid_exponent_notation():
+    _, labels, _ = utils1a.classify_values([0, 250000, 500000, 1000000], 2, "equal_interval")
+
+    assert labels == ["0 – 500,000", "500,000 – 1,000,000"]
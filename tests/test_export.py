@@ -0,0 +1,44 @@
+import gzip
+import io
+import itertools
+import zipfile
+
+import branca.element
+import folium
+import pytest
+import shapely
+
+import utils1a
+
+
+@pytest.fixture
+def build_map(monkeypatch):
+    """Constrói o mesmo mapa várias vezes, com os mesmos identificadores."""
+    def build():
+        counter = itertools.count()
+        monkeypatch.setattr(branca.element.Element, "_generate_id", classmethod(lambda cls: f"{next(counter):032x}"))
+        m = folium.Map(location=[0, 0], zoom_start=4, tiles=None)
+        folium.GeoJson(shapely.geometry.mapping(shapely.box(0, 0, 1, 1)), tooltip="quadrado").add_to(m)
+        folium.LayerControl().add_to(m)
+        return m
+    return build
+
+
+def test_render_document_matches_render(build_map):
+    streamed = "".join(utils1a.render_document(build_map().get_root()))
+
+    assert streamed == build_map().get_root().render()
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "zip"])
+def test_export_map_writes_the_whole_document(build_map, compression):
+    handle, file_name, mime, missing = utils1a.export_map(build_map(), compression, chunk_size=64)
+    data = handle.read()
+    if compression == "gzip":
+        data = gzip.decompress(data)
+    elif compression == "zip":
+        data = zipfile.ZipFile(io.BytesIO(data)).read("mapa.html")
+
+    assert data.decode("utf-8") == build_map().get_root().render()
+    assert (file_name, mime) == utils1a.EXPORT_COMPRESSIONS[compression]
+    assert missing == []
@@ -0,0 +1,168 @@
+import sys
+import time
+import types
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+import shapely
+
+import geometry_worker
+import utils1a
+
+OPERATIONS = [
+    ("to_crs", {"source": "EPSG:4326", "target": "EPSG:3857"}),
+    ("repair", {}),
+    ("simplify", {"tolerance": 1000}),
+]
+
+
+def polygons(n):
+    geometries = np.array([shapely.box(i * 0.1, 0, i * 0.1 + 0.1, 0.1).buffer(0.01) for i in range(n)], dtype=object)
+    geometries[1] = shapely.MultiPolygon([shapely.box(0, 1, 0.1, 1.1), shapely.box(0.2, 1, 0.3, 1.1)])
+    geometries[4] = shapely.Polygon([(0, 2), (0.1, 2.1), (0.1, 2), (0, 2.1), (0, 2)])  # inválida
+    geometries[6] = None
+    return geometries
+
+
+class Pool:
+    """Pool em threads com o mesmo protocolo de GeometryPool.use."""
+
+    def __init__(self, monkeypatch, broken=False):
+        self.broken = broken
+        self.calls = 0
+        monkeypatch.setattr(utils1a.geometry, "get_geometry_pool", lambda: self)
+        monkeypatch.setattr(utils1a.geometry, "GEOMETRY_PARALLEL_MIN", 0)
+
+    @contextmanager
+    def use(self, workers):
+        self.calls += 1
+        yield self
+
+    def map(self, *iterables):
+        if self.broken:
+            raise BrokenProcessPool("processo terminado")
+        with ThreadPoolExecutor(2) as pool:
+            return list(pool.map(*iterables))
+
+
+def assert_same(result, expected):
+    assert len(result) == len(expected)
+    assert list(shapely.get_type_id(result)) == list(shapely.get_type_id(expected))
+    assert shapely.equals_exact(result, expected, tolerance=1e-6)[~shapely.is_missing(expected)].all()
+
+
+def test_shared_memory_matches_in_process(monkeypatch):
+    pool = Pool(monkeypatch)
+    shared = []
+    share = utils1a.geometry._share_geometries
+    monkeypatch.setattr(utils1a.geometry, "_share_geometries", lambda geometries: shared.append(share(geometries)) or shared[-1])
+    geometries = polygons(23)
+
+    result = utils1a.process_geometries(geometries, OPERATIONS, workers=2, chunk_size=5)
+
+    assert pool.calls == 1 and shared[0] is not None
+    assert "single" in shared[0][1] and "missing" in shared[0][1]
+    assert_same(result, geometry_worker.apply_geometry_operations(geometries, OPERATIONS))
+    for name, _, _ in shared[0][1].values():
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_process_pool_matches_in_process(monkeypatch):
+    monkeypatch.setattr(utils1a.geometry, "GEOMETRY_PARALLEL_MIN", 0)
+    pool = utils1a.GeometryPool(idle_seconds=0.1)
+    monkeypatch.setattr(utils1a.geometry, "get_geometry_pool", lambda: pool)
+    geometries = polygons(15)
+
+    result = utils1a.process_geometries(geometries, OPERATIONS, workers=2, chunk_size=4)
+
+    assert_same(result, geometry_worker.apply_geometry_operations(geometries, OPERATIONS))
+    assert pool.running()
+    time.sleep(0.5)
+    assert not pool.running()
+
+
+def test_workers_skip_streamlit_and_main_script(monkeypatch, tmp_path):
+    marker = tmp_path / "executado"
+    script = tmp_path / "app.py"
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(script)
+    main.__spec__ = None
+    monkeypatch.setitem(sys.modules, "__main__", main)
+    pool = utils1a.GeometryPool(idle_seconds=0.1)
+
+    with pool.use(1) as executor:
+        modules = executor.submit(eval, "sorted(__import__('sys').modules)").result()
+        executor.submit(geometry_worker.process_geometry_chunk, ("wkb", shapely.to_wkb(polygons(8))), 0, 8, OPERATIONS).result()
+        modules_after = executor.submit(eval, "sorted(__import__('sys').modules)").result()
+
+    assert sys.modules["__main__"] is main
+    assert not marker.exists()
+    for imported in (modules, modules_after):
+        assert "streamlit" not in imported and "utils1a" not in imported
+    assert "geometry_worker" in modules_after
+
+
+def test_empty_geometries_fall_back_to_wkb(monkeypatch):
+    Pool(monkeypatch)
+    geometries = polygons(11)
+    geometries[8] = shapely.Polygon()
+    assert utils1a.geometry._share_geometries(geometries) is None
+
+    result = utils1a.process_geometries(geometries, OPERATIONS, workers=2, chunk_size=3)
+
+    assert_same(result, geometry_worker.apply_geometry_operations(geometries, OPERATIONS))
+    assert shapely.is_empty(result[8])
+
+
+@pytest.mark.parametrize("operation", ["centroid", "representative_point"])
+def test_point_operations_keep_order(monkeypatch, operation):
+    Pool(monkeypatch)
+    geometries = polygons(9)
+
+    result = utils1a.process_geometries(geometries, [(operation, {})], workers=2, chunk_size=2)
+
+    assert_same(result, geometry_worker.apply_geometry_operations(geometries, [(operation, {})]))
+    assert result[6] is None
+
+
+def test_broken_pool_falls_back_to_in_process(monkeypatch):
+    pool = Pool(monkeypatch, broken=True)
+    geometries = polygons(12)
+
+    result = utils1a.process_geometries(geometries, OPERATIONS, workers=2, chunk_size=4)
+
+    assert pool.calls == 1
+    assert_same(result, geometry_worker.apply_geometry_operations(geometries, OPERATIONS))
+
+
+def test_broken_pool_is_replaced():
+    pool = utils1a.GeometryPool(idle_seconds=60)
+    with pytest.raises(BrokenProcessPool):
+        with pool.use(1) as executor:
+            raise BrokenProcessPool("processo terminado")
+    assert not pool.running()
+
+    with pool.use(1) as replacement:
+        assert replacement is not executor
+        assert replacement.submit(abs, -3).result() == 3
+    replacement.shutdown()
+
+
+def test_small_layers_skip_the_pool(monkeypatch):
+    pool = Pool(monkeypatch)
+    monkeypatch.setattr(utils1a.geometry, "GEOMETRY_PARALLEL_MIN", 100)
+
+    utils1a.process_geometries(polygons(10), OPERATIONS, workers=2)
+
+    assert pool.calls == 0
+
+
+def test_unknown_operation():
+    with pytest.raises(ValueError):
+        geometry_worker.apply_geometry_operations(polygons(8), [("buffer", {})])
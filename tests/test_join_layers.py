@@ -0,0 +1,37 @@
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+import utils1a
+
+
+def layer(names):
+    return gpd.GeoDataFrame({"NOME": names}, geometry=[shapely.box(i, 0, i + 1, 1) for i in range(len(names))], crs="EPSG:4326")
+
+
+def test_join_with_matches_keeps_single_key_column():
+    gdf = layer(["Luanda", "Benguela", "Huambo"])
+    data = pd.DataFrame({"NOME": ["LUANDA", "Benguela", "Namibe"], "valor": [1, 2, 3]})
+    matches = pd.DataFrame({"chave (tabela)": ["LUANDA"], "chave (shapefile)": ["Luanda"], "aceitar": [True]})
+
+    merged = utils1a.join_layers(gdf, data, "NOME", "NOME", matches=matches)
+
+    assert "NOME_x" not in merged.columns and "NOME_y" not in merged.columns
+    values = merged.set_index("NOME")["valor"]
+    assert values["Luanda"] == 1 and values["Benguela"] == 2
+    assert pd.isna(values["Huambo"])
+
+
+def test_join_with_matches_ignores_rejected_rows():
+    gdf = layer(["Luanda", "Huambo"])
+    data = pd.DataFrame({"municipio": ["LUANDA", "Uambo"], "valor": [1, 2]})
+    matches = pd.DataFrame({
+        "chave (tabela)": ["LUANDA", "Uambo"],
+        "chave (shapefile)": ["Luanda", "Huambo"],
+        "aceitar": [True, False],
+    })
+
+    merged = utils1a.join_layers(gdf, data, "NOME", "municipio", matches=matches).set_index("NOME")
+
+    assert merged.loc["Luanda", "valor"] == 1
+    assert pd.isna(merged.loc["Huambo", "valor"])
@@ -0,0 +1,28 @@
+import geopandas as gpd
+import shapely
+
+import utils1a
+
+
+def _squares(offset=0.0):
+    layer = gpd.GeoDataFrame(geometry=[shapely.box(i + offset, 0, i + offset + 1, 1) for i in range(4)], crs="EPSG:4326")
+    layer.attrs["fonte"] = "teste:quadrados"
+    return layer
+
+
+def test_tree_is_reused_for_the_same_geometries():
+    layer = _squares()
+
+    assert utils1a.get_layer_tree(layer) is utils1a.get_layer_tree(layer.copy(deep=False))
+
+
+def test_inherited_fonte_with_other_geometries_gets_a_new_tree():
+    layer = _squares()
+    utils1a.get_layer_tree(layer)
+    # Mesma origem e mesmo número de feições, geometrias deslocadas
+    moved = _squares(offset=10.0)
+
+    tree = utils1a.get_layer_tree(moved)
+
+    assert tree.query(shapely.Point(10.5, 0.5), predicate="intersects").tolist() == [0]
+    assert tree.query(shapely.Point(0.5, 0.5), predicate="intersects").tolist() == []
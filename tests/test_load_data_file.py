@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+
+import utils1a
+
+
+def _upload(content, name):
+    file = io.BytesIO(content)
+    file.name = name
+    return file
+
+
+def test_txt_detects_separator():
+    data = utils1a.load_data_file.__wrapped__(_upload(b"NOME;VALOR\nMaputo;1\nBeira;2\n", "dados.txt"))
+
+    assert data is not None
+    assert list(data.columns) == ["NOME", "VALOR"]
+    assert data["VALOR"].tolist() == ["1", "2"]
+
+
+def test_csv_keeps_values_as_text():
+    data = utils1a.load_data_file.__wrapped__(_upload(b"NOME,CODIGO\nMaputo,007\n", "dados.csv"))
+
+    assert data["CODIGO"].tolist() == ["007"]
+
+
+def test_excel_reads_the_first_sheet():
+    content = io.BytesIO()
+    with pd.ExcelWriter(content) as writer:
+        pd.DataFrame({"NOME": ["Maputo"], "VALOR": [1]}).to_excel(writer, sheet_name="Dados", index=False)
+        pd.DataFrame({"OUTRA": ["x"]}).to_excel(writer, sheet_name="Notas", index=False)
+    utils1a.get_data_cache().clear()
+
+    data = utils1a.load_data_file(_upload(content.getvalue(), "dados.xlsx"))
+
+    assert isinstance(data, pd.DataFrame)
+    assert list(data.columns) == ["NOME", "VALOR"]
+    assert "fonte" in data.attrs
+
+
+def test_same_bytes_as_csv_and_txt_are_cached_apart():
+    content = b"NOME;VALOR\nMaputo;1\n"
+    utils1a.get_data_cache().clear()
+
+    as_csv = utils1a.load_data_file(_upload(content, "dados.csv"))
+    as_txt = utils1a.load_data_file(_upload(content, "dados.txt"))
+
+    assert list(as_csv.columns) == ["NOME;VALOR"]
+    assert list(as_txt.columns) == ["NOME", "VALOR"]
+    assert as_csv.attrs["fonte"] != as_txt.attrs["fonte"]
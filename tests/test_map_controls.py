@@ -0,0 +1,64 @@
+import re
+
+import folium
+import geopandas as gpd
+import shapely
+
+import utils1a
+
+
+def asset_names(m):
+    return {name for name, _ in m.default_js} | {name for name, _ in m.default_css}
+
+
+def test_controls_drop_unused_default_assets():
+    m = folium.Map(location=[0, 0], zoom_start=4, tiles=None)
+    utils1a.add_map_controls(m, [])
+
+    assert asset_names(m) == set(utils1a.MAP_BASE_ASSETS)
+
+
+def test_controls_keep_assets_of_popups_and_icons():
+    m = folium.Map(location=[0, 0], zoom_start=4, tiles=None)
+    folium.Marker([0, 0], popup=folium.Popup("rótulo"), icon=folium.DivIcon(html="rótulo")).add_to(m)
+    folium.Marker([1, 1], icon=folium.Icon()).add_to(m)
+    utils1a.add_map_controls(m, [])
+
+    names = asset_names(m)
+    assert "jquery" in names
+    assert {"awesome_markers", "awesome_markers_css", "bootstrap_css", "glyphicons_css"} <= names
+
+
+def test_choropleth_labels_keep_jquery():
+    gdf = gpd.GeoDataFrame({"codigo": ["1"], "categoria": ["A"]}, geometry=[shapely.box(0, 0, 1, 1)], crs="EPSG:4326")
+    labels = {"column": "codigo", "font_size": 10, "font_color": "#000000", "font_name": "Arial"}
+    m = utils1a.create_choropleth_map(gdf, gdf, "categoria", {"A": "red"}, "codigo", prov_label_config=labels, controls=[])
+
+    assert "jquery" in asset_names(m)
+
+
+def test_vendor_sample_includes_every_control_and_default_asset(monkeypatch, tmp_path):
+    maps = []
+    monkeypatch.setattr(utils1a.assets, "map_asset_urls", lambda m: maps.append(m) or [])
+    utils1a.build_vendor_assets(vendor_dir=str(tmp_path))
+
+    (m,) = maps
+    assert asset_names(m) == {name for name, _ in folium.Map.default_js + folium.Map.default_css}
+    for key, control in utils1a.MAP_CONTROLS.items():
+        control_type = type(control["criar"]())
+        assert any(isinstance(element, control_type) for element in m._children.values()), key
+
+
+def test_continuous_map_loads_only_listed_assets():
+    gdf = gpd.GeoDataFrame({"codigo": ["1", "2"], "valor": [250000.0, 500000.0]}, geometry=[shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1)], crs="EPSG:4326")
+    colormap = utils1a.continuous_colormap("viridis", gdf["valor"])
+    m = utils1a.create_choropleth_map(gdf, gdf, "valor", None, "codigo", color_mode="continuous", colormap=colormap, controls=[])
+    utils1a.add_legend(m, colormap, "População")
+
+    document = m.get_root().render()
+    listed = {url for _, url in utils1a.map_asset_urls(m)}
+    loaded = set(re.findall(r'<script src="([^"]+)"', document)) | set(re.findall(r'<link rel="stylesheet" href="([^"]+)"', document))
+
+    assert loaded <= listed
+    assert "d3.min.js" not in document
+    assert "250,000" in document and "e+05" not in document
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+import utils1a
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("S. Tomé", "sao tome"),
+    ("S.Tomé", "sao tome"),
+    ("S Pedro", "sao pedro"),
+    ("São Pedro", "sao pedro"),
+    ("Sta. Luzia", "santa luzia"),
+])
+def test_normalize_keys_expands_abbreviations(raw, expected):
+    assert utils1a.normalize_keys(pd.Series([raw])).iloc[0] == expected
+
+
+@pytest.mark.parametrize("raw", ["Bairro S", "Rua s 5", "s pedro", "Setor S Norte"])
+def test_normalize_keys_keeps_loose_s(raw):
+    assert "sao" not in utils1a.normalize_keys(pd.Series([raw])).iloc[0]
+
+
+def match(left, right, **kwargs):
+    return utils1a.match_keys(pd.Series(left), pd.Series(right), **kwargs).set_index("chave (tabela)")
+
+
+def test_match_keys_methods():
+    matches = match(
+        ["Luanda", "São Tomé", "Cacuaco", "Huambo"],
+        ["Luanda", "S. Tome", "Cacuacu", "Xyz", None],
+    )
+
+    assert matches.loc["Luanda", "método"] == "exata"
+    assert matches.loc["S. Tome", ["chave (shapefile)", "método"]].tolist() == ["São Tomé", "normalizada"]
+    assert matches.loc["Cacuacu", ["chave (shapefile)", "método"]].tolist() == ["Cacuaco", "aproximada"]
+    assert matches.loc["Cacuacu", "aceitar"]
+    assert matches.loc["Xyz", "método"] == "sem correspondência" and not matches.loc["Xyz", "aceitar"]
+    assert len(matches) == 4
+
+
+def test_match_keys_threshold():
+    matches = match(["Cacuaco"], ["Cacuacu"], threshold=0.99)
+
+    assert matches.loc["Cacuacu", "método"] == "aproximada"
+    assert not matches.loc["Cacuacu", "aceitar"]
+
+
+def test_match_keys_compares_only_within_block():
+    matches = match(
+        ["Cazenga", "Cazengo"],
+        ["Cazenga", "Cazengu"],
+        left_block=pd.Series(["Luanda", "Cuanza Norte"]),
+        right_block=pd.Series(["Luanda", "Cuanza Norte"]),
+    )
+
+    assert matches.loc["Cazengu", "chave (shapefile)"] == "Cazengo"
+    assert matches.loc["Cazengu", "alternativa"] is None
+
+
+def test_match_keys_keeps_repeated_names_in_every_block():
+    matches = match(
+        ["Cazenga", "Viana", "Cazenga", "Cacuaco"],
+        ["Cazénga"],
+        left_block=pd.Series(["Luanda", "Luanda", "Huambo", "Huambo"]),
+        right_block=pd.Series(["Huambo"]),
+    )
+
+    assert matches.loc["Cazénga", ["chave (shapefile)", "método"]].tolist() == ["Cazenga", "normalizada"]
+    assert matches.loc["Cazénga", "aceitar"]
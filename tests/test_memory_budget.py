@@ -0,0 +1,55 @@
+import io
+import zipfile
+
+import geopandas as gpd
+import shapely
+
+import utils1a
+
+
+def _zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    buffer.name = "camada.zip"
+    return buffer
+
+
+def test_zip_estimate_uses_uncompressed_sizes():
+    upload = _zip({"mun.shp": b"\0" * 100_000, "mun.dbf": b" " * 10_000, "mun.prj": b"x" * 500})
+
+    estimate = utils1a.estimate_upload_memory(upload)
+
+    assert estimate == int(100_000 * utils1a.UPLOAD_MEMORY_FACTORS[".shp"] + 10_000 * utils1a.UPLOAD_MEMORY_FACTORS[".dbf"])
+    # A estimativa não consome o arquivo
+    assert upload.tell() == 0
+
+
+def test_check_upload_budget_refuses_before_reading():
+    table = io.BytesIO(b"a,b\n" * 200_000)
+    table.name = "dados.csv"
+
+    fits, estimate = utils1a.check_upload_budget([None, table], budget_mb=1)
+
+    assert not fits
+    assert estimate > 2**20
+    assert utils1a.check_upload_budget([table], budget_mb=64)[0]
+
+
+def test_simplified_layer_is_reused_across_runs(monkeypatch):
+    gdf = gpd.GeoDataFrame({"NAME_2": ["A", "B"]}, geometry=[shapely.Point(0, 0).buffer(1, quad_segs=2000), shapely.Point(3, 0).buffer(1, quad_segs=2000)])
+    gdf.attrs["fonte"] = "teste:circulos"
+    full = utils1a.estimate_job_memory(gdf)
+    calls = []
+    process_layer = utils1a.memory.process_layer
+    monkeypatch.setattr(utils1a.memory, "process_layer", lambda *args, **kwargs: calls.append(kwargs) or process_layer(*args, **kwargs))
+    utils1a.get_data_cache().clear()
+
+    first, _, actions = utils1a.enforce_memory_budget(gdf, budget_mb=full / 2 / 2**20)
+    second, _, _ = utils1a.enforce_memory_budget(gdf, budget_mb=full / 2 / 2**20)
+
+    assert len(calls) == 1 and actions
+    assert utils1a.estimate_job_memory(first) <= full / 2
+    assert first.attrs["fonte"] == second.attrs["fonte"] != gdf.attrs["fonte"]
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+import utils1a
+
+
+def test_pivot_periods_orders_weeks_numerically():
+    weeks = [str(week) for week in range(12, 0, -1)]
+    data = pd.DataFrame({"codigo": ["A"] * 12, "semana": weeks, "casos": weeks})
+
+    wide = utils1a.pivot_periods(data, "codigo", "semana", "casos")
+
+    assert list(wide.columns) == ["codigo"] + [f"semana={week}" for week in range(1, 13)]
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["2024-03-01", "2024-02-15", "2024-01"], ["2024-01", "2024-02-15", "2024-03-01"]),
+    (["15/03/2024", "02/04/2024", "01/01/2024"], ["01/01/2024", "15/03/2024", "02/04/2024"]),
+    (["S2", "S10", "S1"], ["S1", "S10", "S2"]),
+    ([], []),
+])
+def test_sort_periods(values, expected):
+    assert utils1a.sort_periods(values) == expected
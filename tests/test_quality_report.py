@@ -0,0 +1,55 @@
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+import utils1a
+
+
+def grid(n):
+    return [shapely.box(x, y, x + 1, y + 1) for y in range(n) for x in range(n)]
+
+
+def counts(summary, layer):
+    rows = summary[summary["camada"] == layer]
+    return dict(zip(rows["verificação"], rows["ocorrências"]))
+
+
+def test_quality_report_finds_every_issue():
+    geometries = grid(4)
+    geometries[1] = None
+    geometries[2] = shapely.Polygon()
+    geometries[3] = shapely.Polygon([(3, 0), (4, 1), (4, 0), (3, 1), (3, 0)])
+    geometries[5] = shapely.box(1, 1, 2, 2).buffer(0.2, join_style="mitre")
+    geometries[10] = shapely.box(2.2, 2.2, 2.8, 2.8)
+    gdf = gpd.GeoDataFrame({"codigo": [f"M{i}" for i in range(16)]}, geometry=geometries, crs="EPSG:3857")
+    gdf.loc[15, "codigo"] = "M14"
+    gdf2 = gpd.GeoDataFrame({"nome": ["P"]}, geometry=[shapely.box(0, 0, 4, 4)], crs="EPSG:4326")
+    data = pd.DataFrame({"codigo": ["M0", "M0", "M4", "X"]})
+
+    summary, issues = utils1a.quality_report(gdf, gdf2, data, "codigo", "codigo")
+    layer = counts(summary, "Municípios")
+
+    assert layer["geometria nula"] == 1
+    assert layer["geometria vazia"] == 1
+    assert layer["geometria inválida"] == 1
+    assert layer["sobreposição"] >= 1
+    assert layer["lacuna"] >= 1
+    assert layer["chave duplicada"] == 2
+    assert counts(summary, "Províncias")["CRS"] == 1
+    table = counts(summary, "Tabela")
+    assert table == {"chave duplicada": 2, "chave sem correspondência": 1}
+    assert set(issues.columns) == {"camada", "linha", "chave", "verificação", "detalhe"}
+    assert "Self-intersection" in issues.loc[issues["verificação"] == "geometria inválida", "detalhe"].iloc[0]
+
+
+def test_quality_report_counts_accepted_matches():
+    gdf = gpd.GeoDataFrame({"nome": ["Luanda", "Huambo"]}, geometry=grid(2)[:2], crs="EPSG:4326")
+    data = pd.DataFrame({"municipio": ["LUANDA", "Huambo"]})
+    matches = pd.DataFrame({"chave (tabela)": ["LUANDA"], "chave (shapefile)": ["Luanda"], "aceitar": [True]})
+
+    without, _ = utils1a.quality_report(gdf, data=data, left_on="nome", right_on="municipio")
+    with_matches, issues = utils1a.quality_report(gdf, data=data, left_on="nome", right_on="municipio", matches=matches)
+
+    assert counts(without, "Tabela")["chave sem correspondência"] == 1
+    assert counts(with_matches, "Tabela")["chave sem correspondência"] == 0
+    assert issues.empty
@@ -0,0 +1,57 @@
+import os
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+import utils1a
+
+
+def source(fonte):
+    frame = pd.DataFrame({"a": [1]})
+    frame.attrs["fonte"] = fonte
+    return frame
+
+
+def test_render_cache_key_follows_sources_and_config():
+    config = {"coluna": "categoria", "cores": {"A": "red", "B": "blue"}}
+    key = utils1a.render_cache_key([source("x"), source("y")], config)
+
+    assert key == utils1a.render_cache_key([source("x"), source("y")], dict(config))
+    assert key != utils1a.render_cache_key([source("x"), source("z")], config)
+    assert key != utils1a.render_cache_key([source("x"), source("y")], {**config, "coluna": "valor"})
+    # a ordem das categorias muda a legenda
+    assert key != utils1a.render_cache_key([source("x"), source("y")], {"coluna": "categoria", "cores": {"B": "blue", "A": "red"}})
+    assert utils1a.render_cache_key([source("x"), pd.DataFrame()], config) is None
+
+
+def test_render_cache_evicts_least_recently_used(tmp_path):
+    cache = utils1a.RenderCache(str(tmp_path), max_bytes=250)
+    cache.put_bytes("a", "mapa.html", b"a" * 100)
+    cache.put_bytes("b", "mapa.html", b"b" * 100)
+    os.utime(tmp_path / "a-mapa.html", (1000, 1000))
+    os.utime(tmp_path / "b-mapa.html", (2000, 2000))
+
+    with cache.open("a", "mapa.html") as handle:
+        assert handle.read() == b"a" * 100
+    cache.put_bytes("c", "mapa.html", b"c" * 100)
+
+    assert sorted(os.listdir(tmp_path)) == ["a-mapa.html", "c-mapa.html"]
+    assert cache.open("b", "mapa.html") is None
+    stats = cache.stats()
+    assert (stats["artefactos"], stats["acertos"], stats["falhas"], stats["despejos"]) == (2, 1, 1, 1)
+
+
+def test_rebuilt_reference_layer_gets_a_new_source(tmp_path):
+    def build(size):
+        path = tmp_path / "municipios.geojson"
+        gpd.GeoDataFrame({"nome": ["A"]}, geometry=[shapely.box(0, 0, size, size)], crs="EPSG:4326").to_file(path)
+        utils1a.build_reference_layer(str(path), "Municípios", catalog_dir=str(tmp_path))
+        return utils1a.load_reference_layer("Municípios", catalog_dir=str(tmp_path))
+
+    first = build(1)
+    second = build(2)
+
+    assert first.attrs["fonte"] != second.attrs["fonte"]
+    assert second.geometry.iloc[0].equals(shapely.box(0, 0, 2, 2))
+    assert utils1a.load_reference_layer("Municípios", catalog_dir=str(tmp_path)).attrs["fonte"] == second.attrs["fonte"]
@@ -0,0 +1,16 @@
+import threading
+
+import utils1a
+
+
+def test_results_keep_task_order_and_run_in_parallel():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def task(value, offset=0):
+        # Só passa se as três tarefas estiverem a correr ao mesmo tempo
+        barrier.wait()
+        return value + offset
+
+    results = utils1a.run_concurrently({"c": (task, (3,)), "a": (task, (1,), {"offset": 10}), "b": (task, (2,))})
+
+    assert list(results.items()) == [("c", 3), ("a", 11), ("b", 2)]
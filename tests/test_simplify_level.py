@@ -0,0 +1,63 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+import utils1a
+
+
+def _wiggly_coverage(rows=3, cols=3, points=60, seed=0):
+    """Grelha de células com limites partilhados irregulares (uma cobertura válida)."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, points)
+    # Uma linha irregular por cada limite interior, partilhada pelas duas células vizinhas
+    vertical = {(i, j): np.column_stack([j + rng.normal(0, 0.01, points) * (0 < j < cols), i + t]) for i in range(rows) for j in range(cols + 1)}
+    horizontal = {(i, j): np.column_stack([j + t, i + rng.normal(0, 0.01, points) * (0 < i < rows)]) for i in range(rows + 1) for j in range(cols)}
+    for line in list(vertical.values()) + list(horizontal.values()):
+        line[0], line[-1] = np.round(line[0]), np.round(line[-1])
+    cells, parents = [], []
+    for i in range(rows):
+        for j in range(cols):
+            ring = np.concatenate([horizontal[i, j], vertical[i, j + 1], horizontal[i + 1, j][::-1], vertical[i, j][::-1]])
+            cells.append(shapely.Polygon(ring))
+            parents.append("A" if j < 2 else "B")
+    return gpd.GeoDataFrame({"prov": parents}, geometry=cells, crs="EPSG:4326")
+
+
+def test_coverage_stays_valid_after_simplification():
+    layer = _wiggly_coverage()
+    assert shapely.coverage_is_valid(layer.geometry.values)
+
+    simplified = utils1a.simplify_level(layer, 4)
+
+    geometries = simplified.geometry.values
+    assert shapely.coverage_is_valid(geometries)
+    assert shapely.get_num_coordinates(geometries).sum() < shapely.get_num_coordinates(layer.geometry.values).sum()
+    # Sem lacunas nem sobreposições: a soma das áreas é a área da união
+    assert np.isclose(shapely.area(geometries).sum(), shapely.union_all(geometries).area)
+
+
+def test_no_limit_returns_the_layer():
+    layer = _wiggly_coverage()
+
+    assert utils1a.simplify_level(layer, None) is layer
+    assert utils1a.simplify_level(layer, utils1a.MAX_ZOOM) is layer
+
+
+def test_non_coverage_falls_back_to_per_feature_simplification():
+    layer = _wiggly_coverage()
+    layer.loc[len(layer)] = ["B", shapely.box(0.5, 0.5, 1.5, 1.5)]
+
+    simplified = utils1a.simplify_level(layer, 4)
+
+    assert len(simplified) == len(layer)
+    assert simplified.geometry.is_valid.all()
+
+
+def test_parent_level_follows_simplified_municipalities():
+    layer = _wiggly_coverage()
+
+    parent = utils1a.simplify_parent_level(layer, "prov", 4)
+    municipalities = utils1a.simplify_level(layer, 4)
+
+    union = shapely.union_all(municipalities.geometry.values[municipalities["prov"].to_numpy() == "A"])
+    assert shapely.symmetric_difference(parent.set_index("prov").geometry["A"], union).area < 1e-12
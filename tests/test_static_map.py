@@ -0,0 +1,33 @@
+import geopandas as gpd
+import pytest
+import shapely
+
+import utils1a
+
+
+@pytest.fixture
+def layers():
+    gdf = gpd.GeoDataFrame(
+        {"NAME_2": ["A", "B", "C"], "classe": ["alta", "baixa", "alta"]},
+        geometry=[shapely.box(i, 0, i + 1, 1) for i in range(3)],
+        crs="EPSG:4326",
+    )
+    gdf2 = gpd.GeoDataFrame({"NAME_1": ["P"]}, geometry=[shapely.box(0, 0, 3, 1)], crs="EPSG:4326")
+    return gdf, gdf2
+
+
+def test_all_categories_hidden(layers):
+    gdf, gdf2 = layers
+
+    image = utils1a.render_static_map(gdf, gdf2, "classe", {"alta": "#ff0000", "baixa": "#0000ff"}, visible_categories=[], format="svg")
+
+    assert image.startswith(b"<?xml")
+
+
+def test_no_province_geometries(layers):
+    gdf, gdf2 = layers
+    gdf2 = gdf2.iloc[:0]
+
+    image = utils1a.render_static_map(gdf, gdf2, "classe", {"alta": "#ff0000", "baixa": "#0000ff"}, format="png", dpi=50)
+
+    assert image.startswith(b"\x89PNG")
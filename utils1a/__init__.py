@@ -0,0 +1,63 @@
+"""
+Funções de apoio da aplicação DataOnMap (maping1a.py).
+
+O pacote está dividido por tema; as funções e constantes públicas de cada módulo
+são reexportadas aqui, pelo que continuam disponíveis como utils1a.<nome>.
+"""
+from .config import (
+    MEMORY_BUDGET_MB, TRACEMALLOC_ENABLED, CACHE_MAX_MB, CACHE_TTL_SECONDS, CACHE_POLICY,
+    CATALOG_DIR, CATALOG_MANIFEST, VENDOR_DIR, VENDOR_MANIFEST, EXPORT_SPOOL_MB, RENDER_CACHE_DIR,
+    RENDER_CACHE_MAX_MB, RENDER_CACHE_VERSION, GEOMETRY_WORKERS, GEOMETRY_PARALLEL_MIN,
+    GEOMETRY_CHUNK_MIN, GEOMETRY_POOL_IDLE_SECONDS, MAX_COMPARISON_PANES, FUZZY_MATCH_THRESHOLD, GEOJSON_BYTES_PER_COORD,
+    UPLOAD_MEMORY_FACTORS,
+)
+from .memory import (
+    current_rss, track_memory, estimate_memory_usage, estimate_job_memory, estimate_upload_memory,
+    check_upload_budget, enforce_memory_budget, run_concurrently,
+)
+from .geometry import (
+    GeometryPool, get_geometry_pool, process_geometries, process_layer,
+)
+from .cache import (
+    BoundedCache, get_data_cache, file_digest, file_type, cached_upload, cached_result,
+)
+from .layers import (
+    prepare_layer, list_reference_layers, load_reference_layer, build_reference_layer,
+    get_layer_tree, join_layers, load_shapefile, load_data_file,
+)
+from .matching import (
+    KEY_ABBREVIATIONS, KEY_ABBREVIATION_PATTERNS, normalize_keys, match_keys, match_layer_keys,
+)
+from .quality import (
+    QUALITY_CHECKS, quality_report, quality_report_excel,
+)
+from .analysis import (
+    sort_periods, pivot_periods, build_category_index, aggregate_points_to_polygons, drawings_to_geometries,
+    query_layer_by_shapes, derive_parent_layer,
+)
+from .levels import (
+    MAX_ZOOM, zoom_tolerance, simplify_level, simplify_parent_level, ZoomLevels, VIEW_PADDING,
+    map_view_state, features_in_view, build_view_layer,
+)
+from .styles import (
+    categorical_color_codes, continuous_color_codes, continuous_colormap, features_to_geojson,
+    STYLE_CODE_ALPHABET, encode_style_codes, DECODE_STYLE_CODES_JS, StyledGeoJson,
+    indicator_color_codes, IndicatorSelector, CLASSIFICATION_METHODS, SEQUENTIAL_PALETTES,
+    DIVERGING_PALETTES, QUALITATIVE_PALETTES, PALETTE_SCHEMES, palette_from_colormap,
+    generate_palette, default_color_mapping, format_edges, classify_values,
+)
+from .maps import (
+    BASEMAPS, DEFAULT_BASEMAPS, MAP_CONTROLS, DEFAULT_MAP_CONTROLS, MAP_BASE_ASSETS, ELEMENT_ASSETS,
+    add_basemaps, map_required_assets, add_map_controls, map_controls_cost, create_choropleth_map,
+    ComparisonPanes, comparison_labels, create_comparison_map, add_legend,
+)
+from .assets import (
+    ASSET_MIME_TYPES, map_asset_urls, minify_css, build_vendor_assets, inline_assets,
+)
+from .export import (
+    EXPORT_COMPRESSIONS, render_document, export_map, store_map_export, load_cached_export,
+    export_reader, render_cache_key, RenderCache, get_render_cache,
+)
+from .static import (
+    STATIC_FORMATS, render_static_map,
+)
@@ -0,0 +1,242 @@
+"""Operações sobre camadas e tabelas: períodos, pontos, seleção por desenhos e camadas derivadas."""
+import geopandas as gpd
+import pandas as pd
+import shapely
+import numpy as np
+
+from .cache import cached_result
+from .layers import get_layer_tree, prepare_layer
+
+
+def sort_periods(values):
+    """
+    Ordena os períodos pelo seu valor: numérico, data (ISO ou com o dia primeiro) ou,
+    se nenhum servir, texto.
+
+    As tabelas são lidas como texto, pelo que a ordem de texto poria a semana 10
+    antes da semana 2.
+
+    Args:
+        values: Períodos distintos (ex.: os valores únicos da coluna do período).
+
+    Returns:
+        list: Os mesmos períodos, por ordem.
+    """
+    values = pd.Series(list(values), dtype=object)
+    text = values.astype(str)
+    for parse in (
+        lambda: pd.to_numeric(text, errors="coerce"),
+        lambda: pd.to_datetime(text, errors="coerce", format="ISO8601"),
+        lambda: pd.to_datetime(text, errors="coerce", format="mixed", dayfirst=True),
+    ):
+        try:
+            parsed = parse()
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if len(parsed) and parsed.notna().all():
+            return values.iloc[np.argsort(parsed.to_numpy(), kind="stable")].tolist()
+    return values.iloc[np.argsort(text.to_numpy(), kind="stable")].tolist()
+
+
+def pivot_periods(data, key_column, period_column, value_column):
+    """
+    Converte uma tabela longa (uma linha por unidade e período) numa coluna por período.
+
+    A tabela larga é unida uma única vez à geometria, de modo que todos os períodos
+    partilham a mesma coleção de feições. Linhas repetidas (unidade, período)
+    ficam com o primeiro valor.
+
+    Args:
+        data: DataFrame da tabela de dados.
+        key_column: Coluna de união da tabela.
+        period_column: Coluna do período (ex.: semana, mês).
+        value_column: Coluna com a categoria ou o valor a mapear.
+
+    Returns:
+        pd.DataFrame: key_column e uma coluna "<period_column>=<período>" por período,
+        pela ordem de sort_periods.
+    """
+    def pivot():
+        long = data[[key_column, period_column, value_column]].dropna(subset=[key_column, period_column])
+        wide = long.pivot_table(index=key_column, columns=period_column, values=value_column, aggfunc="first", dropna=False)
+        periods = sort_periods(wide.columns)
+        wide = wide[periods]
+        wide.columns = [f"{period_column}={period}" for period in periods]
+        return wide.reset_index()
+
+    return cached_result(("pivot_periods", key_column, period_column, value_column), [data], pivot)
+
+
+def build_category_index(gdf, column):
+    """
+    Constrói o índice de linhas de cada categoria, uma vez por conjunto de dados unido.
+
+    Args:
+        gdf: GeoDataFrame unido (join_layers).
+        column: Coluna de categorias.
+
+    Returns:
+        dict: Dicionário categoria -> array com as posições das linhas dessa categoria.
+    """
+    def index():
+        codes, categories = pd.factorize(gdf[column])
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+        # As linhas sem categoria (código -1) ficam no início da ordenação
+        start = int((codes < 0).sum())
+        groups = np.split(order[start:], np.cumsum(counts)[:-1])
+        return dict(zip(categories, groups))
+
+    return cached_result(("build_category_index", column), [gdf], index)
+
+
+def aggregate_points_to_polygons(points, lat_column, lon_column, gdf, key_column, how="count", value_column=None):
+    """
+    Agrega pontos (latitude/longitude) pelos polígonos de uma camada.
+
+    A atribuição ponto-polígono é feita em bloco com o STRtree da camada e as
+    agregações com numpy.bincount, sem percorrer as linhas. Pontos sobre um
+    limite ficam no primeiro polígono encontrado.
+
+    Args:
+        points: DataFrame com os pontos.
+        lat_column: Coluna de latitude (graus, EPSG:4326).
+        lon_column: Coluna de longitude (graus, EPSG:4326).
+        gdf: GeoDataFrame dos polígonos (municípios).
+        key_column: Coluna de gdf que identifica cada polígono.
+        how: "count", "sum" ou "mean".
+        value_column: Coluna a somar ou a calcular a média (obrigatória para "sum" e "mean").
+
+    Returns:
+        pd.DataFrame: Uma linha por valor de key_column com o valor agregado;
+        attrs["pontos_fora"] indica quantos pontos não caíram em nenhum polígono.
+    """
+    def aggregate():
+        lat = pd.to_numeric(points[lat_column], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(points[lon_column], errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        geoms = shapely.points(lon[valid], lat[valid])
+        if gdf.crs is not None and gdf.crs != "EPSG:4326":
+            geoms = gpd.GeoSeries(geoms, crs="EPSG:4326").to_crs(gdf.crs).values
+
+        point_idx, poly_idx = get_layer_tree(gdf).query(geoms, predicate="intersects")
+        point_idx, first = np.unique(point_idx, return_index=True)
+        poly_idx = poly_idx[first]
+
+        n = len(gdf)
+        if how == "count":
+            sums = np.bincount(poly_idx, minlength=n).astype(float)
+            counts = sums
+        else:
+            values = pd.to_numeric(points[value_column], errors="coerce").to_numpy(dtype=float)[valid][point_idx]
+            ok = np.isfinite(values)
+            sums = np.bincount(poly_idx[ok], weights=values[ok], minlength=n)
+            counts = np.bincount(poly_idx[ok], minlength=n).astype(float)
+
+        # Polígonos com a mesma chave (ex.: multipartes em linhas separadas) são somados
+        per_key = pd.DataFrame({key_column: gdf[key_column].to_numpy(), "soma": sums, "n": counts})
+        per_key = per_key.groupby(key_column, sort=False, as_index=False).sum()
+        if how == "count":
+            name, result = "contagem", per_key["n"].astype(int)
+        elif how == "sum":
+            name, result = f"soma_{value_column}", per_key["soma"]
+        else:
+            name, result = f"media_{value_column}", per_key["soma"] / per_key["n"].where(per_key["n"] > 0)
+        aggregated = pd.DataFrame({key_column: per_key[key_column], name: result})
+        aggregated.attrs["pontos_fora"] = int(len(points) - len(point_idx))
+        return aggregated
+
+    return cached_result(("aggregate_points", lat_column, lon_column, key_column, how, value_column), [points, gdf], aggregate)
+
+
+def drawings_to_geometries(drawings):
+    """
+    Converte os desenhos devolvidos pelo st_folium em polígonos (EPSG:4326).
+
+    Polígonos e retângulos são usados diretamente; círculos (ponto com a
+    propriedade "radius", em metros) são convertidos num buffer geodésico.
+    Marcadores e linhas são ignorados.
+
+    Args:
+        drawings: Lista de features GeoJSON (map_data["all_drawings"]).
+
+    Returns:
+        gpd.GeoSeries: Polígonos desenhados, na ordem original.
+    """
+    shapes = []
+    for feature in drawings or []:
+        geometry = feature.get("geometry") or {}
+        radius = (feature.get("properties") or {}).get("radius")
+        if geometry.get("type") in ("Polygon", "MultiPolygon"):
+            shapes.append(shapely.geometry.shape(geometry))
+        elif geometry.get("type") == "Point" and radius:
+            lon, lat = geometry["coordinates"][:2]
+            local = f"+proj=aeqd +lat_0={lat} +lon_0={lon} +units=m"
+            circle = gpd.GeoSeries([shapely.Point(0, 0).buffer(radius)], crs=local).to_crs("EPSG:4326")
+            shapes.append(circle.iloc[0])
+    return gpd.GeoSeries(shapes, crs="EPSG:4326")
+
+
+def query_layer_by_shapes(gdf, shapes):
+    """
+    Seleciona as feições de uma camada que intersectam os polígonos desenhados.
+
+    Usa o STRtree da camada (get_layer_tree), pelo que se mantém interativo em
+    camadas com dezenas de milhares de feições.
+
+    Args:
+        gdf: GeoDataFrame da camada carregada.
+        shapes: GeoSeries com os polígonos desenhados (drawings_to_geometries).
+
+    Returns:
+        tuple: (feições intersectadas com a coluna "desenho", resumo por desenho).
+    """
+    if gdf.crs is not None and shapes.crs != gdf.crs:
+        shapes = shapes.to_crs(gdf.crs)
+    shape_idx, feature_idx = get_layer_tree(gdf).query(shapes.values, predicate="intersects")
+    features = gdf.iloc[feature_idx].copy()
+    features.insert(0, "desenho", shape_idx + 1)
+
+    # Áreas em km² numa projeção de área igual
+    drawn_area = shapes.to_crs("EPSG:6933").area.to_numpy() / 1e6
+    summary = pd.DataFrame({
+        "desenho": np.arange(1, len(shapes) + 1),
+        "feições": np.bincount(shape_idx, minlength=len(shapes)),
+        "área desenhada (km²)": drawn_area.round(2),
+    })
+    if len(features):
+        clipped = shapely.intersection(features.geometry.values, shapes.values[shape_idx])
+        clipped_area = gpd.GeoSeries(clipped, crs=gdf.crs).to_crs("EPSG:6933").area.to_numpy() / 1e6
+        summary["área intersectada (km²)"] = np.bincount(shape_idx, weights=clipped_area, minlength=len(shapes)).round(2)
+    return features, summary
+
+
+def derive_parent_layer(gdf, parent_column):
+    """
+    Constrói a camada de um nível superior (ex.: províncias) dissolvendo os municípios.
+
+    Usa a união de cobertura (coverage union), muito mais rápida que a união geral
+    para polígonos que apenas partilham limites, e recorre à união geral se a
+    cobertura não for válida. As fronteiras resultantes coincidem exatamente com as
+    dos municípios. O resultado fica na cache de dados, associado à camada de origem.
+
+    Args:
+        gdf: GeoDataFrame dos municípios.
+        parent_column: Coluna com o código ou nome da unidade superior.
+
+    Returns:
+        gpd.GeoDataFrame: Camada dissolvida, uma linha por valor de parent_column.
+    """
+    def dissolve():
+        layer = gdf if gdf.attrs.get("preparada") else prepare_layer(gdf)
+        layer = layer[[parent_column, layer.geometry.name]]
+        try:
+            parent = layer.dissolve(by=parent_column, method="coverage", as_index=False)
+            if not parent.geometry.is_valid.all():
+                raise ValueError("cobertura inválida")
+        except Exception:
+            parent = layer.dissolve(by=parent_column, as_index=False)
+        parent.attrs["preparada"] = True
+        return parent
+
+    return cached_result(("derive_parent_layer", parent_column), [gdf], dissolve)
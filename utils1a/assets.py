@@ -0,0 +1,198 @@
+"""Cópias locais (vendor) das bibliotecas JS/CSS dos mapas, para HTML que abre sem rede."""
+import geopandas as gpd
+import folium
+import os
+import json
+import re
+import base64
+import urllib.request
+import urllib.parse
+import mimetypes
+import shapely
+import hashlib
+import functools
+
+from .config import VENDOR_DIR, VENDOR_MANIFEST
+from .maps import BASEMAPS, MAP_CONTROLS, create_choropleth_map
+
+
+# Tipos MIME de recursos referidos pelas folhas de estilo (fontes e imagens)
+ASSET_MIME_TYPES = {".woff2": "font/woff2", ".woff": "font/woff", ".ttf": "font/ttf", ".eot": "application/vnd.ms-fontobject", ".svg": "image/svg+xml", ".png": "image/png", ".gif": "image/gif"}
+_SCRIPT_LINK = re.compile(r'<script src="([^"]+)"></script>')
+_STYLE_LINK = re.compile(r'<link rel="stylesheet" href="([^"]+)"/>')
+_CSS_URL = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+
+
+def map_asset_urls(m):
+    """
+    Lista as bibliotecas JS e CSS de que um mapa depende, sem o renderizar.
+
+    Args:
+        m: Mapa Folium (ou qualquer elemento do branca).
+
+    Returns:
+        list: Pares (tipo, url), com tipo "js" ou "css", pela ordem em que aparecem.
+    """
+    urls = []
+    pending = [m.get_root() if hasattr(m, "get_root") else m, m]
+    seen = set()
+    while pending:
+        element = pending.pop(0)
+        if id(element) in seen:
+            continue
+        seen.add(id(element))
+        for kind, attribute in (("js", "default_js"), ("css", "default_css")):
+            for _, url in getattr(element, attribute, []):
+                if (kind, url) not in urls:
+                    urls.append((kind, url))
+        pending.extend(getattr(element, "_children", {}).values())
+    return urls
+
+
+def _fetch(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+def minify_css(text):
+    """
+    Minifica CSS de forma conservadora: remove comentários e espaços redundantes.
+
+    Args:
+        text: Conteúdo CSS.
+
+    Returns:
+        str: CSS equivalente, mais curto.
+    """
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r"\s*:\s*(?![^{}]*\{)", ":", text)  # apenas dentro das declarações, não em seletores (ex.: a :hover)
+    return text.replace(";}", "}").strip()
+
+
+def _embed_css_resources(text, base_url):
+    """Substitui as referências url(...) de uma folha de estilo por data URIs."""
+    def embed(match):
+        reference = match.group(2).strip()
+        if reference.startswith(("data:", "#")):
+            return match.group(0)
+        url = urllib.parse.urljoin(base_url, reference)
+        path = urllib.parse.urlsplit(url).path
+        mime = ASSET_MIME_TYPES.get(os.path.splitext(path)[1].lower()) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        try:
+            data = _fetch(urllib.parse.urldefrag(url)[0])
+        except Exception:
+            return f'url("{url}")'  # sem cópia local: fica o endereço absoluto
+        return f'url("data:{mime};base64,{base64.b64encode(data).decode()}")'
+    return _CSS_URL.sub(embed, text)
+
+
+def build_vendor_assets(m=None, vendor_dir=None):
+    """
+    Descarrega as bibliotecas de um mapa para a pasta local (vendor) e regista-as no manifesto.
+
+    Deve ser executado uma vez, com acesso à rede. Para JS, é usada a versão .min.js
+    quando existe; o CSS é minificado e as fontes/imagens que refere ficam embutidas
+    como data URIs, pelo que cada recurso fica autónomo.
+
+    Args:
+        m: Mapa com os plugins usados. Se None, usa um mapa de create_choropleth_map com todos
+            os controlos e camadas de fundo e todas as bibliotecas por omissão do folium.
+        vendor_dir: Pasta dos recursos. Se None, usa VENDOR_DIR.
+
+    Returns:
+        list: URLs que não foi possível descarregar.
+    """
+    if m is None:
+        sample = gpd.GeoDataFrame({"codigo": ["1"], "categoria": ["A"]}, geometry=[shapely.box(0, 0, 1, 1)], crs="EPSG:4326")
+        m = create_choropleth_map(sample, sample, "categoria", {"A": "red"}, "codigo", basemaps=list(BASEMAPS), controls=list(MAP_CONTROLS))
+        # repõe as bibliotecas por omissão que add_map_controls retirou, porque outros mapas podem usá-las
+        m.default_js, m.default_css = list(folium.Map.default_js), list(folium.Map.default_css)
+    vendor_dir = vendor_dir or VENDOR_DIR
+    os.makedirs(vendor_dir, exist_ok=True)
+    manifest_path = os.path.join(vendor_dir, VENDOR_MANIFEST)
+    manifest = {"recursos": []}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    failed = []
+    for kind, url in map_asset_urls(m):
+        candidates = [url]
+        if kind == "js" and url.endswith(".js") and not url.endswith(".min.js"):
+            candidates.insert(0, url[:-3] + ".min.js")
+        content = None
+        for candidate in candidates:
+            try:
+                content = _fetch(candidate).decode("utf-8")
+                break
+            except Exception:
+                continue
+        if content is None:
+            failed.append(url)
+            continue
+        if kind == "css":
+            content = minify_css(_embed_css_resources(content, url))
+        arquivo = hashlib.blake2b(url.encode(), digest_size=8).hexdigest() + "-" + os.path.basename(urllib.parse.urlsplit(url).path)
+        with open(os.path.join(vendor_dir, arquivo), "w", encoding="utf-8") as f:
+            f.write(content)
+        manifest["recursos"] = [asset for asset in manifest["recursos"] if asset["url"] != url]
+        manifest["recursos"].append({"url": url, "arquivo": arquivo, "tipo": kind})
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return failed
+
+
+@functools.lru_cache(maxsize=8)
+def _vendor_assets(vendor_dir, mtime):
+    """Lê o manifesto e os recursos locais uma vez por versão do manifesto."""
+    with open(os.path.join(vendor_dir, VENDOR_MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assets = {}
+    for asset in manifest.get("recursos", []):
+        try:
+            with open(os.path.join(vendor_dir, asset["arquivo"]), encoding="utf-8") as f:
+                assets[asset["url"]] = f.read()
+        except OSError:
+            continue
+    return assets
+
+
+def inline_assets(document, vendor_dir=None):
+    """
+    Substitui as bibliotecas carregadas de CDNs pelas cópias locais, embutidas no HTML.
+
+    Cada biblioteca aparece uma única vez no cabeçalho do documento gerado pelo folium,
+    pelo que também é embutida uma única vez.
+
+    Args:
+        document: HTML do mapa (m.get_root().render()).
+        vendor_dir: Pasta dos recursos. Se None, usa VENDOR_DIR.
+
+    Returns:
+        tuple: (HTML com os recursos embutidos, lista de URLs sem cópia local, que ficam como links).
+    """
+    vendor_dir = vendor_dir or VENDOR_DIR
+    try:
+        assets = _vendor_assets(vendor_dir, os.path.getmtime(os.path.join(vendor_dir, VENDOR_MANIFEST)))
+    except (OSError, ValueError):
+        assets = {}
+    missing = []
+
+    def script(match):
+        content = assets.get(match.group(1))
+        if content is None:
+            missing.append(match.group(1))
+            return match.group(0)
+        return "<script>" + content.replace("</script", "<\\/script") + "</script>"
+
+    def style(match):
+        content = assets.get(match.group(1))
+        if content is None:
+            missing.append(match.group(1))
+            return match.group(0)
+        return "<style>" + content.replace("</style", "<\\/style") + "</style>"
+
+    document = _SCRIPT_LINK.sub(script, document)
+    document = _STYLE_LINK.sub(style, document)
+    return document, missing
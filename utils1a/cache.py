@@ -0,0 +1,206 @@
+"""Caches partilhadas entre sessões: arquivos carregados e resultados derivados das camadas."""
+import streamlit as st
+import pandas as pd
+import threading
+import time
+import hashlib
+import functools
+import mimetypes
+from collections import OrderedDict
+
+from .config import CACHE_MAX_MB, CACHE_POLICY, CACHE_TTL_SECONDS
+from .memory import estimate_memory_usage
+
+
+class BoundedCache:
+    """
+    Cache em memória com orçamento total de bytes, TTL e despejo LRU ou LFU.
+
+    O TTL conta desde o último acesso, de modo que só expiram as entradas que
+    ninguém usa. Com a política "lfu" são despejadas primeiro as entradas com
+    menos acessos (desempate pela menos recente), de modo que os limites de
+    referência usados por muitos utilizadores ficam residentes e os uploads
+    pontuais saem primeiro. A cada decay_every acessos as contagens são divididas
+    por dois, para que uma entrada muito usada no passado acabe por sair.
+    """
+
+    def __init__(self, max_bytes, ttl=None, policy="lfu", decay_every=1000):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Política de cache desconhecida: {policy}")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self.decay_every = decay_every
+        self._entries = OrderedDict()  # chave -> [valor, bytes, acessos, último_acesso]
+        self._accesses = 0
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key):
+        _, nbytes, _, _ = self._entries.pop(key)
+        self.current_bytes -= nbytes
+
+    def get(self, key):
+        """Retorna o valor em cache ou None, atualizando as estatísticas."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[3] > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry[2] += 1
+            entry[3] = time.monotonic()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._accesses += 1
+            if self.decay_every and self._accesses >= self.decay_every:
+                self._accesses = 0
+                for other in self._entries.values():
+                    other[2] //= 2
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """Guarda um valor, despejando entradas até caber no orçamento."""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                if self.policy == "lfu":
+                    # OrderedDict está ordenado do menos para o mais recente
+                    victim = min(self._entries, key=lambda k: self._entries[k][2])
+                else:
+                    victim = next(iter(self._entries))
+                self._remove(victim)
+                self.evictions += 1
+            self._entries[key] = [value, nbytes, 1, time.monotonic()]
+            self.current_bytes += nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Retorna as estatísticas da cache.
+
+        Returns:
+            dict: Entradas, bytes ocupados, acertos, falhas, despejos e expirações.
+        """
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "mb_ocupados": round(self.current_bytes / 2**20, 1),
+                "mb_maximo": round(self.max_bytes / 2**20, 1),
+                "acertos": self.hits,
+                "falhas": self.misses,
+                "despejos": self.evictions,
+                "expirações": self.expirations,
+            }
+
+
+@st.cache_resource
+def get_data_cache():
+    """Retorna a cache de arquivos carregados, única por processo do servidor."""
+    return BoundedCache(CACHE_MAX_MB * 2**20, ttl=CACHE_TTL_SECONDS, policy=CACHE_POLICY)
+
+
+def file_digest(file):
+    """
+    Calcula o hash do conteúdo de um arquivo carregado.
+
+    Args:
+        file: Arquivo carregado (UploadedFile ou objeto com getvalue/read).
+
+    Returns:
+        str: Hash hexadecimal do conteúdo.
+    """
+    if hasattr(file, "getvalue"):
+        content = file.getvalue()
+    else:
+        file.seek(0)
+        content = file.read()
+        file.seek(0)
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def file_type(file):
+    """
+    Retorna o tipo MIME de um arquivo carregado.
+
+    Arquivos abertos fora do Streamlit (tarefas em lote) não têm tipo MIME: deduz-se da extensão.
+
+    Args:
+        file: Arquivo carregado (UploadedFile ou objeto com atributo name).
+
+    Returns:
+        str: Tipo MIME, ou None se não for possível determiná-lo.
+    """
+    return getattr(file, "type", None) or mimetypes.guess_type(getattr(file, "name", ""))[0]
+
+
+def cached_upload(func):
+    """
+    Decorador que guarda o resultado de um carregador na cache limitada.
+
+    A chave é o hash do conteúdo do arquivo, o tipo MIME (os mesmos bytes lidos como
+    CSV ou como TXT dão tabelas diferentes) e os restantes argumentos, de modo que o
+    mesmo arquivo carregado por utilizadores diferentes partilha a entrada. A origem
+    (attrs["fonte"]) é o hash dessa chave. Resultados que não sejam DataFrames não
+    são guardados. Devolve cópias rasas, para que alterações do chamador não afetem a cache.
+    """
+    @functools.wraps(func)
+    def wrapper(file, *args, **kwargs):
+        key = (func.__name__, file_digest(file), file_type(file), args, tuple(sorted(kwargs.items())))
+        cache = get_data_cache()
+        value = cache.get(key)
+        if value is None:
+            if hasattr(file, "seek"):
+                file.seek(0)
+            value = func(file, *args, **kwargs)
+            if not isinstance(value, pd.DataFrame):
+                return value
+            value.attrs["fonte"] = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+            cache.put(key, value, estimate_memory_usage(value))
+        return value.copy(deep=False)
+
+    wrapper.cache = get_data_cache
+    return wrapper
+
+
+def cached_result(key, sources, compute):
+    """
+    Guarda na cache de dados um resultado derivado de camadas ou tabelas carregadas.
+
+    A chave combina key com a origem (attrs["fonte"]) de cada fonte; se alguma
+    fonte não tiver origem conhecida, o resultado é calculado sem cache.
+
+    Args:
+        key: Tupla que identifica a operação e os seus parâmetros.
+        sources: Lista de DataFrames/GeoDataFrames de entrada.
+        compute: Função sem argumentos que calcula o resultado (DataFrame ou dicionário de arrays).
+
+    Returns:
+        Cópia rasa do resultado (DataFrames) ou o próprio resultado, que não deve ser alterado.
+    """
+    origins = tuple(source.attrs.get("fonte") for source in sources)
+    if None in origins:
+        return compute()
+    key = key + origins
+    cache = get_data_cache()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if isinstance(value, pd.DataFrame):
+            value.attrs["fonte"] = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        cache.put(key, value, estimate_memory_usage(value))
+    return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
@@ -0,0 +1,39 @@
+"""Configuração do pacote, lida das variáveis de ambiente DATAONMAP_*."""
+import tempfile
+import os
+
+
+# Orçamento de memória por sessão (MB) e ativação opcional do tracemalloc
+MEMORY_BUDGET_MB = float(os.environ.get("DATAONMAP_MEMORY_BUDGET_MB", "1024"))
+TRACEMALLOC_ENABLED = os.environ.get("DATAONMAP_TRACEMALLOC", "0") == "1"
+# Limites da cache de arquivos carregados, partilhada entre sessões
+CACHE_MAX_MB = float(os.environ.get("DATAONMAP_CACHE_MAX_MB", "512"))
+CACHE_TTL_SECONDS = float(os.environ.get("DATAONMAP_CACHE_TTL", "3600"))
+CACHE_POLICY = os.environ.get("DATAONMAP_CACHE_POLICY", "lfu")
+# Catálogo de camadas de referência (GeoParquet já preparado)
+CATALOG_DIR = os.environ.get("DATAONMAP_CATALOG_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catalogo"))
+CATALOG_MANIFEST = "catalogo.json"
+# Cópias locais das bibliotecas JS/CSS do mapa, para exportar HTML que abre sem rede
+VENDOR_DIR = os.environ.get("DATAONMAP_VENDOR_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vendor"))
+VENDOR_MANIFEST = "vendor.json"
+# Exportação do mapa: acima deste tamanho (MB) o arquivo temporário passa da memória para o disco
+EXPORT_SPOOL_MB = float(os.environ.get("DATAONMAP_EXPORT_SPOOL_MB", "16"))
+# Cache em disco dos mapas finais (HTML e imagens), partilhada entre sessões e reinícios
+RENDER_CACHE_DIR = os.environ.get("DATAONMAP_RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dataonmap_render_cache"))
+RENDER_CACHE_MAX_MB = float(os.environ.get("DATAONMAP_RENDER_CACHE_MAX_MB", "1024"))
+# Incrementar quando o HTML gerado mudar, para invalidar os mapas guardados
+RENDER_CACHE_VERSION = 7
+# Motor de geometria: número de processos (0 = um por núcleo, até 4), feições mínimas
+# para usar o pool, tamanho mínimo de cada bloco e segundos sem uso até encerrar os processos
+GEOMETRY_WORKERS = int(os.environ.get("DATAONMAP_GEOMETRY_WORKERS", "0")) or min(os.cpu_count() or 1, 4)
+GEOMETRY_PARALLEL_MIN = int(os.environ.get("DATAONMAP_GEOMETRY_PARALLEL_MIN", "20000"))
+GEOMETRY_CHUNK_MIN = int(os.environ.get("DATAONMAP_GEOMETRY_CHUNK_MIN", "2000"))
+GEOMETRY_POOL_IDLE_SECONDS = float(os.environ.get("DATAONMAP_GEOMETRY_POOL_IDLE", "60"))
+# Comparação lado a lado: número máximo de painéis (cada um é um mapa Leaflet no navegador)
+MAX_COMPARISON_PANES = int(os.environ.get("DATAONMAP_MAX_COMPARISON_PANES", "4"))
+# União aproximada: pontuação mínima (0 a 1) para aceitar uma correspondência
+FUZZY_MATCH_THRESHOLD = float(os.environ.get("DATAONMAP_FUZZY_THRESHOLD", "0.85"))
+# Bytes aproximados por coordenada depois da serialização GeoJSON no mapa
+GEOJSON_BYTES_PER_COORD = 48
+# Memória aproximada depois da leitura, por byte de cada tipo de arquivo (verificada antes de ler)
+UPLOAD_MEMORY_FACTORS = {".shp": 1.5, ".dbf": 1.5, ".xlsx": 6, ".xls": 2, ".csv": 2.5, ".txt": 2.5}
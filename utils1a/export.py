@@ -0,0 +1,345 @@
+"""Exportação do mapa em HTML (simples ou comprimido) e cache em disco dos mapas finais."""
+import streamlit as st
+import pandas as pd
+import tempfile
+import zipfile
+import shutil
+import gzip
+import io
+import os
+import json
+import branca
+import branca.colormap
+import numpy as np
+import threading
+import hashlib
+import itertools
+
+from .config import EXPORT_SPOOL_MB, RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB, RENDER_CACHE_VERSION
+from .assets import inline_assets
+
+
+# Compressões do download do mapa (None = HTML simples): nome do arquivo e tipo MIME
+EXPORT_COMPRESSIONS = {
+    None: ("mapa.html", "text/html"),
+    "gzip": ("mapa.html.gz", "application/gzip"),
+    "zip": ("mapa.zip", "application/zip"),
+}
+
+
+def _render_children(element):
+    # Mesmo texto que o modelo por omissão de branca.element.Element, filho a filho
+    for child in element._children.values():
+        yield "\n    "
+        yield child.render()
+
+
+def render_document(root):
+    """
+    Gera o HTML de uma Figure do branca por partes, com o mesmo texto que root.render().
+
+    Cada elemento do cabeçalho, do corpo e do script é convertido em texto à vez,
+    de modo que o documento inteiro nunca está em memória (só o maior elemento,
+    em geral o GeoJSON dos municípios).
+
+    Args:
+        root: Figure do branca (m.get_root()).
+
+    Yields:
+        str: Partes consecutivas do documento.
+    """
+    parts = (root.header, root.html, root.script) if isinstance(root, branca.element.Figure) else ()
+    if not parts or type(root).render is not branca.element.Figure.render or any("_template" in vars(part) for part in parts):
+        # Figuras com modelo próprio são convertidas de uma vez
+        yield root.render()
+        return
+    # Como em Figure.render: os filhos acrescentam o seu conteúdo ao cabeçalho, ao corpo e ao script
+    for child in root._children.values():
+        child.render()
+    yield "<!DOCTYPE html>\n<html>\n<head>\n"
+    if root.title:
+        yield f"<title>{root.title}</title>"
+    yield "    "
+    yield from _render_children(root.header)
+    yield "\n</head>\n<body>\n    "
+    yield from _render_children(root.html)
+    yield "\n</body>\n<script>\n    "
+    yield from _render_children(root.script)
+    yield "\n</script>\n</html>"
+
+
+def export_map(m, compression=None, offline=False, chunk_size=1 << 20):
+    """
+    Escreve o HTML do mapa num arquivo temporário, em partes e opcionalmente comprimido.
+
+    Ao contrário de m.save(io.BytesIO()) seguido de getvalue(), o documento não é
+    montado em memória: cada elemento é convertido em texto (render_document),
+    codificado por blocos e escrito no arquivo ou no compressor, e o arquivo passa
+    para o disco quando excede EXPORT_SPOOL_MB.
+
+    Args:
+        m: Mapa Folium (ou Figure do branca, ex.: create_comparison_map).
+        compression: None, "gzip" ou "zip" (ver EXPORT_COMPRESSIONS).
+        offline: Se True, embute as bibliotecas JS/CSS locais (inline_assets).
+        chunk_size: Número de caracteres codificados de cada vez.
+
+    Returns:
+        tuple: (arquivo temporário posicionado no início, nome do arquivo, tipo MIME,
+            URLs de bibliotecas sem cópia local no modo offline).
+    """
+    if compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f"Compressão desconhecida: {compression}")
+    file_name, mime = EXPORT_COMPRESSIONS[compression]
+    spool = tempfile.SpooledTemporaryFile(max_size=int(EXPORT_SPOOL_MB * 1024 * 1024))
+    archive = None
+    if compression == "gzip":
+        writer = gzip.GzipFile(filename="mapa.html", mode="wb", fileobj=spool)
+    elif compression == "zip":
+        archive = zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED)
+        writer = archive.open("mapa.html", "w")
+    else:
+        writer = spool
+    missing = []
+    parts = render_document(m.get_root())
+    if offline:
+        # As bibliotecas estão todas no cabeçalho, que é pequeno: só ele é reescrito
+        head = []
+        for part in parts:
+            head.append(part)
+            if part.startswith("\n</head>"):
+                break
+        head, missing = inline_assets("".join(head))
+        parts = itertools.chain([head], parts)
+    for part in parts:
+        for start in range(0, len(part), chunk_size):
+            writer.write(part[start:start + chunk_size].encode("utf-8"))
+    if writer is not spool:
+        writer.close()
+    if archive is not None:
+        archive.close()
+    spool.seek(0)
+    return spool, file_name, mime, missing
+
+
+def _store_export(handle, file_name, mime, missing=()):
+    """Guarda o descritor de uma exportação no estado da sessão, fechando o anterior."""
+    previous = st.session_state.pop("map_export", None)
+    if previous:
+        previous["file"].close()
+    handle.seek(0, os.SEEK_END)
+    export = {"file": handle, "file_name": file_name, "mime": mime, "bytes": handle.tell(), "missing_assets": list(missing)}
+    handle.seek(0)
+    st.session_state["map_export"] = export
+    return export
+
+
+def store_map_export(m, compression=None, cache_key=None, offline=False):
+    """
+    Exporta o mapa (export_map) e guarda apenas o arquivo em disco no estado da sessão.
+
+    Com cache_key, a sessão fica com o arquivo da cache em disco; sem ela, com o
+    arquivo temporário, passado para o disco. O arquivo do mapa anterior da sessão
+    é fechado (e apagado do disco, se for temporário).
+
+    Args:
+        m: Mapa Folium.
+        compression: None, "gzip" ou "zip".
+        cache_key: Chave do mapa na cache em disco (render_cache_key). Se None, não é guardado.
+        offline: Se True, embute as bibliotecas JS/CSS locais no HTML.
+
+    Returns:
+        dict: Exportação guardada em st.session_state["map_export"] (file, file_name, mime,
+            bytes, missing_assets).
+    """
+    handle, file_name, mime, missing = export_map(m, compression, offline=offline)
+    if cache_key and not missing:
+        cache = get_render_cache()
+        cache.put(cache_key, file_name, handle)
+        cached = cache.open(cache_key, file_name)
+        if cached is not None:
+            handle.close()
+            handle = cached
+    if isinstance(handle, tempfile.SpooledTemporaryFile):
+        handle.rollover()
+    return _store_export(handle, file_name, mime, missing)
+
+
+def load_cached_export(cache_key, compression=None):
+    """
+    Abre um mapa da cache em disco e guarda o descritor no estado da sessão.
+
+    Args:
+        cache_key: Chave do mapa (render_cache_key).
+        compression: None, "gzip" ou "zip".
+
+    Returns:
+        dict: Exportação como em store_map_export, ou None se o mapa não estiver em cache.
+    """
+    file_name, mime = EXPORT_COMPRESSIONS[compression]
+    handle = get_render_cache().open(cache_key, file_name)
+    if handle is None:
+        return None
+    return _store_export(handle, file_name, mime)
+
+
+def export_reader(export):
+    """
+    Retorna uma função que entrega a exportação apenas quando o download é pedido.
+
+    O st.download_button aceita bytes ou arquivos abertos, e não geradores: os mapas
+    da cache em disco são entregues como o próprio arquivo (lido pelo Streamlit no
+    clique, sem cópia intermédia); os temporários, já em disco, são lidos nesse momento.
+
+    Args:
+        export: Exportação devolvida por store_map_export ou load_cached_export.
+
+    Returns:
+        callable: Função sem argumentos que devolve o arquivo ou o seu conteúdo (para st.download_button).
+    """
+    def read():
+        handle = export["file"]
+        handle.seek(0)
+        if isinstance(handle, io.BufferedReader):
+            return handle
+        return handle.read()
+    return read
+
+
+def _config_token(value):
+    """Representação estável e serializável de um valor de configuração (para render_cache_key)."""
+    if isinstance(value, branca.colormap.ColorMap):
+        return {"colormap": type(value).__name__, "vmin": value.vmin, "vmax": value.vmax, "index": [float(x) for x in value.index], "colors": [list(c) for c in value.colors], "caption": value.caption}
+    if isinstance(value, dict):
+        # A ordem conta (ex.: ordem das categorias na legenda)
+        return [[_config_token(k), _config_token(v)] for k, v in value.items()]
+    if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+        items = sorted(value, key=repr) if isinstance(value, set) else value
+        return [_config_token(v) for v in items]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def render_cache_key(sources, config):
+    """
+    Calcula a chave de um mapa final a partir das origens dos dados e da configuração completa.
+
+    Args:
+        sources: DataFrames/GeoDataFrames de entrada; a origem é attrs["fonte"] (hash do
+            arquivo carregado, ou da camada derivada/simplificada).
+        config: Dicionário com toda a configuração do mapa (colunas, cores, rótulos, limites...).
+
+    Returns:
+        str: Hash hexadecimal, ou None se alguma fonte não tiver origem conhecida.
+    """
+    origins = [source.attrs.get("fonte") for source in sources]
+    if None in origins:
+        return None
+    payload = json.dumps([RENDER_CACHE_VERSION, origins, _config_token(config)], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class RenderCache:
+    """
+    Cache em disco de mapas finais (HTML e imagens estáticas), com limite de tamanho.
+
+    Cada artefacto é um arquivo "<chave>-<nome>" na pasta da cache. A data de
+    modificação é atualizada a cada acesso e, acima do limite, são apagados
+    primeiro os artefactos usados há mais tempo (LRU).
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, f"{key}-{name}")
+
+    def open(self, key, name):
+        """Abre um artefacto guardado (modo binário) ou retorna None se não existir."""
+        path = self._path(key, name)
+        with self._lock:
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            os.utime(path)
+            self.hits += 1
+            return handle
+
+    def put(self, key, name, handle):
+        """Copia o conteúdo de handle (a partir do início) para a cache e aplica o limite."""
+        path = self._path(key, name)
+        handle.seek(0)
+        with self._lock:
+            # Escrita atómica: sessões concorrentes nunca leem um arquivo incompleto
+            with tempfile.NamedTemporaryFile(dir=self.directory, delete=False, suffix=".tmp") as tmp:
+                shutil.copyfileobj(handle, tmp)
+            os.replace(tmp.name, path)
+            self._evict()
+        handle.seek(0)
+
+    def put_bytes(self, key, name, data):
+        """Guarda um artefacto já em memória (ex.: imagem estática)."""
+        self.put(key, name, io.BytesIO(data))
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # em uso (Windows) ou já removido por outro processo
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        Retorna as estatísticas da cache de mapas.
+
+        Returns:
+            dict: Artefactos, MB ocupados, MB máximo, acertos, falhas e despejos.
+        """
+        with self._lock:
+            entries = self._entries()
+            return {
+                "artefactos": len(entries),
+                "mb_ocupados": round(sum(size for _, size, _ in entries) / 2**20, 1),
+                "mb_maximo": round(self.max_bytes / 2**20, 1),
+                "acertos": self.hits,
+                "falhas": self.misses,
+                "despejos": self.evictions,
+            }
+
+
+@st.cache_resource
+def get_render_cache():
+    """Retorna a cache em disco de mapas finais, única por processo do servidor."""
+    return RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB * 2**20)
@@ -0,0 +1,227 @@
+"""Motor de geometria: operações em bloco, num pool de processos nas camadas grandes."""
+import geopandas as gpd
+import shapely
+import numpy as np
+import itertools
+import threading
+from multiprocessing import shared_memory
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pyproj
+
+from geometry_worker import WorkerContext, apply_geometry_operations, process_geometry_chunk
+
+from .config import GEOMETRY_CHUNK_MIN, GEOMETRY_PARALLEL_MIN, GEOMETRY_POOL_IDLE_SECONDS, GEOMETRY_WORKERS
+
+
+def _share_geometries(geometries):
+    """
+    Copia as coordenadas de um array de geometrias para memória partilhada (formato ragged).
+
+    Os processos do pool leem os seus blocos diretamente dessa memória, sem que o
+    array seja serializado para cada um. Camadas que misturam tipos simples e
+    múltiplos da mesma família (ex.: Polygon e MultiPolygon) são promovidas ao
+    tipo múltiplo e a máscara "single" permite repor o tipo original.
+
+    Args:
+        geometries: Array numpy de geometrias shapely.
+
+    Returns:
+        tuple: (tipo ragged, descritores dos arrays, segmentos de memória), ou None
+        se as geometrias não tiverem representação ragged (o pool usa então WKB).
+    """
+    types = shapely.get_type_id(geometries)
+    missing = types < 0
+    kinds = set(np.unique(types[~missing]).tolist())
+    arrays = {}
+    if len(kinds) > 1:
+        if kinds not in ({0, 4}, {1, 5}, {3, 6}) or shapely.is_empty(geometries).any():
+            return None
+        arrays["single"] = types == min(kinds)
+    if not kinds:
+        return None
+    try:
+        geom_type, coords, offsets = shapely.to_ragged_array(geometries, include_z=None)
+    except (ValueError, NotImplementedError):
+        return None
+    arrays["coords"] = coords
+    arrays.update({f"offsets_{level}": offset for level, offset in enumerate(offsets)})
+    if missing.any():
+        arrays["missing"] = missing
+
+    segments, descriptors = [], {}
+    try:
+        for name, array in arrays.items():
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            segments.append(segment)
+            np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+            descriptors[name] = (segment.name, array.shape, array.dtype.str)
+    except Exception:
+        _release_segments(segments)
+        raise
+    return geom_type, descriptors, segments
+
+
+def _release_segments(segments):
+    for segment in segments:
+        segment.close()
+        segment.unlink()
+
+
+class GeometryPool:
+    """
+    Pool de processos do motor de geometria, partilhado por todas as sessões.
+
+    Os processos são criados no primeiro uso e encerrados depois de idle_seconds sem
+    uso, para que não fiquem em memória (fora de current_rss e do orçamento de
+    memória) enquanto o servidor não processa camadas grandes.
+    """
+
+    def __init__(self, idle_seconds):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._executor = None
+        self._workers = 0
+        self._users = 0
+        self._timer = None
+
+    @contextmanager
+    def use(self, workers):
+        """
+        Empresta o pool (ProcessPoolExecutor) com o número de processos indicado.
+
+        Um pool que falhe (BrokenProcessPool) é descartado e recriado no uso seguinte.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._executor is None or self._workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=WorkerContext())
+                self._workers = workers
+            self._users += 1
+            executor = self._executor
+        try:
+            yield executor
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+        finally:
+            with self._lock:
+                self._users -= 1
+                if self._users == 0 and self._executor is not None:
+                    self._timer = threading.Timer(self.idle_seconds, self._shutdown_idle, args=(self._executor,))
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def _shutdown_idle(self, executor):
+        with self._lock:
+            if self._users or self._executor is not executor:
+                return
+            self._executor = None
+            self._timer = None
+        executor.shutdown(wait=False)
+
+    def running(self):
+        """Se há processos do pool ativos."""
+        with self._lock:
+            return self._executor is not None
+
+
+_GEOMETRY_POOL = GeometryPool(GEOMETRY_POOL_IDLE_SECONDS)
+
+
+def get_geometry_pool():
+    """
+    Retorna o pool de processos do motor de geometria, único por processo do servidor.
+
+    Returns:
+        GeometryPool: Pool com processos iniciados por "spawn" (seguro com as threads do Streamlit).
+    """
+    return _GEOMETRY_POOL
+
+
+def process_geometries(geometries, operations, workers=None, chunk_size=None):
+    """
+    Aplica operações de geometria por blocos num pool de processos, mantendo a ordem original.
+
+    Camadas pequenas (menos de GEOMETRY_PARALLEL_MIN feições) ou um só processo
+    são tratadas no próprio processo, onde o custo do pool não compensa. As
+    coordenadas são partilhadas com os processos através de memória partilhada
+    sempre que a camada tem representação ragged; caso contrário cada bloco é
+    enviado em WKB.
+
+    Args:
+        geometries: Array de geometrias (ex.: gdf.geometry.values).
+        operations: Lista de (nome, parâmetros); ver geometry_worker.apply_geometry_operations.
+        workers: Número de processos. Se None, GEOMETRY_WORKERS.
+        chunk_size: Feições por bloco. Se None, cerca de quatro blocos por processo.
+
+    Returns:
+        np.ndarray: Geometrias resultantes, na ordem de entrada.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    workers = workers or GEOMETRY_WORKERS
+    n = len(geometries)
+    if not operations or workers <= 1 or n < GEOMETRY_PARALLEL_MIN:
+        return apply_geometry_operations(geometries, operations)
+
+    chunk_size = chunk_size or max(GEOMETRY_CHUNK_MIN, -(-n // (workers * 4)))
+    starts = list(range(0, n, chunk_size))
+    stops = [min(start + chunk_size, n) for start in starts]
+    shared = _share_geometries(geometries)
+    try:
+        if shared:
+            geom_type, descriptors, _ = shared
+            sources = itertools.repeat(("shared", geom_type, descriptors))
+        else:
+            sources = [("wkb", shapely.to_wkb(geometries[start:stop])) for start, stop in zip(starts, stops)]
+            starts, stops = [0] * len(sources), [stop - start for start, stop in zip(starts, stops)]
+        with get_geometry_pool().use(workers) as pool:
+            results = list(pool.map(process_geometry_chunk, sources, starts, stops, itertools.repeat(operations)))
+    except BrokenProcessPool:
+        # Um processo terminou de forma anormal: o pool é recriado na próxima chamada
+        return apply_geometry_operations(geometries, operations)
+    finally:
+        if shared:
+            _release_segments(shared[2])
+    return np.concatenate([shapely.from_wkb(result) for result in results])
+
+
+def process_layer(gdf, to_crs=None, repair=False, tolerance=None, workers=None):
+    """
+    Reprojeta, corrige e/ou simplifica a geometria de uma camada com o motor de geometria.
+
+    Args:
+        gdf: GeoDataFrame de entrada (não é alterado).
+        to_crs: CRS de destino. Camadas sem CRS são consideradas já nesse CRS.
+        repair: Se True, corrige as geometrias inválidas (buffer(0)).
+        tolerance: Tolerância de simplificação, nas unidades do CRS final.
+        workers: Número de processos. Se None, GEOMETRY_WORKERS.
+
+    Returns:
+        gpd.GeoDataFrame: Cópia rasa da camada com a geometria processada.
+    """
+    operations = []
+    crs = gdf.crs
+    if to_crs is not None:
+        target = pyproj.CRS.from_user_input(to_crs)
+        if crs is not None and crs != target:
+            operations.append(("to_crs", {"source": crs.to_wkt(), "target": target.to_wkt()}))
+        crs = target
+    if repair:
+        operations.append(("repair", {}))
+    if tolerance:
+        operations.append(("simplify", {"tolerance": tolerance}))
+    result = gdf.copy(deep=False)
+    if operations:
+        result[gdf.geometry.name] = gpd.GeoSeries(process_geometries(gdf.geometry.values, operations, workers), index=gdf.index, crs=crs)
+    if crs is not None and result.crs != crs:
+        result = result.set_crs(crs, allow_override=True)
+    return result
@@ -0,0 +1,293 @@
+"""Leitura, preparação e união das camadas e tabelas, e catálogo de camadas de referência."""
+import streamlit as st
+import geopandas as gpd
+import pandas as pd
+import tempfile
+import zipfile
+import os
+import json
+import shapely
+import numpy as np
+import hashlib
+
+from .config import CATALOG_DIR, CATALOG_MANIFEST
+from .geometry import process_layer
+from .cache import cached_result, cached_upload, file_type
+
+
+def prepare_layer(gdf):
+    """
+    Prepara uma camada para o mapa: CRS EPSG:4326, geometrias válidas e atributos em texto.
+
+    Args:
+        gdf: GeoDataFrame a preparar.
+
+    Returns:
+        gpd.GeoDataFrame: Nova camada preparada, marcada com attrs["preparada"].
+    """
+    # Reprojeção e correção por blocos no motor de geometria (process_layer devolve uma cópia)
+    gdf = process_layer(gdf, to_crs="EPSG:4326", repair=True)
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+    attributes = gdf.columns.difference([gdf.geometry.name])
+    gdf[attributes] = gdf[attributes].astype(str)
+    gdf.attrs["preparada"] = True
+    return gdf
+
+
+def list_reference_layers(catalog_dir=None):
+    """
+    Lista as camadas do catálogo de referência.
+
+    Args:
+        catalog_dir: Pasta do catálogo. Se None, usa CATALOG_DIR.
+
+    Returns:
+        list: Nomes das camadas disponíveis (lista vazia se não houver catálogo).
+    """
+    manifest = os.path.join(catalog_dir or CATALOG_DIR, CATALOG_MANIFEST)
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            return [layer["nome"] for layer in json.load(f).get("camadas", [])]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+@st.cache_resource
+def _load_reference_layer(path, mtime_ns, size):
+    # mtime_ns e size só entram na chave da cache: uma camada reconstruída é lida de novo
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    gdf = gpd.read_parquet(path, memory_map=True)
+    shapely.prepare(gdf.geometry.values)
+    gdf.attrs["preparada"] = True
+    # A origem inclui o hash do arquivo, para que a cache de mapas não sirva a geometria anterior
+    gdf.attrs["fonte"] = f"catalogo:{digest.hexdigest()}"
+    return gdf
+
+
+def load_reference_layer(nome, catalog_dir=None):
+    """
+    Carrega uma camada do catálogo de referência.
+
+    A camada é lida uma única vez por processo (e de novo se o arquivo mudar) e
+    partilhada entre sessões; cada chamada recebe uma cópia rasa, para que a versão
+    partilhada não seja alterada. A origem (attrs["fonte"]) é o hash do arquivo.
+
+    Args:
+        nome: Nome da camada no catálogo.
+        catalog_dir: Pasta do catálogo. Se None, usa CATALOG_DIR.
+
+    Returns:
+        gpd.GeoDataFrame: Camada preparada, ou None em caso de erro.
+    """
+    catalog_dir = catalog_dir or CATALOG_DIR
+    try:
+        with open(os.path.join(catalog_dir, CATALOG_MANIFEST), encoding="utf-8") as f:
+            layers = {layer["nome"]: layer for layer in json.load(f)["camadas"]}
+        path = os.path.join(catalog_dir, layers[nome]["arquivo"])
+        stat = os.stat(path)
+        return _load_reference_layer(path, stat.st_mtime_ns, stat.st_size).copy(deep=False)
+    except Exception as e:
+        st.error(f"Erro ao carregar a camada '{nome}' do catálogo: {e}")
+        return None
+
+
+def build_reference_layer(source, nome, arquivo=None, catalog_dir=None):
+    """
+    Converte um shapefile (ou outro formato suportado) numa camada do catálogo.
+
+    A camada é preparada (prepare_layer), gravada em GeoParquet e registada no
+    manifesto do catálogo, substituindo uma entrada com o mesmo nome.
+
+    Args:
+        source: Caminho para o shapefile, arquivo ZIP ou outro formato lido por gpd.read_file.
+        nome: Nome da camada no catálogo.
+        arquivo: Nome do arquivo .parquet. Se None, é derivado do nome.
+        catalog_dir: Pasta do catálogo. Se None, usa CATALOG_DIR.
+
+    Returns:
+        str: Caminho do arquivo GeoParquet criado.
+    """
+    catalog_dir = catalog_dir or CATALOG_DIR
+    os.makedirs(catalog_dir, exist_ok=True)
+    arquivo = arquivo or "".join(c if c.isalnum() else "_" for c in nome.lower()) + ".parquet"
+    gdf = prepare_layer(gpd.read_file(source))
+    path = os.path.join(catalog_dir, arquivo)
+    gdf.to_parquet(path, index=False)
+
+    manifest = os.path.join(catalog_dir, CATALOG_MANIFEST)
+    catalog = {"camadas": []}
+    if os.path.exists(manifest):
+        with open(manifest, encoding="utf-8") as f:
+            catalog = json.load(f)
+    catalog["camadas"] = [layer for layer in catalog["camadas"] if layer["nome"] != nome]
+    catalog["camadas"].append({"nome": nome, "arquivo": arquivo})
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _geometry_ids(geometries):
+    """Identidade de cada objeto geométrico (as geometrias shapely são imutáveis)."""
+    return np.fromiter(map(id, geometries), dtype=np.uint64, count=len(geometries))
+
+
+@st.cache_resource(max_entries=32)
+def _layer_tree(fonte, n_features, crs, _geometries):
+    # A árvore guarda referências às geometrias, pelo que os ids não são reutilizados
+    return shapely.STRtree(_geometries), _geometry_ids(_geometries)
+
+
+def get_layer_tree(gdf):
+    """
+    Retorna o índice espacial STRtree de uma camada, guardado por processo.
+
+    attrs["fonte"] passa para cópias e filtros que podem ter outras geometrias,
+    por isso a árvore guardada só é usada se as geometrias forem os mesmos objetos.
+
+    Args:
+        gdf: GeoDataFrame da camada.
+
+    Returns:
+        shapely.STRtree: Índice sobre gdf.geometry (índices posicionais das linhas).
+    """
+    geometries = np.asarray(gdf.geometry.values, dtype=object)
+    fonte = gdf.attrs.get("fonte")
+    if fonte is None:
+        return shapely.STRtree(geometries)
+    tree, ids = _layer_tree(fonte, len(gdf), str(gdf.crs), geometries)
+    if not np.array_equal(ids, _geometry_ids(geometries)):
+        return shapely.STRtree(geometries)
+    return tree
+
+
+def join_layers(gdf, data, left_on, right_on, matches=None):
+    """
+    Une a tabela de dados à camada preparada (prepare_layer), guardando o resultado na cache.
+
+    Args:
+        gdf: GeoDataFrame dos municípios.
+        data: DataFrame da tabela de dados.
+        left_on: Coluna de união no shapefile.
+        right_on: Coluna de união na tabela.
+        matches: Tabela de correspondências (match_keys) para a união aproximada;
+            só as linhas com "aceitar" verdadeiro são usadas, e nelas a chave da tabela passa
+            a ser a do shapefile. Se None, união exata.
+
+    Returns:
+        gpd.GeoDataFrame: Resultado da união (left join), marcado como preparado.
+    """
+    mapping = None
+    if matches is not None:
+        accepted = matches[matches["aceitar"].astype(bool)]
+        mapping = dict(zip(accepted["chave (tabela)"], accepted["chave (shapefile)"]))
+
+    def join():
+        layer = gdf if gdf.attrs.get("preparada") else prepare_layer(gdf)
+        keyed = data
+        if mapping is not None:
+            # troca as chaves da tabela pelas do shapefile; as sem correspondência ficam como estão
+            keyed = data.assign(**{right_on: data[right_on].map(mapping).fillna(data[right_on])})
+        merged = layer.merge(keyed, left_on=left_on, right_on=right_on, how="left")
+        merged.attrs["preparada"] = True
+        return merged
+
+    matches_token = None if mapping is None else hashlib.blake2b(repr(sorted(mapping.items(), key=str)).encode(), digest_size=16).hexdigest()
+    return cached_result(("join_layers", left_on, right_on, tuple(gdf.columns), tuple(data.columns), matches_token), [gdf, data], join)
+
+
+#@st.cache_resource
+@cached_upload
+def load_shapefile(zip_file):
+    """
+    Carrega um shapefile a partir de um arquivo ZIP.
+
+    Args:
+        zip_file: Arquivo ZIP contendo o shapefile (.shp e arquivos associados).
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame com os dados do shapefile, ou None em caso de erro.
+    """
+    message_placeholder = st.empty()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            zip_path = os.path.join(tmpdir, "shapefile.zip")
+            with open(zip_path, "wb") as f:
+                f.write(zip_file.read())
+            with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                zip_ref.extractall(tmpdir)
+            shapefile_path = [os.path.join(tmpdir, f) for f in os.listdir(tmpdir) if f.endswith(".shp")]
+            if not shapefile_path:
+                message_placeholder.error("O arquivo ZIP não contém um shapefile (.shp). Verifique o conteúdo do arquivo.")
+                return None
+            message_placeholder.info("Carregando shapefile...")
+            gdf = gpd.read_file(shapefile_path[0])
+            gdf[gdf.columns.difference(['geometry'])] = gdf[gdf.columns.difference(['geometry'])].astype(str)
+            # Verificar e definir CRS
+            if gdf.crs is None:
+                message_placeholder.warning("Shapefile sem CRS definido. Definindo como EPSG:4326...")
+                gdf.set_crs(epsg=4326, inplace=True)
+            message_placeholder.empty()
+            return gdf
+    except zipfile.BadZipFile:
+        message_placeholder.error("O arquivo ZIP está corrompido ou não é válido.")
+        return None
+    except gpd.io.file.fiona.errors.FionaValueError:
+        message_placeholder.error("Erro ao ler o shapefile. Verifique se todos os arquivos (.shp, .shx, .dbf) estão presentes.")
+        return None
+    except Exception as e:
+        message_placeholder.error(f"Erro inesperado ao processar o shapefile: {e}")
+        return None
+
+#@st.cache_resource
+@cached_upload
+def load_data_file(file, sheet_name=None):
+    """
+    Carrega dados de arquivos Excel, CSV ou TXT.
+
+    Args:
+        file: Arquivo de entrada (xlsx, xls, csv, txt).
+        sheet_name: Nome da planilha a ser lida (para arquivos Excel). Se None, lê a primeira planilha.
+
+    Returns:
+        pd.DataFrame: DataFrame com os dados, ou None em caso de erro.
+    """
+    message_placeholder = st.empty()
+    mime_type = file_type(file)
+    if mime_type in ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/vnd.ms-excel"]:
+        try:
+            message_placeholder.info("Carregando arquivo Excel...")
+            # sheet_name=None no pandas lê todas as planilhas (dicionário); aqui significa a primeira
+            data = pd.read_excel(file, sheet_name=0 if sheet_name is None else sheet_name, dtype=str)
+            message_placeholder.empty()
+            return data
+        except ValueError as e:
+            message_placeholder.error(f"Erro ao carregar a planilha '{sheet_name}': {e}")
+            return None
+        except Exception as e:
+            message_placeholder.error(f"Erro inesperado ao carregar arquivo Excel: {e}")
+            return None
+    elif mime_type == "text/csv":
+        try:
+            message_placeholder.info("Carregando arquivo CSV...")
+            data = pd.read_csv(file, dtype=str, low_memory=False)
+            message_placeholder.empty()
+            return data
+        except ValueError as e:
+            message_placeholder.error(f"Erro ao carregar arquivo CSV: {e}")
+            return None
+    elif mime_type == "text/plain":
+        try:
+            message_placeholder.info("Carregando arquivo TXT...")
+            # O motor "python" (necessário para detetar o separador) não aceita low_memory
+            data = pd.read_csv(file, sep=None, engine='python', dtype=str)
+            message_placeholder.empty()
+            return data
+        except ValueError as e:
+            message_placeholder.error(f"Erro ao carregar arquivo TXT: {e}")
+            return None
+    else:
+        message_placeholder.error("Formato de arquivo não suportado. Use xlsx, xls, csv ou txt.")
+        return None
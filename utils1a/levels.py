@@ -0,0 +1,225 @@
+"""Níveis de zoom (simplificação por zoom) e carregamento da área visível do mapa."""
+import geopandas as gpd
+import folium
+import os
+from branca.element import Template, MacroElement
+import shapely
+import numpy as np
+
+from .geometry import process_layer
+from .cache import cached_result
+from .layers import get_layer_tree
+from .analysis import derive_parent_layer
+from .styles import StyledGeoJson, indicator_color_codes
+
+
+# Zoom máximo das tiles de fundo; acima dele não há simplificação
+MAX_ZOOM = 18
+
+
+def zoom_tolerance(zoom, pixels=0.5):
+    """
+    Tolerância de simplificação (em graus) que corresponde a uma fração de pixel num nível de zoom.
+
+    Args:
+        zoom: Nível de zoom do Leaflet (tiles de 256 pixels).
+        pixels: Desvio máximo admitido, em pixels.
+
+    Returns:
+        float: Tolerância em graus (EPSG:4326).
+    """
+    return pixels * 360 / (256 * 2 ** zoom)
+
+
+def simplify_level(gdf, max_zoom):
+    """
+    Simplifica a geometria de um nível administrativo para o maior zoom em que é mostrado.
+
+    Acima de max_zoom o nível deixa de ser desenhado, pelo que os vértices que não
+    se distinguem nesse zoom são dispensáveis. Se a camada for uma cobertura válida,
+    a simplificação é feita sobre a cobertura (coverage_simplify): cada limite
+    partilhado é simplificado uma única vez, sem abrir lacunas nem sobreposições
+    entre vizinhos. O resultado fica na cache de dados.
+
+    Args:
+        gdf: GeoDataFrame do nível, em EPSG:4326.
+        max_zoom: Maior zoom em que o nível é mostrado (None = sem limite, sem simplificação).
+
+    Returns:
+        gpd.GeoDataFrame: Camada simplificada (ou a própria camada, se não houver limite).
+    """
+    if max_zoom is None or max_zoom >= MAX_ZOOM:
+        return gdf
+
+    def simplify():
+        tolerance = zoom_tolerance(max_zoom)
+        # Geometrias vazias no lugar das ausentes: as funções de cobertura desalinham o resultado com None
+        geometries = np.asarray(gdf.geometry.values, dtype=object).copy()
+        missing = shapely.is_missing(geometries)
+        geometries[missing] = shapely.Polygon()
+        try:
+            if not shapely.coverage_is_valid(geometries):
+                raise ValueError("cobertura inválida")
+            simplified = shapely.coverage_simplify(geometries, tolerance)
+        except (ValueError, TypeError, shapely.errors.GEOSException):
+            # Camadas que não formam uma cobertura são simplificadas feição a feição
+            return process_layer(gdf, tolerance=tolerance)
+        simplified[missing] = None
+        result = gdf.copy(deep=False)
+        result[gdf.geometry.name] = gpd.GeoSeries(simplified, index=gdf.index, crs=gdf.crs)
+        return result
+
+    return cached_result(("simplify_level", max_zoom), [gdf], simplify)
+
+
+def simplify_parent_level(gdf, parent_column, max_zoom):
+    """
+    Simplifica um nível superior derivado dos municípios a partir dos municípios simplificados.
+
+    Os limites do nível superior ficam assim sobre os mesmos vértices que os dos
+    municípios simplificados para o mesmo zoom.
+
+    Args:
+        gdf: GeoDataFrame dos municípios, em EPSG:4326.
+        parent_column: Coluna com o código ou nome da unidade superior (ver derive_parent_layer).
+        max_zoom: Maior zoom em que o nível superior é mostrado.
+
+    Returns:
+        gpd.GeoDataFrame: Camada superior dissolvida a partir da cobertura simplificada.
+    """
+    return derive_parent_layer(simplify_level(gdf, max_zoom), parent_column)
+
+
+class ZoomLevels(MacroElement):
+    """
+    Mostra cada nível administrativo apenas no intervalo de zoom que lhe corresponde.
+
+    Os níveis com geometria própria (data) só são convertidos em camadas Leaflet
+    quando o zoom entra no seu intervalo pela primeira vez.
+    """
+
+    _template = Template("""
+    {% macro script(this, kwargs) %}
+    var {{ this.get_name() }}_levels = [
+        {%- for level in this.levels %}
+        {group: {{ level.group.get_name() }}, min: {{ level.min_zoom|tojson }}, max: {{ level.max_zoom|tojson }},
+         style: {{ level.style|tojson }}, data: {{ level.data or "null" }}},
+        {%- endfor %}
+    ];
+    function {{ this.get_name() }}_update() {
+        var map = {{ this._parent.get_name() }};
+        var zoom = map.getZoom();
+        {{ this.get_name() }}_levels.forEach(function(level) {
+            var inRange = (level.min === null || zoom >= level.min) && (level.max === null || zoom <= level.max);
+            if (inRange && level.data) {
+                L.geoJson(level.data, {style: level.style, interactive: false}).addTo(level.group);
+                level.data = null;
+            }
+            if (inRange && !map.hasLayer(level.group)) {
+                map.addLayer(level.group);
+            } else if (!inRange && map.hasLayer(level.group)) {
+                map.removeLayer(level.group);
+            }
+        });
+    }
+    {{ this._parent.get_name() }}.on("zoomend", {{ this.get_name() }}_update);
+    {{ this.get_name() }}_update();
+    {% endmacro %}
+    """)
+
+    def __init__(self, levels):
+        """
+        Args:
+            levels: Lista de dicionários com "group" (folium.FeatureGroup), "min_zoom",
+                "max_zoom" e, para carregamento diferido, "data" (GeoJSON) e "style".
+        """
+        super().__init__()
+        self._name = "ZoomLevels"
+        self.levels = [{"style": None, "data": None, **level} for level in levels]
+
+
+# Margem carregada à volta da área visível (fração da largura e da altura), para
+# que pequenos deslocamentos não deixem o mapa vazio até à resposta do servidor
+VIEW_PADDING = float(os.environ.get("DATAONMAP_VIEW_PADDING", 0.25))
+
+
+def map_view_state(state, default_bounds=None, default_zoom=None):
+    """
+    Extrai a área visível e o zoom do valor devolvido pelo st_folium.
+
+    Args:
+        state: Dicionário devolvido pelo st_folium (ou None antes da primeira interação).
+        default_bounds: Área usada quando o mapa ainda não comunicou a sua (oeste, sul, leste, norte).
+        default_zoom: Zoom usado quando o mapa ainda não comunicou o seu.
+
+    Returns:
+        tuple: ((oeste, sul, leste, norte), zoom).
+    """
+    state = state or {}
+    bounds = state.get("bounds") or {}
+    south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    try:
+        view = (float(south_west["lng"]), float(south_west["lat"]), float(north_east["lng"]), float(north_east["lat"]))
+    except (KeyError, TypeError, ValueError):
+        view = default_bounds
+    zoom = state.get("zoom")
+    return view, default_zoom if zoom is None else int(zoom)
+
+
+def features_in_view(gdf, bounds, zoom, padding=VIEW_PADDING):
+    """
+    Seleciona as feições que intersectam a área visível, simplificadas para o zoom atual.
+
+    A seleção usa o STRtree da camada (get_layer_tree) e só as feições
+    selecionadas são simplificadas, pelo que o custo acompanha a área visível e
+    não o tamanho da camada.
+
+    Args:
+        gdf: GeoDataFrame da camada, em EPSG:4326.
+        bounds: Área visível (oeste, sul, leste, norte).
+        zoom: Nível de zoom do Leaflet (None = sem simplificação).
+        padding: Margem à volta da área visível, em fração da largura e da altura.
+
+    Returns:
+        gpd.GeoDataFrame: Feições visíveis, na ordem da camada.
+    """
+    west, south, east, north = bounds
+    dx, dy = (east - west) * padding, (north - south) * padding
+    area = shapely.box(west - dx, south - dy, east + dx, north + dy)
+    visible = gdf.iloc[np.sort(get_layer_tree(gdf).query(area, predicate="intersects"))]
+    tolerance = zoom_tolerance(zoom) if zoom is not None and zoom < MAX_ZOOM else None
+    return process_layer(visible, tolerance=tolerance)
+
+
+def build_view_layer(gdf, column, color_mapping, tooltip_field, bounds, zoom, border_color="#808080", border_width=0.5):
+    """
+    Constrói a camada com as feições visíveis, para o argumento feature_group_to_add do st_folium.
+
+    O st_folium substitui esta camada a cada deslocamento ou zoom sem recriar o
+    mapa, pelo que o navegador só recebe as feições da área visível.
+
+    Args:
+        gdf: GeoDataFrame unido à tabela de dados.
+        column: Coluna do indicador.
+        color_mapping: Dicionário categoria -> cor, ou escala contínua do branca.
+        tooltip_field: Campo exibido no tooltip.
+        bounds: Área visível (oeste, sul, leste, norte).
+        zoom: Nível de zoom do Leaflet.
+        border_color: Cor dos limites.
+        border_width: Largura dos limites.
+
+    Returns:
+        tuple: (folium.FeatureGroup, número de feições enviadas).
+    """
+    visible = features_in_view(gdf, bounds, zoom)
+    group = folium.FeatureGroup(name="Área visível")
+    if len(visible):
+        palette, codes = indicator_color_codes(visible[column], color_mapping)
+        StyledGeoJson(
+            visible,
+            {column: (palette, codes)},
+            tooltip_field=tooltip_field,
+            border_color=border_color,
+            border_width=border_width
+        ).add_to(group)
+    return group, len(visible)
@@ -0,0 +1,741 @@
+"""Mapas Folium: mapa coroplético, comparação lado a lado, camadas de fundo, controlos e legenda."""
+import streamlit as st
+import pandas as pd
+import folium
+from folium.plugins import Fullscreen, MeasureControl, MousePosition, LocateControl, Draw, MiniMap
+import folium.plugins
+from branca.element import Template, MacroElement
+import branca
+import branca.colormap
+import html
+import numpy as np
+
+from .geometry import process_geometries, process_layer
+from .layers import prepare_layer
+from .levels import ZoomLevels, simplify_level, simplify_parent_level
+from .styles import DECODE_STYLE_CODES_JS, IndicatorSelector, STYLE_CODE_ALPHABET, StyledGeoJson, encode_style_codes, features_to_geojson, format_edges, indicator_color_codes
+
+
+# Camadas de fundo disponíveis (argumentos de folium.TileLayer). Não acrescentam bibliotecas;
+# as tiles só são pedidas quando a camada está ativa.
+BASEMAPS = {
+    "Fundo Cartográfico": {"tiles": "CartoDB positron", "attr": "Tiles © CartoDB"},
+    "Ruas": {"tiles": "OpenStreetMap", "attr": "pav@ngola.com"},
+    "Fundo Branco": {"tiles": branca.utilities.image_to_url([[1, 1], [1, 1]]), "attr": "@PAVANGOLA"},
+    "Fundo Cinza": {"tiles": " ", "attr": "@PAVANGOLA"},
+    "Google Maps": {"tiles": "https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}", "attr": "Google"},
+    "Google Satellite": {"tiles": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}", "attr": "Google"},
+    "Google Híbrido": {"tiles": "https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}", "attr": "Google"},
+    "Google Terrain": {"tiles": "https://mt1.google.com/vt/lyrs=p&x={x}&y={y}&z={z}", "attr": "Google"},
+    "Esri Satellite": {"tiles": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}", "attr": "Esri"},
+}
+DEFAULT_BASEMAPS = ["Fundo Cartográfico", "Ruas", "Fundo Branco"]
+
+# Controlos opcionais do mapa: nome, custo aproximado das bibliotecas (KB, JS+CSS minificados),
+# bibliotecas base de que dependem (nomes em folium.Map.default_js/default_css) e construtor
+MAP_CONTROLS = {
+    "layers": {"nome": "Seletor de camadas", "custo_kb": 0, "requer": [],
+               "criar": lambda: folium.LayerControl(position="topleft", collapsed=True)},
+    "fullscreen": {"nome": "Ecrã inteiro", "custo_kb": 7, "requer": [],
+                   "criar": lambda: Fullscreen(position="topleft")},
+    "mouse_position": {"nome": "Coordenadas do cursor", "custo_kb": 3, "requer": [],
+                       "criar": lambda: MousePosition(position="topright", separator=" | ")},
+    "measure": {"nome": "Medição de distâncias e áreas", "custo_kb": 100, "requer": [],
+                "criar": lambda: MeasureControl(position="topleft", secondary_length_unit="kilometers")},
+    "geocoder": {"nome": "Pesquisa de locais", "custo_kb": 55, "requer": [],
+                 "criar": lambda: folium.plugins.Geocoder(position="topleft", collapsed=True, add_marker=False, placeholder="Digite um local...", popup_on_found=True, zoom=12)},
+    "draw": {"nome": "Desenho e exportação (GeoJSON)", "custo_kb": 70, "requer": [],
+             "criar": lambda: Draw(
+                 export=True,
+                 filename="my_data.geojson",
+                 show_geometry_on_click=False,
+                 position="topright",
+                 draw_options={
+                     "polyline": {"allowIntersection": False},  # Linhas não podem se cruzar
+                     "circle": {},
+                     "rectangle": {},
+                     "polygon": {"allowIntersection": False},  # Polígonos sem interseção
+                     "marker": {},
+                 },
+                 edit_options={"poly": {"allowIntersection": False}}  # Editar sem interseções
+             )},
+    "locate": {"nome": "Localização atual", "custo_kb": 110, "requer": ["awesome_markers_font_css"],
+               "criar": lambda: LocateControl(position="topright", strings={"title": "See you current location", "popup": "Your position"})},
+    "minimap": {"nome": "Mini-mapa", "custo_kb": 12, "requer": [],
+                "criar": lambda: MiniMap(toggle_display=True, position="bottomright")},
+}
+DEFAULT_MAP_CONTROLS = ["layers", "fullscreen"]
+# Bibliotecas que todos os mapas carregam (o folium inclui ainda jQuery, Bootstrap e Font Awesome,
+# que só alguns elementos usam)
+MAP_BASE_ASSETS = ["leaflet", "leaflet_css"]
+# Bibliotecas do folium.Map de que dependem elementos do próprio folium: os popups usam jQuery
+# e os ícones Awesome Markers usam as fontes e o CSS do Bootstrap e do Font Awesome
+ELEMENT_ASSETS = [
+    (folium.Popup, ["jquery"]),
+    (folium.Icon, ["awesome_markers", "awesome_markers_css", "awesome_markers_font_css", "awesome_rotate_css", "bootstrap_css", "glyphicons_css"]),
+]
+
+
+def add_basemaps(m, basemaps=None):
+    """
+    Adiciona as camadas de fundo escolhidas; a primeira fica ativa.
+
+    Args:
+        m: Mapa Folium.
+        basemaps: Nomes em BASEMAPS. Se None, usa DEFAULT_BASEMAPS.
+    """
+    for i, name in enumerate(DEFAULT_BASEMAPS if basemaps is None else basemaps):
+        folium.TileLayer(name=name, overlay=False, control=True, show=(i == 0), **BASEMAPS[name]).add_to(m)
+
+
+def _walk_elements(element):
+    yield element
+    for child in element._children.values():
+        yield from _walk_elements(child)
+
+
+def map_required_assets(m, controls=()):
+    """
+    Bibliotecas base (nomes em folium.Map.default_js/default_css) de que o mapa precisa.
+
+    Além de MAP_BASE_ASSETS e das bibliotecas dos controlos, inclui as dos elementos
+    já presentes no mapa que dependem das bibliotecas por omissão do folium (ELEMENT_ASSETS).
+
+    Args:
+        m: Mapa Folium.
+        controls: Chaves de MAP_CONTROLS.
+
+    Returns:
+        set: Nomes das bibliotecas necessárias.
+    """
+    required = set(MAP_BASE_ASSETS)
+    for key in controls:
+        required.update(MAP_CONTROLS[key]["requer"])
+    if getattr(m, "objects_to_stay_in_front", None):
+        required.add("jquery")
+    for element in _walk_elements(m):
+        for element_type, assets in ELEMENT_ASSETS:
+            if isinstance(element, element_type):
+                required.update(assets)
+    return required
+
+
+def add_map_controls(m, controls=None):
+    """
+    Adiciona os controlos escolhidos e limita as bibliotecas do mapa às que são usadas.
+
+    Das bibliotecas que o folium inclui por omissão ficam só as de MAP_BASE_ASSETS, as dos
+    controlos e as dos elementos do mapa que delas dependem (map_required_assets), pelo que
+    deve ser chamada depois de adicionados os popups e ícones do folium.
+
+    Args:
+        m: Mapa Folium.
+        controls: Chaves de MAP_CONTROLS. Se None, usa DEFAULT_MAP_CONTROLS.
+
+    Returns:
+        int: Custo aproximado (KB) das bibliotecas dos controlos adicionados.
+    """
+    controls = DEFAULT_MAP_CONTROLS if controls is None else controls
+    for key in controls:
+        MAP_CONTROLS[key]["criar"]().add_to(m)
+    required = map_required_assets(m, controls)
+    m.default_js = [asset for asset in folium.Map.default_js if asset[0] in required]
+    m.default_css = [asset for asset in folium.Map.default_css if asset[0] in required]
+    return map_controls_cost(controls)
+
+
+def map_controls_cost(controls):
+    """
+    Custo aproximado (KB) das bibliotecas de um conjunto de controlos.
+
+    Args:
+        controls: Chaves de MAP_CONTROLS.
+
+    Returns:
+        int: Soma de custo_kb.
+    """
+    return sum(MAP_CONTROLS[key]["custo_kb"] for key in controls)
+
+
+#@st.cache_resource
+def create_choropleth_map(_gdf, _gdf2, categorical_column, color_mapping, tooltip_field, prov_label_config=None, mun_label_config=None, prov_border_width=1.0, prov_border_color="#000000", mun_border_width=0.5, mun_border_color="#808080", color_mode="categorical", colormap=None, visible_categories=None, hidden_mode="hide", category_index=None, indicator_control="select", levels=None, prov_zoom=None, mun_zoom=None, basemaps=None, controls=None, parent_column=None):
+    """
+    Cria um mapa coroplético com base nos dados fornecidos, com opção de adicionar rótulos personalizados e configurar limites.
+
+    Args:
+        _gdf: GeoDataFrame dos municípios (não hashável).
+        _gdf2: GeoDataFrame das províncias (não hashável).
+        categorical_column: Coluna categórica para coloração, ou lista de colunas (vários
+            indicadores no mesmo arquivo, com a geometria guardada uma única vez).
+        color_mapping: Dicionário mapeando categorias para cores. Com vários indicadores,
+            dicionário coluna -> mapeamento de cores ou escala contínua do branca.
+        tooltip_field: Campo para exibir no tooltip.
+        prov_label_config: Dicionário com configurações de rótulos para províncias (column, font_size, font_color, font_name, bold).
+        mun_label_config: Dicionário com configurações de rótulos para municípios (column, font_size, font_color, font_name, bold).
+        prov_border_width: Largura dos limites das províncias.
+        prov_border_color: Cor dos limites das províncias.
+        mun_border_width: Largura dos limites dos municípios.
+        mun_border_color: Cor dos limites dos municípios.
+        color_mode: "categorical" (cores de color_mapping) ou "continuous" (escala contínua).
+        colormap: Escala do branca usada no modo "continuous" (ver continuous_colormap).
+        visible_categories: Categorias a mostrar (do primeiro indicador). Se None, mostra todas.
+        hidden_mode: "hide" (omite as restantes) ou "background" (desenha-as numa única camada cinzenta).
+        category_index: Índice de linhas por categoria (build_category_index), para filtrar sem percorrer a coluna.
+        indicator_control: Controlo de troca de indicador: "select" ou "slider" (séries temporais, ver pivot_periods).
+        levels: Níveis administrativos adicionais (ex.: país, comunas), lista de dicionários com
+            "gdf", "name", "min_zoom", "max_zoom" e opcionalmente "border_color" e "border_width".
+        prov_zoom: Intervalo de zoom (mínimo, máximo) das províncias. Se None, mostradas sempre.
+        mun_zoom: Intervalo de zoom (mínimo, máximo) dos municípios. Se None, mostrados sempre.
+        basemaps: Camadas de fundo (chaves de BASEMAPS); a primeira é a inicial. Se None, DEFAULT_BASEMAPS.
+        controls: Controlos do mapa (chaves de MAP_CONTROLS). Se None, DEFAULT_MAP_CONTROLS.
+        parent_column: Coluna dos municípios que identifica a província, quando _gdf2 foi
+            derivada dos municípios (derive_parent_layer). Com prov_zoom, as províncias são
+            então derivadas dos municípios simplificados, com limites coincidentes.
+
+    Returns:
+        folium.Map: Mapa gerado, ou None em caso de erro.
+    """
+    message_placeholder = st.empty()
+    try:
+        # Verificar se os GeoDataFrames não estão vazios
+        if _gdf.empty or _gdf2.empty:
+            message_placeholder.error("Os shapefiles estão vazios. Verifique os dados carregados.")
+            return None
+
+        # Verificar se as colunas dos indicadores existem
+        indicators = list(categorical_column) if isinstance(categorical_column, (list, tuple)) else [categorical_column]
+        for column in indicators:
+            if column not in _gdf.columns:
+                message_placeholder.error(f"A coluna '{column}' não foi encontrada no shapefile.")
+                return None
+
+        # Verificar se a coluna de tooltip existe
+        if tooltip_field not in _gdf.columns:
+            message_placeholder.error(f"A coluna de tooltip '{tooltip_field}' não foi encontrada no shapefile.")
+            return None
+
+        # Validar configurações de rótulos
+        if prov_label_config and prov_label_config.get("column") and prov_label_config["column"] not in _gdf2.columns:
+            message_placeholder.error(f"A coluna de rótulos '{prov_label_config['column']}' não foi encontrada no shapefile de províncias.")
+            return None
+        if mun_label_config and mun_label_config.get("column") and mun_label_config["column"] not in _gdf.columns:
+            message_placeholder.error(f"A coluna de rótulos '{mun_label_config['column']}' não foi encontrada no shapefile de municípios.")
+            return None
+
+        # Reprojetar para EPSG:4326, se necessário (camadas do catálogo já estão preparadas)
+        if not _gdf.attrs.get("preparada") and _gdf.crs != "EPSG:4326":
+            message_placeholder.info("Convertendo shapefile de municípios para EPSG:4326...")
+            _gdf = process_layer(_gdf, to_crs="EPSG:4326")
+        if not _gdf2.attrs.get("preparada") and _gdf2.crs != "EPSG:4326":
+            message_placeholder.info("Convertendo shapefile de províncias para EPSG:4326...")
+            _gdf2 = process_layer(_gdf2, to_crs="EPSG:4326")
+
+        # Validar geometrias (só as inválidas são corrigidas, por blocos no motor de geometria)
+        if not _gdf.attrs.get("preparada") and not _gdf.geometry.is_valid.all():
+            message_placeholder.warning("Algumas geometrias no shapefile de municípios são inválidas. Tentando corrigir...")
+            _gdf = process_layer(_gdf, repair=True)
+        if not _gdf2.attrs.get("preparada") and not _gdf2.geometry.is_valid.all():
+            message_placeholder.warning("Algumas geometrias no shapefile de províncias são inválidas. Tentando corrigir...")
+            _gdf2 = process_layer(_gdf2, repair=True)
+
+        # Verificar se há geometrias não nulas
+        if _gdf.geometry.isna().any() or _gdf2.geometry.isna().any():
+            message_placeholder.error("Alguns registros nos shapefiles não possuem geometrias válidas.")
+            return None
+
+        # Centralizar o mapa
+        minx, miny, maxx, maxy = _gdf.total_bounds
+        latitude_central = (miny + maxy) / 2
+        longitude_central = (minx + maxx) / 2
+
+        # Criar o mapa
+        message_placeholder.info("Construindo mapa...")
+        m = folium.Map(location=[latitude_central, longitude_central], zoom_start=6, tiles=None, control_scale=True)
+
+        # Cada nível é desenhado com a geometria simplificada para o seu zoom máximo
+        zoom_levels = []
+        for level in levels or []:
+            layer_gdf = level["gdf"]
+            if not layer_gdf.attrs.get("preparada"):
+                layer_gdf = prepare_layer(layer_gdf)
+            layer_gdf = simplify_level(layer_gdf, level.get("max_zoom"))
+            zoom_levels.append({
+                "group": folium.FeatureGroup(level["name"], show=True).add_to(m),
+                "min_zoom": level.get("min_zoom"),
+                "max_zoom": level.get("max_zoom"),
+                "data": features_to_geojson(layer_gdf[[layer_gdf.geometry.name]]),
+                "style": {"color": level.get("border_color", "#404040"), "weight": level.get("border_width", 1.0), "fill": False},
+            })
+        if prov_zoom:
+            _gdf2 = simplify_parent_level(_gdf, parent_column, prov_zoom[1]) if parent_column else simplify_level(_gdf2, prov_zoom[1])
+        if mun_zoom:
+            _gdf = simplify_level(_gdf, mun_zoom[1])
+
+        # Adicionar camada de províncias
+        prov = folium.FeatureGroup("Províncias", show=True).add_to(m)
+        folium.GeoJson(
+            _gdf2,
+            style_function=lambda feature: {
+                'color': prov_border_color,
+                'fillColor': 'none',
+                'weight': prov_border_width,
+                'fillOpacity': 1
+            }
+        ).add_to(prov)
+
+        # Adicionar camada de municípios com cores
+        distr = folium.FeatureGroup("Municípios", show=True).add_to(m)
+        if len(indicators) > 1:
+            mappings = color_mapping
+        elif color_mode == "continuous":
+            if colormap is None:
+                message_placeholder.error("O modo de escala contínua requer uma escala de cores.")
+                return None
+            mappings = {indicators[0]: colormap}
+        else:
+            mappings = {indicators[0]: color_mapping}
+        styles = {column: indicator_color_codes(_gdf[column], mappings[column]) for column in indicators}
+        # Municípios sem dados em nenhum indicador não são desenhados
+        has_geometry = _gdf.geometry.notna().to_numpy()
+        drawn = np.any([codes >= 0 for _, codes in styles.values()], axis=0) & has_geometry
+        if visible_categories is not None:
+            if category_index is not None:
+                visible = np.zeros(len(_gdf), dtype=bool)
+                for category in visible_categories:
+                    visible[category_index.get(category, [])] = True
+            else:
+                visible = _gdf[indicators[0]].isin(visible_categories).to_numpy()
+            if hidden_mode == "background":
+                background = folium.FeatureGroup("Outros municípios", show=True).add_to(m)
+                StyledGeoJson(
+                    _gdf.loc[~visible & has_geometry, [_gdf.geometry.name]],
+                    {"fundo": (["#d9d9d9"], None)},
+                    border_color=mun_border_color,
+                    border_width=mun_border_width
+                ).add_to(background)
+                if mun_zoom:
+                    zoom_levels.append({"group": background, "min_zoom": mun_zoom[0], "max_zoom": mun_zoom[1]})
+            drawn &= visible
+        layer = StyledGeoJson(
+            _gdf[drawn],
+            {column: (palette, codes[drawn]) for column, (palette, codes) in styles.items()},
+            tooltip_field=tooltip_field,
+            border_color=mun_border_color,
+            border_width=mun_border_width
+        ).add_to(distr)
+        if len(indicators) > 1:
+            IndicatorSelector(layer, indicators, control=indicator_control).add_to(m)
+        if prov_zoom:
+            zoom_levels.append({"group": prov, "min_zoom": prov_zoom[0], "max_zoom": prov_zoom[1]})
+        if mun_zoom:
+            zoom_levels.append({"group": distr, "min_zoom": mun_zoom[0], "max_zoom": mun_zoom[1]})
+        if zoom_levels:
+            ZoomLevels(zoom_levels).add_to(m)
+
+        # Adicionar rótulos para províncias
+        
+        if prov_label_config and prov_label_config.get("column"):
+            label_group_prov = folium.FeatureGroup("Rótulos Províncias", show=True).add_to(m)
+            centroids = process_geometries(_gdf2.geometry.values, [("centroid", {})])
+            for (_, row), centroid in zip(_gdf2.iterrows(), centroids):
+                if pd.notna(row[prov_label_config["column"]]) and pd.notna(row.geometry):
+                    font_weight = "bold" if prov_label_config.get("bold", False) else "normal"
+        
+                    # Escapa os caracteres especiais/acentos
+                    texto_label = html.escape(str(row[prov_label_config["column"]]))
+        
+                    html_div = f'''
+                        <div style="
+                            font-size: {prov_label_config["font_size"]}px;
+                            color: {prov_label_config["font_color"]};
+                            font-family: {prov_label_config["font_name"]};
+                            font-weight: {font_weight};
+                            text-align: center;">
+                            {texto_label}
+                        </div>
+                    '''
+        
+                    folium.Marker(
+                        location=[centroid.y, centroid.x],
+                        popup=folium.Popup(f"{row[prov_label_config['column']]}", parse_html=True),
+                        icon=folium.DivIcon(html=html_div)
+                    ).add_to(label_group_prov)
+
+
+        # Adicionar rótulos para municípios
+        
+        # Adicionar rótulos para municípios
+        if mun_label_config and mun_label_config.get("column"):
+            label_group_mun = folium.FeatureGroup("Rótulos Municípios", show=True).add_to(m)
+            centroids = process_geometries(_gdf.geometry.values, [("centroid", {})])
+            for (_, row), centroid in zip(_gdf.iterrows(), centroids):
+                if pd.notna(row[mun_label_config["column"]]) and pd.notna(row.geometry):
+                    font_weight = "bold" if mun_label_config.get("bold", False) else "normal"
+                    
+                    # Escapa corretamente acentos e símbolos HTML
+                    texto_label = html.escape(str(row[mun_label_config["column"]]))
+        
+                    html_div = f'''
+                        <div style="
+                            font-size: {mun_label_config["font_size"]}px;
+                            color: {mun_label_config["font_color"]};
+                            font-family: {mun_label_config["font_name"]};
+                            font-weight: {font_weight};
+                            text-align: center;">
+                            {texto_label}
+                        </div>
+                    '''
+                    
+                    folium.Marker(
+                        location=[centroid.y, centroid.x],
+                        popup=folium.Popup(f"{row[mun_label_config['column']]}", parse_html=True),
+                        icon=folium.DivIcon(html=html_div)
+                    ).add_to(label_group_mun)
+
+
+        # Camadas de fundo e controlos escolhidos: cada um acrescenta apenas as suas bibliotecas
+        add_basemaps(m, basemaps)
+        add_map_controls(m, controls)
+
+        message_placeholder.empty()
+        return m
+    except KeyError as e:
+        message_placeholder.error(f"Erro: Coluna não encontrada no shapefile: {e}")
+        return None
+    except Exception as e:
+        message_placeholder.error(f"Erro ao criar o mapa: {e}")
+        return None
+
+
+class ComparisonPanes(MacroElement):
+    """
+    Painéis de mapas lado a lado, com deslocamento e zoom sincronizados.
+
+    A geometria dos municípios e das províncias é serializada uma única vez e
+    referenciada por todos os painéis; cada painel tem apenas a sua tabela de cores.
+    """
+
+    _template = Template("""
+    {% macro header(this, kwargs) %}
+    <style>
+        html, body { width: 100%; height: 100%; margin: 0; padding: 0; }
+        .dataonmap-panes { display: flex; width: 100%; height: 100%; }
+        .dataonmap-pane { flex: 1; position: relative; border-left: 1px solid #999; }
+        .dataonmap-pane .dataonmap-map { position: absolute; top: 0; bottom: 0; left: 0; right: 0; }
+        .dataonmap-title { position: absolute; top: 8px; left: 50%; transform: translateX(-50%); z-index: 1000;
+            background: white; padding: 2px 8px; border: 1px solid #666; font-weight: bold; }
+        .dataonmap-legend { position: absolute; bottom: 20px; left: 10px; z-index: 1000; background: white;
+            padding: 6px; border: 1px solid #666; font-size: 12px; }
+    </style>
+    {% endmacro %}
+
+    {% macro html(this, kwargs) %}
+    <div class="dataonmap-panes">
+        {% for pane in this.panes %}
+        <div class="dataonmap-pane">
+            <div id="{{ this.get_name() }}_{{ loop.index0 }}" class="dataonmap-map"></div>
+            <div class="dataonmap-title">{{ pane.title|e }}</div>
+            <div class="dataonmap-legend">
+                {% if pane.gradient %}
+                <div style="width: 160px; height: 12px; background: linear-gradient(to right, {{ pane.gradient|join(', ') }});"></div>
+                <div style="display: flex; justify-content: space-between; width: 160px;"><span>{{ pane.vmin }}</span><span>{{ pane.vmax }}</span></div>
+                {% else %}
+                {% for category, color in pane.legend %}
+                <div><span style="display: inline-block; width: 12px; height: 12px; background: {{ color }}; margin-right: 6px;"></span>{{ category|e }}</div>
+                {% endfor %}
+                {% endif %}
+            </div>
+        </div>
+        {% endfor %}
+    </div>
+    {% endmacro %}
+
+    {% macro script(this, kwargs) %}
+    {{ this.decode_js }}
+    var {{ this.get_name() }}_data = {{ this.data }};
+    var {{ this.get_name() }}_borders = {{ this.borders }};
+    var {{ this.get_name() }}_levels = [
+        {%- for level in this.levels %}
+        {min: {{ level.min_zoom|tojson }}, max: {{ level.max_zoom|tojson }}, style: {{ level.style|tojson }}, data: {{ level.data }}},
+        {%- endfor %}
+    ];
+    var {{ this.get_name() }}_labels = {{ this.labels|tojson }};
+    var {{ this.get_name() }}_styles = {{ this.styles|tojson }};
+    var {{ this.get_name() }}_maps = {{ this.get_name() }}_styles.map(function(table, i) {
+        dataonmapDecodeCodes(table, {{ this.alphabet|tojson }});
+        var map = L.map("{{ this.get_name() }}_" + i, {zoomControl: i === 0});
+        map.fitBounds({{ this.bounds|tojson }});
+        L.tileLayer({{ this.tiles|tojson }}, {attribution: {{ this.attr|tojson }}}).addTo(map);
+        // Camadas de cada painel com o seu intervalo de zoom; as dos níveis adicionais
+        // só são criadas quando o zoom entra no intervalo pela primeira vez
+        var layers = {{ this.get_name() }}_levels.map(function(level) {
+            return {min: level.min, max: level.max, make: function() {
+                return L.geoJson(level.data, {style: level.style, interactive: false});
+            }};
+        });
+        layers.push({min: {{ this.mun_zoom[0]|tojson }}, max: {{ this.mun_zoom[1]|tojson }}, layer: L.geoJson({{ this.get_name() }}_data, {
+            style: function(feature) {
+                var code = table.codes ? table.codes[feature.properties.__i] : 0;
+                if (code < 0) {
+                    return {opacity: 0, fillOpacity: 0};
+                }
+                return {fillColor: table.palette[code], color: {{ this.mun_border_color|tojson }},
+                        weight: {{ this.mun_border_width|tojson }}, opacity: 1, fillOpacity: 1};
+            },
+            onEachFeature: function(feature, layer) {
+                {%- if this.tooltip_field %}
+                layer.bindTooltip(String(feature.properties[{{ this.tooltip_field|tojson }}]));
+                {%- endif %}
+            }
+        })});
+        layers.push({min: {{ this.prov_zoom[0]|tojson }}, max: {{ this.prov_zoom[1]|tojson }}, layer: L.geoJson({{ this.get_name() }}_borders, {
+            style: {color: {{ this.prov_border_color|tojson }}, weight: {{ this.prov_border_width|tojson }}, fill: false},
+            interactive: false
+        })});
+        {{ this.get_name() }}_labels.forEach(function(labels) {
+            var group = L.layerGroup();
+            labels.points.forEach(function(point) {
+                L.marker([point[0], point[1]], {icon: L.divIcon({html: '<div style="' + labels.style + '">' + point[2] + '</div>'})})
+                    .bindPopup(point[2]).addTo(group);
+            });
+            layers.push({min: null, max: null, layer: group});
+        });
+        function update() {
+            var zoom = map.getZoom();
+            layers.forEach(function(entry) {
+                var inRange = (entry.min === null || zoom >= entry.min) && (entry.max === null || zoom <= entry.max);
+                if (inRange && !entry.layer) {
+                    entry.layer = entry.make();
+                }
+                if (inRange && !map.hasLayer(entry.layer)) {
+                    map.addLayer(entry.layer);
+                } else if (!inRange && entry.layer && map.hasLayer(entry.layer)) {
+                    map.removeLayer(entry.layer);
+                }
+            });
+        }
+        map.on("zoomend", update);
+        update();
+        return map;
+    });
+    // Sincroniza o deslocamento e o zoom de todos os painéis
+    var {{ this.get_name() }}_syncing = false;
+    {{ this.get_name() }}_maps.forEach(function(map) {
+        map.on("move", function() {
+            if ({{ this.get_name() }}_syncing) {
+                return;
+            }
+            {{ this.get_name() }}_syncing = true;
+            {{ this.get_name() }}_maps.forEach(function(other) {
+                if (other !== map) {
+                    other.setView(map.getCenter(), map.getZoom(), {animate: false});
+                }
+            });
+            {{ this.get_name() }}_syncing = false;
+        });
+    });
+    {% endmacro %}
+    """)
+
+
+def comparison_labels(gdf, label_config):
+    """
+    Prepara os rótulos de uma camada para os painéis de comparação.
+
+    Args:
+        gdf: GeoDataFrame da camada.
+        label_config: Configuração de rótulos (column, font_size, font_color, font_name, bold).
+
+    Returns:
+        dict: "points" (lista de [lat, lon, texto escapado]) e "style" (CSS do rótulo).
+    """
+    column = label_config["column"]
+    centroids = process_geometries(gdf.geometry.values, [("centroid", {})])
+    points = [
+        [centroid.y, centroid.x, html.escape(str(text))]
+        for text, centroid in zip(gdf[column], centroids)
+        if pd.notna(text) and centroid is not None and not centroid.is_empty
+    ]
+    style = (
+        f"font-size: {label_config['font_size']}px; color: {label_config['font_color']}; "
+        f"font-family: {label_config['font_name']}; font-weight: {'bold' if label_config.get('bold', False) else 'normal'}; "
+        "text-align: center;"
+    )
+    return {"points": points, "style": html.escape(style)}
+
+
+def create_comparison_map(_gdf, _gdf2, panes, tooltip_field, prov_label_config=None, mun_label_config=None, prov_border_width=1.0, prov_border_color="#000000", mun_border_width=0.5, mun_border_color="#808080", hidden_mode="hide", levels=None, prov_zoom=None, mun_zoom=None, parent_column=None, tiles="https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png", attr="Tiles © CartoDB"):
+    """
+    Cria painéis de mapas sincronizados (lado a lado) a partir da mesma geometria.
+
+    Args:
+        _gdf: GeoDataFrame dos municípios (não hashável).
+        _gdf2: GeoDataFrame das províncias (não hashável).
+        panes: Lista de dicionários com "column" (coluna do indicador ou período),
+            "color_mapping" (dicionário ou escala contínua do branca), "title" (opcional)
+            e "visible_categories" (opcional: categorias a mostrar nesse painel).
+        tooltip_field: Campo para exibir no tooltip.
+        prov_label_config: Configuração de rótulos das províncias (ver create_choropleth_map).
+        mun_label_config: Configuração de rótulos dos municípios (ver create_choropleth_map).
+        prov_border_width: Largura dos limites das províncias.
+        prov_border_color: Cor dos limites das províncias.
+        mun_border_width: Largura dos limites dos municípios.
+        mun_border_color: Cor dos limites dos municípios.
+        hidden_mode: Categorias filtradas: "hide" (omitidas) ou "background" (em cinzento).
+        levels: Níveis administrativos adicionais (ver create_choropleth_map).
+        prov_zoom: Intervalo de zoom (mínimo, máximo) das províncias. Se None, mostradas sempre.
+        mun_zoom: Intervalo de zoom (mínimo, máximo) dos municípios. Se None, mostrados sempre.
+        parent_column: Coluna dos municípios que identifica a província, quando _gdf2 foi
+            derivada dos municípios (ver create_choropleth_map).
+        tiles: URL das tiles de fundo de cada painel.
+        attr: Atribuição das tiles.
+
+    Returns:
+        branca.element.Figure: Página com os painéis, ou None em caso de erro.
+    """
+    message_placeholder = st.empty()
+    try:
+        if _gdf.empty or _gdf2.empty:
+            message_placeholder.error("Os shapefiles estão vazios. Verifique os dados carregados.")
+            return None
+        if len(panes) < 2:
+            message_placeholder.error("A comparação requer pelo menos dois indicadores ou períodos.")
+            return None
+        for pane in panes:
+            if pane["column"] not in _gdf.columns:
+                message_placeholder.error(f"A coluna '{pane['column']}' não foi encontrada no shapefile.")
+                return None
+
+        if not _gdf.attrs.get("preparada"):
+            _gdf = prepare_layer(_gdf)
+        if not _gdf2.attrs.get("preparada"):
+            _gdf2 = prepare_layer(_gdf2)
+
+        message_placeholder.info("Construindo painéis de comparação...")
+        tables = []
+        for pane in panes:
+            palette, codes = indicator_color_codes(_gdf[pane["column"]], pane["color_mapping"])
+            if pane.get("visible_categories") is not None:
+                hidden = (codes >= 0) & ~_gdf[pane["column"]].isin(pane["visible_categories"]).to_numpy()
+                if hidden_mode == "background":
+                    palette = [*palette, "#d9d9d9"]
+                    codes = np.where(hidden, len(palette) - 1, codes)
+                else:
+                    codes = np.where(hidden, -1, codes)
+            tables.append((palette, codes))
+        drawn = np.any([codes >= 0 for _, codes in tables], axis=0) & _gdf.geometry.notna().to_numpy()
+
+        # Cada nível é simplificado para o seu zoom máximo, como no mapa principal
+        element = ComparisonPanes()
+        element._name = "ComparisonPanes"
+        element.levels = []
+        for level in levels or []:
+            layer_gdf = level["gdf"]
+            if not layer_gdf.attrs.get("preparada"):
+                layer_gdf = prepare_layer(layer_gdf)
+            layer_gdf = simplify_level(layer_gdf, level.get("max_zoom"))
+            element.levels.append({
+                "min_zoom": level.get("min_zoom"),
+                "max_zoom": level.get("max_zoom"),
+                "data": features_to_geojson(layer_gdf[[layer_gdf.geometry.name]]),
+                "style": {"color": level.get("border_color", "#404040"), "weight": level.get("border_width", 1.0), "fill": False},
+            })
+        element.labels = []
+        if prov_label_config and prov_label_config.get("column"):
+            element.labels.append(comparison_labels(_gdf2, prov_label_config))
+        if mun_label_config and mun_label_config.get("column"):
+            element.labels.append(comparison_labels(_gdf, mun_label_config))
+        if prov_zoom:
+            _gdf2 = simplify_parent_level(_gdf, parent_column, prov_zoom[1]) if parent_column else simplify_level(_gdf2, prov_zoom[1])
+        if mun_zoom:
+            _gdf = simplify_level(_gdf, mun_zoom[1])
+        element.prov_zoom = list(prov_zoom or (None, None))
+        element.mun_zoom = list(mun_zoom or (None, None))
+        element.data = features_to_geojson(_gdf[drawn], [tooltip_field] if tooltip_field else [])
+        element.borders = features_to_geojson(_gdf2[[_gdf2.geometry.name]])
+        element.styles = [{"palette": list(palette), "codes": encode_style_codes(codes[drawn])} for palette, codes in tables]
+        element.panes = []
+        for pane in panes:
+            mapping = pane["color_mapping"]
+            info = {"title": pane.get("title") or str(pane["column"]), "gradient": None, "legend": []}
+            if isinstance(mapping, branca.colormap.ColorMap):
+                info["gradient"] = [mapping.rgb_hex_str(x) for x in np.linspace(mapping.vmin, mapping.vmax, 10)]
+                info["vmin"], info["vmax"] = f"{mapping.vmin:,.4g}", f"{mapping.vmax:,.4g}"
+            else:
+                info["legend"] = list(mapping.items())
+            element.panes.append(info)
+        minx, miny, maxx, maxy = _gdf.total_bounds
+        element.bounds = [[miny, minx], [maxy, maxx]]
+        element.tooltip_field = tooltip_field
+        element.tiles = tiles
+        element.attr = attr
+        element.alphabet = STYLE_CODE_ALPHABET
+        element.decode_js = DECODE_STYLE_CODES_JS
+        element.prov_border_color = prov_border_color
+        element.prov_border_width = prov_border_width
+        element.mun_border_color = mun_border_color
+        element.mun_border_width = mun_border_width
+
+        figure = branca.element.Figure()
+        for name, url in folium.Map.default_css:
+            if name == "leaflet_css":
+                figure.header.add_child(branca.element.CssLink(url), name=name)
+        for name, url in folium.Map.default_js:
+            if name == "leaflet":
+                figure.header.add_child(branca.element.JavascriptLink(url), name=name)
+        figure.add_child(element)
+        message_placeholder.empty()
+        return figure
+    except Exception as e:
+        message_placeholder.error(f"Erro ao criar os painéis de comparação: {e}")
+        return None
+
+
+def add_legend(m, color_mapping, title, indicator=None, visible=True):
+    """
+    Adiciona uma legenda ao mapa com base no mapeamento de cores .
+
+    Args:
+        m: Mapa Folium.
+        color_mapping: Dicionário mapeando categorias para cores, ou escala contínua do branca (legenda em gradiente).
+        title: Título da legenda.
+        indicator: Nome do indicador a que a legenda pertence, em mapas com vários indicadores
+            (a legenda é mostrada apenas quando o indicador está selecionado).
+        visible: Se a legenda começa visível (mapas com vários indicadores).
+    """
+    template = """
+    {% macro html(this, kwargs) %}
+    <div {% if this.indicator is not none %}data-indicator-legend="{{ this.indicator|e }}" {% endif %}style="position: fixed; bottom: 50px; left: 50px; z-index: 1000; background-color: white; padding: 10px; border: 2px solid black;{% if not this.visible %} display: none;{% endif %}">
+        <h4>{{ this.title }}</h4>
+        {% if this.gradient %}
+        <div style="width: 200px; height: 14px; background: linear-gradient(to right, {{ this.gradient|join(', ') }});"></div>
+        <div style="display: flex; justify-content: space-between; width: 200px;">
+            <span>{{ this.vmin }}</span><span>{{ this.vmax }}</span>
+        </div>
+        {% else %}
+        {% for category, color in this.color_mapping.items() %}
+        <div style="display: flex; align-items: center; margin-bottom: 5px;">
+            <div style="width: 20px; height: 20px; background-color: {{ color }}; margin-right: 10px;"></div>
+            <span>{{ category }}</span>
+        </div>
+        {% endfor %}
+        {% endif %}
+    </div>
+    {% endmacro %}
+    """
+    gradient = None
+    if isinstance(color_mapping, branca.colormap.ColorMap):
+        # Gradiente em CSS: a legenda do próprio branca carrega o d3 de uma CDN ao renderizar,
+        # fora das bibliotecas do mapa (map_asset_urls), e o mapa offline deixaria de abrir sem rede
+        gradient = [color_mapping.rgb_hex_str(x) for x in np.linspace(color_mapping.vmin, color_mapping.vmax, 10)]
+
+    macro = MacroElement()
+    macro._template = Template(template)
+    macro.title = title
+    macro.color_mapping = color_mapping
+    macro.indicator = indicator
+    macro.visible = visible
+    macro.gradient = gradient
+    if gradient:
+        macro.vmin, macro.vmax = format_edges([color_mapping.vmin, color_mapping.vmax])
+    m.get_root().add_child(macro)
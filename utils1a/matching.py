@@ -0,0 +1,183 @@
+"""União aproximada: normalização e correspondência das chaves da camada e da tabela."""
+import pandas as pd
+import re
+import difflib
+
+from .config import FUZZY_MATCH_THRESHOLD
+from .cache import cached_result
+
+
+# Abreviaturas comuns em nomes de lugares, expandidas antes da comparação
+KEY_ABBREVIATIONS = {
+    "sta": "santa",
+    "sto": "santo",
+    "sr": "senhor",
+    "sra": "senhora",
+    "dr": "doutor",
+    "gen": "general",
+    "pres": "presidente",
+    "mun": "municipio",
+    "prov": "provincia",
+    "dist": "distrito",
+}
+# Abreviaturas ambíguas, reconhecidas no texto original antes de normalizar: "S." ou um "S"
+# inicial seguido de nome em maiúscula ("S. Tomé", "S Pedro") é "São", mas um "s" solto não
+KEY_ABBREVIATION_PATTERNS = [
+    (r"\b[Ss]\.\s*(?=\w)|^\s*S\s+(?=[A-ZÀ-Ý])", "São "),
+]
+
+
+def normalize_keys(values, abbreviations=None, patterns=None):
+    """
+    Normaliza chaves de texto para a união aproximada, de forma vetorizada.
+
+    Expande as abreviaturas ambíguas no texto original (KEY_ABBREVIATION_PATTERNS),
+    remove acentos, ignora maiúsculas, troca pontuação por espaços, junta espaços
+    repetidos e expande as restantes abreviaturas (KEY_ABBREVIATIONS).
+
+    Args:
+        values: Série com as chaves originais.
+        abbreviations: Dicionário abreviatura -> forma completa. Se None, KEY_ABBREVIATIONS.
+        patterns: Pares (expressão regular, substituição) aplicados ao texto original.
+            Se None, KEY_ABBREVIATION_PATTERNS.
+
+    Returns:
+        pd.Series: Chaves normalizadas, com o mesmo índice.
+    """
+    abbreviations = KEY_ABBREVIATIONS if abbreviations is None else abbreviations
+    patterns = KEY_ABBREVIATION_PATTERNS if patterns is None else patterns
+    normalized = values.astype(str)
+    for pattern, replacement in patterns:
+        normalized = normalized.str.replace(pattern, replacement, regex=True)
+    normalized = (
+        normalized
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.casefold()
+        .str.replace(r"[^0-9a-z]+", " ", regex=True)
+        .str.strip()
+    )
+    if abbreviations:
+        pattern = r"\b(" + "|".join(map(re.escape, sorted(abbreviations, key=len, reverse=True))) + r")\b"
+        normalized = normalized.str.replace(pattern, lambda match: abbreviations[match.group(1)], regex=True)
+    return normalized
+
+
+def _key_ngrams(text, n=3):
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def match_keys(left, right, left_block=None, right_block=None, threshold=None, candidates=5):
+    """
+    Procura, para cada chave da tabela, a chave correspondente no shapefile.
+
+    As chaves iguais (ou iguais depois de normalize_keys) correspondem
+    diretamente. As restantes são comparadas apenas com candidatos do mesmo
+    bloco (ex.: a mesma província) que partilham trigramas, obtidos num índice
+    invertido; os melhores candidatos pelo coeficiente de Dice dos trigramas são
+    depois pontuados com difflib. Nunca são comparados todos os pares.
+
+    Args:
+        left: Série com as chaves do shapefile.
+        right: Série com as chaves da tabela.
+        left_block: Série com o código do bloco de cada chave do shapefile (opcional).
+        right_block: Série com o código do bloco de cada chave da tabela (opcional).
+        threshold: Pontuação mínima para aceitar uma correspondência aproximada.
+            Se None, FUZZY_MATCH_THRESHOLD.
+        candidates: Número de candidatos pontuados por chave.
+
+    Returns:
+        pd.DataFrame: Uma linha por chave distinta da tabela em cada bloco, com "chave (tabela)",
+        "chave (shapefile)", "pontuação", "método" (exata, normalizada, aproximada ou
+        sem correspondência), "alternativa" e "aceitar".
+    """
+    threshold = FUZZY_MATCH_THRESHOLD if threshold is None else threshold
+    no_block = pd.Series("", index=left.index)
+    left_table = pd.DataFrame({
+        "chave": left,
+        "norm": normalize_keys(left),
+        "bloco": normalize_keys(left_block) if left_block is not None else no_block,
+    }).drop_duplicates(["chave", "bloco"])
+    right_table = pd.DataFrame({
+        "chave": right,
+        "bloco": normalize_keys(right_block) if right_block is not None else pd.Series("", index=right.index),
+    }).dropna(subset=["chave"]).drop_duplicates(["chave", "bloco"])
+    right_table["norm"] = normalize_keys(right_table["chave"])
+
+    # Índice invertido de trigramas por bloco (posições em left_table)
+    left_keys = left_table["chave"].to_numpy()
+    left_norms = left_table["norm"].to_numpy()
+    left_ngrams = [_key_ngrams(norm) for norm in left_norms]
+    index = {}
+    for position, (block, ngrams) in enumerate(zip(left_table["bloco"], left_ngrams)):
+        for ngram in ngrams:
+            index.setdefault((block, ngram), []).append(position)
+    exact = {str(key): key for key in left_keys}
+    by_norm = left_table.groupby(["bloco", "norm"])["chave"].agg(list).to_dict()
+
+    rows = []
+    for key, norm, block in zip(right_table["chave"], right_table["norm"], right_table["bloco"]):
+        if str(key) in exact:
+            rows.append((key, exact[str(key)], 1.0, "exata", None, True))
+            continue
+        same = by_norm.get((block, norm), [])
+        if len(same) == 1:
+            rows.append((key, same[0], 1.0, "normalizada", None, True))
+            continue
+        ngrams = _key_ngrams(norm)
+        shared = {}
+        for ngram in ngrams:
+            for position in index.get((block, ngram), ()):
+                shared[position] = shared.get(position, 0) + 1
+        if not shared:
+            rows.append((key, None, 0.0, "sem correspondência", None, False))
+            continue
+        dice = sorted(shared, key=lambda p: -2 * shared[p] / (len(ngrams) + len(left_ngrams[p])))[:candidates]
+        scored = sorted(
+            ((difflib.SequenceMatcher(None, norm, left_norms[p]).ratio(), p) for p in dice),
+            key=lambda item: -item[0]
+        )
+        score, best = scored[0]
+        alternative = scored[1] if len(scored) > 1 else (None, None)
+        accepted = score >= threshold and (alternative[0] is None or score > alternative[0])
+        rows.append((
+            key,
+            left_keys[best],
+            round(score, 3),
+            "aproximada",
+            None if alternative[1] is None else left_keys[alternative[1]],
+            accepted,
+        ))
+    return pd.DataFrame(rows, columns=["chave (tabela)", "chave (shapefile)", "pontuação", "método", "alternativa", "aceitar"])
+
+
+def match_layer_keys(gdf, data, left_on, right_on, left_block=None, right_block=None, threshold=None):
+    """
+    Tabela de correspondências (match_keys) entre a camada e a tabela, guardada na cache.
+
+    Args:
+        gdf: GeoDataFrame dos municípios.
+        data: DataFrame da tabela de dados.
+        left_on: Coluna de união no shapefile.
+        right_on: Coluna de união na tabela.
+        left_block: Coluna de bloco no shapefile (ex.: província), opcional.
+        right_block: Coluna de bloco na tabela, opcional (usada só com left_block).
+        threshold: Pontuação mínima; ver match_keys.
+
+    Returns:
+        pd.DataFrame: Tabela de correspondências, para revisão antes da união.
+    """
+    blocks = (left_block, right_block) if left_block and right_block else (None, None)
+
+    def compute():
+        return match_keys(
+            gdf[left_on],
+            data[right_on],
+            gdf[blocks[0]] if blocks[0] else None,
+            data[blocks[1]] if blocks[1] else None,
+            threshold=threshold
+        )
+
+    return cached_result(("match_layer_keys", left_on, right_on, *blocks, threshold), [gdf, data], compute)
@@ -0,0 +1,282 @@
+"""Medição e orçamento de memória, e execução concorrente das tarefas de carregamento."""
+import streamlit as st
+import geopandas as gpd
+import pandas as pd
+import zipfile
+import os
+import sys
+import shapely
+import numpy as np
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from .config import GEOJSON_BYTES_PER_COORD, MEMORY_BUDGET_MB, TRACEMALLOC_ENABLED, UPLOAD_MEMORY_FACTORS
+from .geometry import process_layer
+
+
+def current_rss():
+    """
+    Retorna a memória residente (RSS) do processo em bytes.
+
+    Returns:
+        int: RSS em bytes, ou None se não for possível medir nesta plataforma.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def track_memory(stage, interval=0.05):
+    """
+    Regista o pico de RSS (e, opcionalmente, do tracemalloc) de uma etapa na sessão.
+
+    Os resultados ficam em st.session_state["memory_stats"][stage] em MB e no
+    dicionário devolvido pelo with (preenchido à saída do bloco). O RSS é do
+    processo inteiro, portanto inclui a atividade de outras sessões em paralelo.
+
+    Args:
+        stage: Nome da etapa (ex.: "load_shapefile", "merge").
+        interval: Intervalo de amostragem do RSS em segundos.
+    """
+    rss_before = current_rss()
+    peak = {"rss": rss_before or 0}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            rss = current_rss()
+            if rss and rss > peak["rss"]:
+                peak["rss"] = rss
+
+    sampler = None
+    if rss_before is not None:
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+    if TRACEMALLOC_ENABLED:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    record = {}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+        record["segundos"] = round(time.perf_counter() - start, 3)
+        if rss_before is not None:
+            rss_after = current_rss() or rss_before
+            peak["rss"] = max(peak["rss"], rss_after)
+            record["rss_final_mb"] = round(rss_after / 2**20, 1)
+            record["rss_pico_delta_mb"] = round((peak["rss"] - rss_before) / 2**20, 1)
+        if TRACEMALLOC_ENABLED:
+            record["tracemalloc_pico_delta_mb"] = round((tracemalloc.get_traced_memory()[1] - traced_before) / 2**20, 1)
+        try:
+            st.session_state.setdefault("memory_stats", {})[stage] = record
+        except Exception:
+            # Fora de uma sessão Streamlit (ex.: scripts em lote) não há onde registar
+            pass
+
+
+def estimate_memory_usage(obj):
+    """
+    Estima a memória ocupada por um DataFrame ou GeoDataFrame, em bytes.
+
+    Para GeoDataFrames soma também o custo das coordenadas (16 bytes por vértice),
+    que o memory_usage do pandas não contabiliza.
+
+    Args:
+        obj: DataFrame, GeoDataFrame, array, dicionário de arrays ou outro objeto.
+
+    Returns:
+        int: Estimativa em bytes.
+    """
+    if isinstance(obj, pd.DataFrame):
+        nbytes = int(obj.memory_usage(deep=True, index=True).sum())
+        if isinstance(obj, gpd.GeoDataFrame) and obj.geometry.name in obj.columns:
+            nbytes += int(shapely.get_num_coordinates(obj.geometry.values).sum()) * 16
+        return nbytes
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_memory_usage(value) for value in obj.values())
+    return sys.getsizeof(obj)
+
+
+def estimate_job_memory(gdf, data=None):
+    """
+    Estima o pico de memória de um trabalho completo (união + construção do mapa + HTML).
+
+    Args:
+        gdf: GeoDataFrame dos municípios.
+        data: DataFrame da tabela de dados (opcional).
+
+    Returns:
+        int: Estimativa em bytes.
+    """
+    n_coords = int(shapely.get_num_coordinates(gdf.geometry.values).sum())
+    nbytes = 2 * estimate_memory_usage(gdf) + n_coords * GEOJSON_BYTES_PER_COORD
+    if data is not None:
+        nbytes += estimate_memory_usage(data)
+    return nbytes
+
+
+def estimate_upload_memory(file):
+    """
+    Estima a memória que um arquivo carregado vai ocupar depois de lido, sem o ler.
+
+    Para ZIPs de shapefile usa os tamanhos descomprimidos do .shp e do .dbf, lidos
+    do diretório do ZIP; para tabelas usa o tamanho do arquivo.
+
+    Args:
+        file: Arquivo carregado (UploadedFile ou arquivo binário com nome).
+
+    Returns:
+        int: Estimativa em bytes (0 se o tipo não for reconhecido).
+    """
+    extension = os.path.splitext(getattr(file, "name", "") or "")[1].lower()
+    if extension == ".zip":
+        try:
+            with zipfile.ZipFile(file) as archive:
+                return int(sum(
+                    info.file_size * UPLOAD_MEMORY_FACTORS.get(os.path.splitext(info.filename)[1].lower(), 0)
+                    for info in archive.infolist()
+                ))
+        except zipfile.BadZipFile:
+            return 0
+        finally:
+            file.seek(0)
+    size = getattr(file, "size", None)
+    if size is None:
+        size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+    return int(size * UPLOAD_MEMORY_FACTORS.get(extension, 0))
+
+
+def check_upload_budget(files, budget_mb=None):
+    """
+    Verifica, antes de ler os arquivos, se cabem no orçamento de memória da sessão.
+
+    A verificação é só da leitura: depois de lidos, enforce_memory_budget ainda pode
+    descartar colunas e simplificar geometrias para o trabalho completo caber.
+
+    Args:
+        files: Arquivos carregados (os None são ignorados).
+        budget_mb: Orçamento em MB. Se None, usa MEMORY_BUDGET_MB.
+
+    Returns:
+        tuple: (cabe no orçamento, estimativa em bytes).
+    """
+    estimate = sum(estimate_upload_memory(file) for file in files if file is not None)
+    return estimate <= (budget_mb or MEMORY_BUDGET_MB) * 2**20, estimate
+
+
+def enforce_memory_budget(gdf, data=None, columns=None, budget_mb=None):
+    """
+    Degrada o trabalho de forma controlada quando ultrapassa o orçamento de memória.
+
+    Primeiro descarta as colunas não usadas, depois simplifica as geometrias com
+    tolerâncias crescentes e, se ainda assim não couber, recusa o trabalho.
+
+    Args:
+        gdf: GeoDataFrame dos municípios.
+        data: DataFrame da tabela de dados (opcional).
+        columns: Colunas necessárias em gdf e data (as restantes podem ser descartadas).
+        budget_mb: Orçamento em MB. Se None, usa MEMORY_BUDGET_MB.
+
+    Returns:
+        tuple: (gdf, data, ações aplicadas) ou (None, None, ações) se o trabalho for recusado.
+    """
+    budget = (budget_mb or MEMORY_BUDGET_MB) * 2**20
+    actions = []
+    if estimate_job_memory(gdf, data) <= budget:
+        return gdf, data, actions
+
+    if columns:
+        keep = [c for c in gdf.columns if c in columns or c == gdf.geometry.name]
+        if len(keep) < len(gdf.columns):
+            gdf = gdf[keep]
+            actions.append("colunas não usadas removidas do shapefile")
+        if data is not None:
+            keep = [c for c in data.columns if c in columns]
+            if len(keep) < len(data.columns):
+                data = data[keep]
+                actions.append("colunas não usadas removidas da tabela")
+        if estimate_job_memory(gdf, data) <= budget:
+            return gdf, data, actions
+
+    # Importado aqui porque o módulo cache depende deste
+    from .cache import cached_result
+
+    # Tolerâncias relativas à extensão da camada
+    minx, miny, maxx, maxy = gdf.total_bounds
+    extent = max(maxx - minx, maxy - miny) or 1.0
+    for factor in (1e-4, 5e-4, 2e-3):
+        # O orçamento é verificado a cada execução do script: a camada simplificada fica na cache
+        simplified = cached_result(
+            ("enforce_memory_budget", factor, tuple(gdf.columns)), [gdf],
+            lambda: process_layer(gdf, tolerance=extent * factor)
+        )
+        if estimate_job_memory(simplified, data) <= budget:
+            actions.append(f"geometrias simplificadas (tolerância {extent * factor:.5g})")
+            return simplified, data, actions
+
+    actions.append("trabalho recusado: excede o orçamento de memória mesmo após simplificação")
+    return None, None, actions
+
+
+def run_concurrently(tasks, max_workers=None, stage="carregamento (paralelo)"):
+    """
+    Executa carregadores em paralelo num pool de threads e recolhe os resultados.
+
+    O contexto da sessão Streamlit é propagado às threads, para que as mensagens
+    continuem a funcionar. As tarefas partilham o RSS e o tracemalloc do processo,
+    por isso a memória é medida para o lote inteiro (uma etapa em track_memory);
+    de cada tarefa regista-se só o tempo.
+
+    Args:
+        tasks: Dicionário nome -> (função, args) ou (função, args, kwargs).
+        max_workers: Número máximo de threads. Se None, uma por tarefa.
+        stage: Nome da etapa do lote em st.session_state["memory_stats"].
+
+    Returns:
+        dict: Dicionário nome -> resultado, na mesma ordem de tasks.
+    """
+    ctx = get_script_run_ctx()
+    durations = {}
+
+    def run(name, func, args=(), kwargs=None):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        start = time.perf_counter()
+        try:
+            return func(*args, **(kwargs or {}))
+        finally:
+            durations[name] = round(time.perf_counter() - start, 3)
+
+    with track_memory(stage):
+        with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as executor:
+            futures = {name: executor.submit(run, name, *task) for name, task in tasks.items()}
+            results = {name: future.result() for name, future in futures.items()}
+    try:
+        stats = st.session_state.setdefault("memory_stats", {})
+        for name in tasks:
+            stats[name] = {"segundos": durations[name]}
+    except Exception:
+        # Fora de uma sessão Streamlit (ex.: scripts em lote) não há onde registar
+        pass
+    return results
@@ -0,0 +1,185 @@
+"""Relatório de qualidade das camadas e da tabela."""
+import geopandas as gpd
+import pandas as pd
+import io
+import shapely
+import numpy as np
+
+from .layers import get_layer_tree
+
+
+# Verificações do relatório de qualidade, pela ordem do resumo
+QUALITY_CHECKS = [
+    "geometria nula",
+    "geometria vazia",
+    "geometria inválida",
+    "sobreposição",
+    "lacuna",
+    "CRS",
+    "chave duplicada",
+    "chave sem correspondência",
+]
+
+
+def _area_km2(geometries, crs):
+    """Áreas em km² numa projeção de área igual (ou nas unidades do CRS, se desconhecido)."""
+    if crs is None or not len(geometries):
+        return shapely.area(geometries)
+    return gpd.GeoSeries(geometries, crs=crs).to_crs("EPSG:6933").area.to_numpy() / 1e6
+
+
+def _coverage_issues(layer, keys, usable):
+    """
+    Procura sobreposições e lacunas entre feições vizinhas de uma camada.
+
+    Os candidatos vêm de coverage_invalid_edges (arestas que não coincidem com as
+    do vizinho) e os pares são obtidos no STRtree da camada, pelo que só as
+    feições suspeitas são comparadas entre si.
+
+    Returns:
+        list: Tuplas (linha, chave, verificação, detalhe).
+    """
+    # Geometrias vazias (e não None) no lugar das inutilizáveis: coverage_invalid_edges
+    # desalinha o resultado quando a entrada contém None
+    geometries = np.asarray(layer.geometry.values, dtype=object).copy()
+    geometries[~usable] = shapely.Polygon()
+    issues = []
+    try:
+        edges = shapely.coverage_invalid_edges(geometries)
+        suspect = usable & ~shapely.is_missing(edges) & ~shapely.is_empty(edges)
+    except (AttributeError, shapely.errors.GEOSException):
+        suspect = usable
+    if suspect.any():
+        first, second = get_layer_tree(layer).query(geometries[suspect], predicate="intersects")
+        first = np.nonzero(suspect)[0][first]
+        keep = (first != second) & usable[second] & (~suspect[second] | (first < second))
+        first, second = first[keep], second[keep]
+        overlapping = shapely.relate_pattern(geometries[first], geometries[second], "2********")
+        first, second = first[overlapping], second[overlapping]
+        areas = _area_km2(shapely.intersection(geometries[first], geometries[second]), layer.crs)
+        for i, j, area in zip(first, second, areas):
+            issues.append((layer.index[i], keys[i], "sobreposição", f"sobrepõe {keys[j]} em {area:.4g} km²"))
+
+    # As feições sobrepostas ficam fora da união de cobertura e são unidas à parte
+    if usable.any():
+        overlapped = np.zeros(len(geometries), dtype=bool)
+        if issues:
+            overlapped[np.concatenate([first, second])] = True
+        coverage = geometries.copy()
+        coverage[overlapped] = shapely.Polygon()
+        try:
+            union = shapely.union_all([shapely.coverage_union_all(coverage), *geometries[overlapped]])
+        except shapely.errors.GEOSException:
+            union = shapely.union_all(geometries)
+        holes = [
+            shapely.Polygon(shapely.get_interior_ring(part, i))
+            for part in shapely.get_parts(union)
+            for i in range(shapely.get_num_interior_rings(part))
+        ]
+        if holes:
+            holes = np.array(holes, dtype=object)
+            hole_idx, feature_idx = get_layer_tree(layer).query(holes, predicate="intersects")
+            areas = _area_km2(holes, layer.crs)
+            for h, area in enumerate(areas):
+                neighbours = ", ".join(map(str, keys[feature_idx[hole_idx == h]][:10]))
+                issues.append((None, None, "lacuna", f"área de {area:.4g} km² rodeada por {neighbours}"))
+    return issues
+
+
+def quality_report(gdf, gdf2=None, data=None, left_on=None, right_on=None, matches=None):
+    """
+    Verifica de uma só vez as camadas e a tabela, com operações vetorizadas.
+
+    Cobre geometrias nulas, vazias e inválidas (com o motivo), sobreposições e
+    lacunas entre vizinhos, CRS ausente ou diferente entre camadas, chaves de
+    união duplicadas e chaves sem correspondência nos dois lados. Ao contrário das
+    validações de create_choropleth_map, não para no primeiro problema.
+
+    Args:
+        gdf: GeoDataFrame dos municípios.
+        gdf2: GeoDataFrame das províncias (opcional).
+        data: DataFrame da tabela de dados (opcional).
+        left_on: Coluna de união no shapefile (opcional).
+        right_on: Coluna de união na tabela (opcional).
+        matches: Tabela de correspondências da união aproximada (match_keys); as chaves
+            aceites contam como correspondidas.
+
+    Returns:
+        tuple: (resumo com uma linha por camada e verificação, tabela de problemas
+        com "camada", "linha", "chave", "verificação" e "detalhe").
+    """
+    rows = []
+    layers = {"Municípios": gdf}
+    if gdf2 is not None:
+        layers["Províncias"] = gdf2
+    for name, layer in layers.items():
+        key_column = left_on if name == "Municípios" and left_on in layer.columns else None
+        keys = (layer[key_column] if key_column else pd.Series(layer.index, index=layer.index)).astype(str).to_numpy()
+        geometries = layer.geometry.values
+        missing = shapely.is_missing(geometries)
+        empty = shapely.is_empty(geometries) & ~missing
+        valid = shapely.is_valid(geometries)
+        invalid = ~valid & ~missing & ~empty
+        reasons = shapely.is_valid_reason(geometries[invalid])
+        for check, mask, details in (
+            ("geometria nula", missing, None),
+            ("geometria vazia", empty, None),
+            ("geometria inválida", invalid, reasons),
+        ):
+            positions = np.nonzero(mask)[0]
+            details = details if details is not None else [""] * len(positions)
+            rows.extend((name, layer.index[i], keys[i], check, detail) for i, detail in zip(positions, details))
+        rows.extend((name, *issue) for issue in _coverage_issues(layer, keys, valid & ~missing & ~empty))
+        if layer.crs is None:
+            rows.append((name, None, None, "CRS", "camada sem CRS definido"))
+        if key_column:
+            duplicated = layer[key_column].duplicated(keep=False).to_numpy()
+            rows.extend((name, layer.index[i], keys[i], "chave duplicada", "") for i in np.nonzero(duplicated)[0])
+
+    if gdf2 is not None and gdf.crs is not None and gdf2.crs is not None and gdf.crs != gdf2.crs:
+        rows.append(("Províncias", None, None, "CRS", f"{gdf2.crs.to_string()} difere de {gdf.crs.to_string()} (Municípios)"))
+
+    if data is not None and right_on in data.columns:
+        # Comparação em object: o isin sobre o tipo str (Arrow) do pandas é muito mais lento
+        table_keys = data[right_on].astype(str).astype(object)
+        duplicated = data[right_on].duplicated(keep=False) & data[right_on].notna()
+        rows.extend(("Tabela", index, key, "chave duplicada", "") for index, key in table_keys[duplicated].items())
+        if matches is not None:
+            accepted = matches[matches["aceitar"].astype(bool)]
+            mapping = dict(zip(accepted["chave (tabela)"].astype(str), accepted["chave (shapefile)"].astype(str)))
+            table_keys = table_keys.map(mapping).fillna(table_keys)
+        if left_on in gdf.columns:
+            layer_keys = gdf[left_on].astype(str).astype(object)
+            unmatched = ~layer_keys.isin(table_keys)
+            rows.extend(("Municípios", index, key, "chave sem correspondência", "sem linha na tabela") for index, key in layer_keys[unmatched].items())
+            unmatched = ~table_keys.isin(layer_keys)
+            rows.extend(("Tabela", index, key, "chave sem correspondência", "sem feição no shapefile") for index, key in table_keys[unmatched].items())
+
+    issues = pd.DataFrame(rows, columns=["camada", "linha", "chave", "verificação", "detalhe"], dtype=object)
+    sections = list(layers) + (["Tabela"] if data is not None else [])
+    summary = (
+        issues.groupby(["camada", "verificação"]).size()
+        .reindex(pd.MultiIndex.from_product([sections, QUALITY_CHECKS], names=["camada", "verificação"]), fill_value=0)
+        .rename("ocorrências")
+        .reset_index()
+    )
+    summary = summary[(summary["camada"] != "Tabela") | summary["verificação"].isin(["chave duplicada", "chave sem correspondência"])]
+    return summary.reset_index(drop=True), issues
+
+
+def quality_report_excel(summary, issues):
+    """
+    Gera o relatório de qualidade em Excel, com as folhas "Resumo" e "Problemas".
+
+    Args:
+        summary: Resumo devolvido por quality_report.
+        issues: Tabela de problemas devolvida por quality_report.
+
+    Returns:
+        bytes: Conteúdo do arquivo .xlsx.
+    """
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        summary.to_excel(writer, sheet_name="Resumo", index=False)
+        issues.to_excel(writer, sheet_name="Problemas", index=False)
+    return buffer.getvalue()
@@ -0,0 +1,176 @@
+"""Exportação estática do mapa (PNG, SVG e PDF) com o matplotlib."""
+import io
+import branca
+import branca.colormap
+import shapely
+import numpy as np
+import functools
+
+from .layers import prepare_layer
+from .styles import indicator_color_codes
+
+
+# Formatos suportados pela exportação estática (formato -> tipo MIME)
+STATIC_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+
+
+def _geometry_paths(geometries, groups, n_groups):
+    """
+    Converte polígonos em caminhos do matplotlib, um caminho composto por grupo.
+
+    Os vértices de todas as geometrias são extraídos de uma vez (shapely.to_ragged_array)
+    e separados por grupo com máscaras, sem percorrer os polígonos em Python.
+
+    Args:
+        geometries: Array de polígonos/multipolígonos (não nulos; pode ser vazio).
+        groups: Grupo de cada geometria (ex.: índice da cor na paleta).
+        n_groups: Número de grupos.
+
+    Returns:
+        list: Um matplotlib.path.Path por grupo (vazio se o grupo não tiver geometrias).
+    """
+    from matplotlib.path import Path
+
+    if len(geometries) == 0:
+        # shapely.to_ragged_array não aceita arrays vazios
+        return [Path(np.empty((0, 2))) for _ in range(n_groups)]
+    # A normalização orienta os anéis interiores ao contrário do exterior (buracos preenchidos corretamente)
+    geom_type, coords, offsets = shapely.to_ragged_array(shapely.normalize(geometries))
+    if geom_type == shapely.GeometryType.MULTIPOLYGON:
+        feature_rings = offsets[1][offsets[2]]
+    elif geom_type == shapely.GeometryType.POLYGON:
+        feature_rings = offsets[1]
+    else:
+        raise ValueError("A exportação estática só suporta camadas de polígonos.")
+    ring_offsets = offsets[0]
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    codes[ring_offsets[:-1]] = Path.MOVETO
+    codes[ring_offsets[1:] - 1] = Path.CLOSEPOLY
+    vertex_groups = np.repeat(np.asarray(groups), np.diff(ring_offsets[feature_rings]))
+    paths = []
+    for group in range(n_groups):
+        mask = vertex_groups == group
+        paths.append(Path(coords[mask], codes[mask]))
+    return paths
+
+
+@functools.lru_cache(maxsize=None)
+def _font_family(name):
+    """Retorna a fonte pedida se estiver instalada, senão a fonte sem serifa predefinida."""
+    from matplotlib import font_manager
+    try:
+        font_manager.findfont(font_manager.FontProperties(family=name), fallback_to_default=False)
+        return name
+    except ValueError:
+        return "sans-serif"
+
+
+def _static_labels(ax, gdf, label_config):
+    """Desenha rótulos no centroide de cada geometria, como no mapa interativo."""
+    if not label_config or not label_config.get("column"):
+        return
+    rows = gdf[gdf[label_config["column"]].notna() & gdf.geometry.notna()]
+    centroids = rows.geometry.centroid
+    for x, y, text in zip(centroids.x, centroids.y, rows[label_config["column"]].astype(str)):
+        ax.text(
+            x, y, text,
+            ha="center", va="center",
+            fontsize=label_config.get("font_size", 12) * 0.75,  # px -> pt
+            color=label_config.get("font_color", "black"),
+            fontfamily=_font_family(label_config.get("font_name", "sans-serif")),
+            fontweight="bold" if label_config.get("bold", False) else "normal"
+        )
+
+
+def render_static_map(gdf, gdf2, column, color_mapping, title=None, legend_title=None, prov_label_config=None, mun_label_config=None, prov_border_width=1.0, prov_border_color="#000000", mun_border_width=0.5, mun_border_color="#808080", visible_categories=None, hidden_mode="hide", format="png", dpi=200, figsize=(8, 10)):
+    """
+    Desenha o mapa coroplético como imagem estática (PNG, SVG ou PDF).
+
+    Usa as mesmas camadas preparadas, cores, rótulos e legenda de create_choropleth_map.
+    Cada cor é desenhada como um único caminho composto, pelo que o custo quase não
+    depende do número de polígonos. Não usa o Streamlit nem o estado global do pyplot,
+    podendo ser chamada em tarefas em lote (scripts, agendamentos, vários processos).
+
+    Args:
+        gdf: GeoDataFrame dos municípios (já unido aos dados).
+        gdf2: GeoDataFrame das províncias.
+        column: Coluna a colorir.
+        color_mapping: Dicionário categoria -> cor, ou escala contínua do branca.
+        title: Título da figura.
+        legend_title: Título da legenda (por omissão, o nome da coluna).
+        prov_label_config: Configuração de rótulos das províncias (como em create_choropleth_map).
+        mun_label_config: Configuração de rótulos dos municípios.
+        prov_border_width: Largura dos limites das províncias.
+        prov_border_color: Cor dos limites das províncias.
+        mun_border_width: Largura dos limites dos municípios.
+        mun_border_color: Cor dos limites dos municípios.
+        visible_categories: Categorias a mostrar. Se None, mostra todas.
+        hidden_mode: "hide" (omite as restantes) ou "background" (desenha-as a cinzento).
+        format: "png", "svg" ou "pdf" (ver STATIC_FORMATS).
+        dpi: Resolução das imagens PNG.
+        figsize: Tamanho da figura em polegadas (largura, altura).
+
+    Returns:
+        bytes: Conteúdo do arquivo gerado.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.collections import PathCollection
+    from matplotlib.colors import ListedColormap, Normalize, to_rgba_array
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.patches import Patch
+
+    if format not in STATIC_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {format}")
+    if column not in gdf.columns:
+        raise ValueError(f"A coluna '{column}' não foi encontrada no shapefile.")
+    if not gdf.attrs.get("preparada"):
+        gdf = prepare_layer(gdf)
+    if not gdf2.attrs.get("preparada"):
+        gdf2 = prepare_layer(gdf2)
+
+    palette, codes = indicator_color_codes(gdf[column], color_mapping)
+    has_geometry = gdf.geometry.notna().to_numpy()
+    if visible_categories is not None:
+        hidden = has_geometry & ~gdf[column].isin(visible_categories).to_numpy()
+        if hidden_mode == "background":
+            # O cinzento de fundo ocupa o índice len(palette)
+            codes = np.where(hidden, len(palette), codes)
+            palette = list(palette) + ["#d9d9d9"]
+        else:
+            codes = np.where(hidden, -1, codes)
+    drawn = (codes >= 0) & has_geometry
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.add_subplot()
+    ax.set_axis_off()
+    mun_paths = _geometry_paths(gdf.geometry.values[drawn], codes[drawn], len(palette))
+    ax.add_collection(PathCollection(mun_paths, facecolors=to_rgba_array(palette), edgecolors=mun_border_color, linewidths=mun_border_width))
+    prov_geometries = gdf2.geometry.values[gdf2.geometry.notna().to_numpy()]
+    prov_paths = _geometry_paths(prov_geometries, np.zeros(len(prov_geometries), dtype=int), 1)
+    ax.add_collection(PathCollection(prov_paths, facecolors="none", edgecolors=prov_border_color, linewidths=prov_border_width))
+
+    # Enquadramento e proporção (graus de longitude encurtam com a latitude)
+    minx, miny, maxx, maxy = gdf.total_bounds
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+    ax.set_aspect(1 / np.cos(np.radians((miny + maxy) / 2)))
+
+    _static_labels(ax, gdf2, prov_label_config)
+    _static_labels(ax, gdf, mun_label_config)
+
+    legend_title = legend_title or str(column)
+    if isinstance(color_mapping, branca.colormap.ColorMap):
+        positions = np.linspace(color_mapping.vmin, color_mapping.vmax, 256)
+        cmap = ListedColormap([color_mapping.rgb_hex_str(x) for x in positions])
+        scalar = ScalarMappable(norm=Normalize(color_mapping.vmin, color_mapping.vmax), cmap=cmap)
+        fig.colorbar(scalar, ax=ax, orientation="horizontal", fraction=0.04, pad=0.02, label=legend_title)
+    else:
+        categories = visible_categories if visible_categories is not None else list(color_mapping)
+        handles = [Patch(facecolor=color_mapping[category], edgecolor=mun_border_color, label=str(category)) for category in categories]
+        ax.legend(handles=handles, title=legend_title, loc="lower left", frameon=True, edgecolor="black")
+    if title:
+        ax.set_title(title)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format, dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
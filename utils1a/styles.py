@@ -0,0 +1,482 @@
+"""Cores, classificação e estilo compacto das camadas GeoJSON do mapa."""
+import pandas as pd
+from branca.element import Template, MacroElement
+import branca
+import branca.colormap
+import colorsys
+import shapely
+import numpy as np
+
+
+def categorical_color_codes(values, color_mapping, default_color="gray"):
+    """
+    Atribui cores a uma coluna categórica numa única passagem vetorizada.
+
+    Args:
+        values: Série com as categorias.
+        color_mapping: Dicionário mapeando categorias para cores.
+        default_color: Cor das categorias sem cor definida.
+
+    Returns:
+        tuple: (paleta de cores distintas, array de códigos por feição; -1 = sem dados).
+    """
+    values = pd.Series(values)
+    colors = values.map(color_mapping)
+    colors = colors.where(colors.notna() | values.isna(), default_color)
+    codes, palette = pd.factorize(colors)
+    return list(palette), codes
+
+
+def continuous_color_codes(values, colormap, n_colors=256):
+    """
+    Atribui cores de uma escala contínua numa única passagem vetorizada.
+
+    A escala é amostrada em n_colors cores e cada valor recebe o índice da cor
+    mais próxima, o que é visualmente indistinguível da interpolação exata.
+
+    Args:
+        values: Série ou array numérico (texto numérico é convertido).
+        colormap: Escala do branca (LinearColormap) já ajustada a vmin/vmax.
+        n_colors: Número de cores amostradas da escala.
+
+    Returns:
+        tuple: (paleta de cores, array de códigos por feição; -1 = sem dados).
+    """
+    numeric = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+    vmin, vmax = colormap.vmin, colormap.vmax
+    palette = [colormap.rgb_hex_str(x) for x in np.linspace(vmin, vmax, n_colors)]
+    span = (vmax - vmin) or 1.0
+    positions = np.clip((numeric - vmin) / span, 0, 1)
+    codes = np.where(np.isfinite(numeric), np.rint(np.nan_to_num(positions) * (n_colors - 1)), -1).astype(int)
+    return palette, codes
+
+
+def continuous_colormap(name, values, caption=None):
+    """
+    Cria uma escala contínua do branca ajustada ao intervalo dos valores.
+
+    Args:
+        name: Nome da escala em branca.colormap.linear (ex.: "YlOrRd_09").
+        values: Série ou array numérico (texto numérico é convertido).
+        caption: Título da legenda em gradiente.
+
+    Returns:
+        branca.colormap.LinearColormap: Escala ajustada a [mínimo, máximo].
+    """
+    numeric = pd.to_numeric(pd.Series(values), errors="coerce")
+    colormap = getattr(branca.colormap.linear, name).scale(numeric.min(), numeric.max())
+    if caption:
+        colormap.caption = caption
+    return colormap
+
+
+def features_to_geojson(gdf, properties=()):
+    """
+    Serializa um GeoDataFrame em GeoJSON com as geometrias convertidas em bloco.
+
+    Inclui apenas as colunas pedidas e a propriedade "__i" (posição da feição),
+    usada pelas tabelas de estilo do StyledGeoJson.
+
+    Args:
+        gdf: GeoDataFrame a serializar.
+        properties: Colunas a incluir nas propriedades.
+
+    Returns:
+        str: FeatureCollection em JSON.
+    """
+    geometries = shapely.to_geojson(gdf.geometry.values)
+    attributes = pd.DataFrame({column: gdf[column].astype(str).to_numpy() for column in properties})
+    attributes["__i"] = np.arange(len(gdf))
+    records = attributes.to_json(orient="records", lines=True, force_ascii=False).splitlines()
+    features = ",".join(
+        f'{{"type":"Feature","properties":{props},"geometry":{geometry}}}'
+        for props, geometry in zip(records, geometries)
+    )
+    return f'{{"type":"FeatureCollection","features":[{features}]}}'
+
+
+# Alfabeto dos códigos de cor compactados (1 carácter por feição); o primeiro
+# carácter representa "sem dados". Exclui os caracteres escapados pelo tojson.
+STYLE_CODE_ALPHABET = "".join(c for c in map(chr, range(33, 127)) if c not in "\"\\<>&'")
+
+
+def encode_style_codes(codes):
+    """
+    Codifica os códigos de cor numa string compacta, quando a paleta é pequena.
+
+    Args:
+        codes: Array de códigos por feição (-1 = sem dados).
+
+    Returns:
+        str ou list: String com um carácter por feição, ou a lista de inteiros se
+        os códigos não couberem no alfabeto.
+    """
+    codes = np.asarray(codes, dtype=int)
+    if len(codes) == 0 or codes.max() + 1 >= len(STYLE_CODE_ALPHABET):
+        return codes.tolist()
+    return "".join(np.array(list(STYLE_CODE_ALPHABET))[codes + 1])
+
+
+# Função JavaScript que descodifica os códigos compactados (encode_style_codes)
+DECODE_STYLE_CODES_JS = """
+    function dataonmapDecodeCodes(table, alphabet) {
+        if (typeof table.codes === "string") {
+            var codes = new Int16Array(table.codes.length);
+            for (var i = 0; i < codes.length; i++) {
+                codes[i] = alphabet.indexOf(table.codes.charAt(i)) - 1;
+            }
+            table.codes = codes;
+        }
+    }
+"""
+
+
+class StyledGeoJson(MacroElement):
+    """
+    Camada GeoJSON estilizada no navegador a partir de tabelas de cores por feição.
+
+    As cores são calculadas em Python de forma vetorizada (paleta + código por
+    feição) e a função de estilo em JavaScript apenas as consulta, sem uma
+    função de estilo Python chamada por feição. Várias tabelas ("estilos") podem
+    partilhar a mesma geometria; restyle(nome) troca o estilo ativo.
+    """
+
+    _template = Template("""
+    {% macro script(this, kwargs) %}
+    var {{ this.get_name() }}_styles = {{ this.styles|tojson }};
+    {{ this.decode_js }}
+    Object.keys({{ this.get_name() }}_styles).forEach(function(name) {
+        dataonmapDecodeCodes({{ this.get_name() }}_styles[name], {{ this.alphabet|tojson }});
+    });
+    // O Leaflet aplica o estilo já no construtor, por isso o estilo ativo fica numa variável à parte
+    var {{ this.get_name() }}_current = {{ this.current|tojson }};
+    var {{ this.get_name() }} = L.geoJson({{ this.data }}, {
+        style: function(feature) {
+            var table = {{ this.get_name() }}_styles[{{ this.get_name() }}_current];
+            var code = !table ? -1 : (table.codes ? table.codes[feature.properties.__i] : 0);
+            if (code < 0) {
+                return {opacity: 0, fillOpacity: 0};
+            }
+            return {
+                fillColor: table.palette[code],
+                color: {{ this.border_color|tojson }},
+                weight: {{ this.border_width|tojson }},
+                opacity: 1,
+                fillOpacity: {{ this.fill_opacity|tojson }}
+            };
+        },
+        onEachFeature: function(feature, layer) {
+            {%- if this.tooltip_field %}
+            layer.bindTooltip(String(feature.properties[{{ this.tooltip_field|tojson }}]));
+            {%- endif %}
+        }
+    });
+    {{ this.get_name() }}.restyle = function(name) {
+        {{ this.get_name() }}_current = name;
+        this.setStyle(this.options.style);
+    };
+    {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+    {% endmacro %}
+    """)
+
+    def __init__(self, gdf, styles, tooltip_field=None, border_color="#808080", border_width=0.5, fill_opacity=1, current=None):
+        """
+        Args:
+            gdf: GeoDataFrame com as geometrias (EPSG:4326).
+            styles: Dicionário nome -> (paleta, códigos), com um código por linha de gdf
+                (códigos None usam a primeira cor da paleta em todas as feições).
+            tooltip_field: Campo exibido no tooltip.
+            border_color: Cor dos limites.
+            border_width: Largura dos limites.
+            fill_opacity: Opacidade do preenchimento.
+            current: Estilo ativo inicialmente. Se None, o primeiro.
+        """
+        super().__init__()
+        self._name = "StyledGeoJson"
+        properties = [tooltip_field] if tooltip_field else []
+        self.data = features_to_geojson(gdf, properties)
+        self.styles = {
+            str(name): {"palette": list(palette), "codes": None if codes is None else encode_style_codes(codes)}
+            for name, (palette, codes) in styles.items()
+        }
+        self.alphabet = STYLE_CODE_ALPHABET
+        self.decode_js = DECODE_STYLE_CODES_JS
+        self.current = str(current) if current is not None else next(iter(self.styles), None)
+        self.tooltip_field = tooltip_field
+        self.border_color = border_color
+        self.border_width = border_width
+        self.fill_opacity = fill_opacity
+
+
+def indicator_color_codes(values, mapping):
+    """
+    Atribui cores a um indicador, categórico (dicionário) ou contínuo (escala do branca).
+
+    Args:
+        values: Série com os valores do indicador.
+        mapping: Dicionário categoria -> cor, ou escala contínua do branca.
+
+    Returns:
+        tuple: (paleta, array de códigos por feição; -1 = sem dados).
+    """
+    if isinstance(mapping, branca.colormap.ColorMap):
+        return continuous_color_codes(values, mapping)
+    return categorical_color_codes(values, mapping)
+
+
+class IndicatorSelector(MacroElement):
+    """
+    Controlo que troca o indicador ativo de um StyledGeoJson e a respetiva legenda.
+
+    Apenas o estilo é trocado no navegador; a geometria é partilhada por todos os indicadores.
+    """
+
+    _template = Template("""
+    {% macro script(this, kwargs) %}
+    var {{ this.get_name() }} = L.control({position: {{ this.position|tojson }}});
+    {{ this.get_name() }}.onAdd = function(map) {
+        var names = {{ this.names|tojson }};
+        var div = L.DomUtil.create("div", "leaflet-bar");
+        div.style.background = "white";
+        div.style.padding = "4px 6px";
+        L.DomEvent.disableClickPropagation(div);
+        {%- if this.control == "slider" %}
+        var label = L.DomUtil.create("div", "", div);
+        label.innerText = names[0];
+        var slider = L.DomUtil.create("input", "", div);
+        slider.type = "range";
+        slider.min = 0;
+        slider.max = names.length - 1;
+        slider.value = 0;
+        slider.style.width = "220px";
+        slider.oninput = function() {
+            label.innerText = names[this.value];
+            {{ this.get_name() }}.select(names[this.value]);
+        };
+        {%- else %}
+        var select = L.DomUtil.create("select", "", div);
+        names.forEach(function(name) {
+            var option = document.createElement("option");
+            option.value = name;
+            option.text = name;
+            select.appendChild(option);
+        });
+        select.onchange = function() { {{ this.get_name() }}.select(this.value); };
+        {%- endif %}
+        return div;
+    };
+    {{ this.get_name() }}.select = function(name) {
+        {{ this.layer.get_name() }}.restyle(name);
+        document.querySelectorAll("[data-indicator-legend]").forEach(function(el) {
+            el.style.display = el.getAttribute("data-indicator-legend") === name ? "block" : "none";
+        });
+    };
+    {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+    {% endmacro %}
+    """)
+
+    def __init__(self, layer, names, position="topright", control="select"):
+        """
+        Args:
+            layer: StyledGeoJson cujos estilos são os indicadores.
+            names: Nomes dos indicadores, na ordem do seletor.
+            position: Posição do controlo no mapa.
+            control: "select" (lista) ou "slider" (barra deslizante, para períodos).
+        """
+        super().__init__()
+        self._name = "IndicatorSelector"
+        self.layer = layer
+        self.names = [str(name) for name in names]
+        self.position = position
+        self.control = control
+
+
+# Métodos de classificação de colunas numéricas
+CLASSIFICATION_METHODS = {
+    "equal_interval": "Intervalos iguais",
+    "quantiles": "Quantis",
+    "natural_breaks": "Quebras naturais",
+}
+# Paletas do branca por tipo de esquema
+SEQUENTIAL_PALETTES = ["YlOrRd_09", "YlGnBu_09", "Blues_09", "Greens_09", "Reds_09", "Purples_09", "OrRd_09", "viridis"]
+DIVERGING_PALETTES = ["RdYlBu_11", "RdYlGn_11", "RdBu_11", "Spectral_11", "PiYG_11", "BrBG_11", "PuOr_11"]
+QUALITATIVE_PALETTES = ["Set1_09", "Set3_12", "Paired_12", "Dark2_08", "Set2_08", "Accent_08", "Pastel1_09"]
+PALETTE_SCHEMES = {
+    "qualitative": ("Qualitativa", QUALITATIVE_PALETTES),
+    "sequential": ("Sequencial", SEQUENTIAL_PALETTES),
+    "diverging": ("Divergente", DIVERGING_PALETTES),
+}
+
+
+def palette_from_colormap(name, k):
+    """
+    Gera k cores igualmente espaçadas de uma escala de cores do branca.
+
+    Args:
+        name: Nome da escala em branca.colormap.linear (ex.: "YlOrRd_09").
+        k: Número de cores.
+
+    Returns:
+        list: Cores em hexadecimal (#rrggbb).
+    """
+    colormap = getattr(branca.colormap.linear, name).scale(0, 1)
+    positions = np.linspace(0, 1, k) if k > 1 else [0.5]
+    return [colormap.rgb_hex_str(x) for x in positions]
+
+
+def generate_palette(categories, scheme="qualitative", name=None):
+    """
+    Gera o mapeamento categoria -> cor num único passo.
+
+    Esquemas qualitativos usam as cores discretas da paleta e, quando há mais
+    categorias do que cores, acrescentam tons distribuídos pela razão áurea.
+    Esquemas sequenciais e divergentes amostram a escala na ordem das categorias.
+
+    Args:
+        categories: Categorias, na ordem desejada.
+        scheme: "qualitative", "sequential" ou "diverging".
+        name: Nome da paleta do branca. Se None, a primeira do esquema.
+
+    Returns:
+        dict: Dicionário mapeando categorias para cores (#rrggbb).
+    """
+    categories = list(categories)
+    name = name or PALETTE_SCHEMES[scheme][1][0]
+    if scheme != "qualitative":
+        return dict(zip(categories, palette_from_colormap(name, len(categories))))
+
+    base = ["#{:02x}{:02x}{:02x}".format(*(round(255 * c) for c in rgba[:3])) for rgba in getattr(branca.colormap.linear, name).colors]
+    for i in range(len(categories) - len(base)):
+        r, g, b = colorsys.hsv_to_rgb((i * 0.618033988749895) % 1.0, 0.65, 0.9)
+        base.append("#{:02x}{:02x}{:02x}".format(round(255 * r), round(255 * g), round(255 * b)))
+    return dict(zip(categories, base))
+
+
+def default_color_mapping(values, title=None):
+    """
+    Escolhe automaticamente as cores de um indicador.
+
+    Colunas numéricas com mais de 12 valores distintos recebem uma escala contínua;
+    as restantes, uma paleta qualitativa por categoria.
+
+    Args:
+        values: Série com os valores do indicador.
+        title: Título da escala contínua.
+
+    Returns:
+        dict ou branca.colormap.LinearColormap: Mapeamento de cores do indicador.
+    """
+    values = pd.Series(values)
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.nunique() > 12 and numeric.notna().sum() >= 0.9 * values.notna().sum():
+        return continuous_colormap(SEQUENTIAL_PALETTES[0], numeric, caption=title)
+    return generate_palette(sorted(values.dropna().unique(), key=str), "qualitative")
+
+
+def _natural_breaks(values, k):
+    # Fisher-Jenks por programação dinâmica, vetorizada sobre a matriz de custos
+    x = np.sort(values)
+    n = len(x)
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+    i = np.arange(n + 1)[:, None]
+    j = np.arange(n + 1)[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost = (s2[j] - s2[i]) - (s1[j] - s1[i]) ** 2 / (j - i)
+    cost[j <= i] = np.inf
+
+    best = cost[0].copy()
+    back = []
+    for _ in range(1, k):
+        total = best[:, None] + cost
+        back.append(np.argmin(total, axis=0))
+        best = total[back[-1], np.arange(n + 1)]
+
+    # Reconstrói os índices de início de cada classe
+    starts = []
+    end = n
+    for argmins in reversed(back):
+        end = argmins[end]
+        starts.append(end)
+    return [x[start - 1] for start in sorted(starts)]
+
+
+def format_edges(edges):
+    """
+    Formata limites de classes ou de escalas em notação decimal, sem notação científica.
+
+    As casas decimais bastam para mostrar a menor diferença entre limites e aumentam
+    enquanto limites diferentes tiverem o mesmo texto; se ainda assim coincidirem,
+    usa os valores exatos.
+
+    Args:
+        edges: Limites, por ordem crescente.
+
+    Returns:
+        list: Texto de cada limite.
+    """
+    edges = np.asarray(edges, dtype=float)
+    distinct = len(np.unique(edges))
+    gaps = np.diff(edges)
+    gaps = gaps[gaps > 0]
+    decimals = max(0, 1 - int(np.floor(np.log10(gaps.min())))) if len(gaps) else 2
+    for decimals in range(min(decimals, 15), 16):
+        texts = [f"{edge:,.{decimals}f}" for edge in edges]
+        if len(set(texts)) == distinct:
+            return texts
+    return [repr(float(edge)) for edge in edges]
+
+
+def _class_labels(edges):
+    """Rótulos "mín – máx" das classes, todos distintos (ver format_edges)."""
+    texts = format_edges(edges)
+    return [f"{lo} – {hi}" for lo, hi in zip(texts[:-1], texts[1:])]
+
+
+def classify_values(values, k=5, method="quantiles", sample_size=1000):
+    """
+    Classifica valores numéricos em k classes.
+
+    Os limites são calculados com NumPy; as quebras naturais (Fisher-Jenks) usam
+    uma amostra de até sample_size valores (com o mínimo e o máximo), o que mantém
+    o custo constante para tabelas grandes.
+
+    Args:
+        values: Série ou array com os valores (texto numérico é convertido).
+        k: Número de classes.
+        method: "equal_interval", "quantiles" ou "natural_breaks".
+        sample_size: Tamanho máximo da amostra usada nas quebras naturais.
+
+    Returns:
+        tuple: (limites das classes, rótulos, série categórica com o rótulo de cada valor).
+    """
+    series = pd.to_numeric(pd.Series(values), errors="coerce")
+    finite = series.to_numpy(dtype=float)
+    finite = finite[np.isfinite(finite)]
+    if len(finite) == 0:
+        raise ValueError("A coluna não contém valores numéricos.")
+    vmin, vmax = finite.min(), finite.max()
+
+    if method == "equal_interval":
+        edges = np.linspace(vmin, vmax, k + 1)
+    elif method == "quantiles":
+        edges = np.quantile(finite, np.linspace(0, 1, k + 1))
+    elif method == "natural_breaks":
+        # Amostra dos próprios valores (com repetições, que pesam nas quebras), com os extremos
+        sample = finite
+        if len(sample) > sample_size:
+            rng = np.random.default_rng(0)
+            sample = np.concatenate([rng.choice(finite, sample_size - 2, replace=False), [vmin, vmax]])
+        k = min(k, len(np.unique(sample)))
+        edges = np.array([vmin] + _natural_breaks(sample, k) + [vmax])
+    else:
+        raise ValueError(f"Método de classificação desconhecido: {method}")
+    edges = np.unique(edges)
+    if len(edges) == 1:
+        edges = np.array([vmin, vmax])
+
+    labels = _class_labels(edges)
+    codes = np.searchsorted(edges[1:-1], series.to_numpy(dtype=float), side="left")
+    codes = np.where(series.notna().to_numpy(), codes, -1)
+    classes = pd.Series(pd.Categorical.from_codes(codes, categories=labels), index=series.index)
+    return edges, labels, classes